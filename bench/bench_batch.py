@@ -0,0 +1,63 @@
+"""
+Compare logging a synthetic game one log_player_* call at a time against logging each turn
+with one CatanLog.log_events call. Both are checked to give identical text first.
+
+    $ python bench/bench_batch.py [turns]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import catanlog
+
+from bench_writer import synthetic_game
+
+
+def turns_of(calls):
+    """
+    Group the calls after the header into turns of events for log_events
+    """
+    turns, turn = list(), list()
+    for name, args in calls[1:]:
+        turn.append((name[len('log_player_'):],) + tuple(args))
+        if name in ('log_player_ends_turn', 'log_player_wins'):
+            turns.append(turn)
+            turn = list()
+    return turns
+
+
+def per_call(log, calls):
+    for name, args in calls:
+        getattr(log, name)(*args)
+    return log
+
+
+def batched(log, calls, turns):
+    name, args = calls[0]
+    getattr(log, name)(*args)
+    for turn in turns:
+        log.log_events(turn)
+    return log
+
+
+def main(turns=200, repeat=5):
+    calls = synthetic_game(turns)
+    events = turns_of(calls)
+    with tempfile.TemporaryDirectory() as log_dir:
+        def make(auto_flush):
+            return catanlog.CatanLog(auto_flush=auto_flush, log_dir=log_dir)
+        assert per_call(make(False), calls).dump() == batched(make(False), calls, events).dump()
+
+        print('{} turns, {} calls, best of {}'.format(turns, len(calls), repeat))
+        for auto_flush in (False, True):
+            for name, run in (('per call', lambda: per_call(make(auto_flush), calls)),
+                              ('log_events', lambda: batched(make(auto_flush), calls, events))):
+                best = min(timeit.repeat(run, number=1, repeat=repeat))
+                print('auto_flush={!s:>5} {:>10}: {:8.2f} ms'.format(auto_flush, name, best * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
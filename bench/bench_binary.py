@@ -0,0 +1,39 @@
+"""
+Compare the size and load time of a game as .catan text and as .catanb.
+
+    $ python bench/bench_binary.py [turns]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import catanlog
+import catanlog_binary
+import catanlog_reader
+
+from bench_buffer import play
+
+
+def main(turns=500, repeat=5):
+    with tempfile.TemporaryDirectory() as log_dir:
+        log = catanlog.CatanLog(auto_flush=False, log_dir=log_dir)
+        play(log, turns, erase=False)
+        log.flush()
+        text_path = log.logpath()
+        binary_path = os.path.join(log_dir, 'game.catanb')
+        catanlog_binary.text_to_binary(text_path, binary_path)
+
+        loads = (('.catan', text_path, lambda: list(catanlog_reader.read(text_path))),
+                 ('.catanb', binary_path, lambda: list(catanlog_binary.read(binary_path))),
+                 ('.catanb records', binary_path, lambda: list(catanlog_binary.read_games(binary_path))))
+        print('{} turns, best of {}'.format(turns, repeat))
+        for name, path, load in loads:
+            best = min(timeit.repeat(load, number=1, repeat=repeat))
+            print('{:>16}: {:8d} bytes {:8.2f} ms'.format(name, os.path.getsize(path), best * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
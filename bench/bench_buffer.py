@@ -0,0 +1,123 @@
+"""
+Compare CatanLog's line buffer against the str buffer it replaced, on a 500-turn game.
+
+The str buffer grew with += on every _log() call and re-split itself on every eraseln(),
+which is quadratic in the length of the game. Both loggers are driven through the same
+game, and their dumps are checked to be identical before timings are reported.
+
+    $ python bench/bench_buffer.py [turns]
+"""
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import catanlog
+
+
+class Player(object):
+    def __init__(self, seat, name, color):
+        self.seat = seat
+        self.name = name
+        self.color = color
+
+
+class Value(object):
+    def __init__(self, value):
+        self.value = value
+
+
+class Port(object):
+    def __init__(self, tile_id, direction, type):
+        self.tile_id = tile_id
+        self.direction = direction
+        self.type = Value(type)
+
+
+class StrBufferCatanLog(catanlog.CatanLog):
+    """
+    CatanLog as it was before _LineBuffer: the whole game in one str.
+    """
+    def __init__(self, *args, **kwargs):
+        super(StrBufferCatanLog, self).__init__(*args, **kwargs)
+        self._buffer = str()
+
+    def _log(self, content):
+        self._buffer += content
+        if self._auto_flush:
+            self.flush()
+
+    def eraseln(self):
+        self._buffer = ''.join(self._buffer.splitlines(True)[:-1])
+
+    def reset(self):
+        self._close_file()
+        self._buffer = ''
+        self._chars_flushed = 0
+        self._logpath = None
+
+    def dump(self):
+        return self._buffer
+
+    def _latest(self):
+        return self._buffer[self._chars_flushed:]
+
+
+PLAYERS = [Player(1, 'ross', 'red'), Player(2, 'zach', 'orange'),
+           Player(3, 'josh', 'blue'), Player(4, 'yuri', 'green')]
+RESOURCES = [Value(r) for r in ('wood', 'brick', 'wheat', 'sheep', 'ore')]
+TERRAIN = [Value(t) for t in ('wood wheat ore wheat sheep brick sheep wheat wood ore '
+                              'brick desert wheat sheep wood ore sheep wood brick').split()]
+NUMBERS = [Value(None if n == 'None' else int(n))
+           for n in '5 2 6 3 8 10 9 12 11 4 8 None 10 9 4 5 6 3 11'.split()]
+PORTS = [Port(1, 'NW', '3:1'), Port(2, 'W', 'wood'), Port(4, 'W', 'brick'), Port(5, 'SW', '3:1'),
+         Port(6, 'SE', '3:1'), Port(8, 'SE', 'sheep'), Port(9, 'E', '3:1'), Port(10, 'NE', 'ore'),
+         Port(12, 'NE', 'wheat')]
+
+
+def play(log, turns, seed=0, erase=True):
+    """
+    Log a game of the given number of turns, flushing at the end of each turn and, if erase,
+    erasing a line every tenth turn.
+    """
+    rng = random.Random(seed)
+    log.log_game_start(PLAYERS, TERRAIN, NUMBERS, PORTS)
+    for turn in range(turns):
+        player = PLAYERS[turn % len(PLAYERS)]
+        log.log_player_roll(player, rng.randint(1, 6) + rng.randint(1, 6))
+        log.log_player_buys_road(player, '({} {})'.format(rng.randint(1, 19), rng.choice('NE SE SW NW E W'.split())))
+        log.log_player_trades_with_port(player, [(4, rng.choice(RESOURCES))], PORTS[0], [(1, rng.choice(RESOURCES))])
+        log.log_player_trades_with_other_player(player, [(1, rng.choice(RESOURCES)), (1, rng.choice(RESOURCES))],
+                                                rng.choice(PLAYERS), [(2, rng.choice(RESOURCES))])
+        if turn % 10 == 0:
+            log.log_player_buys_dev_card(player)
+            if erase:
+                log.eraseln()
+                log.log_player_buys_dev_card(player)
+            log.log_player_plays_knight(player, str(rng.randint(1, 19)), rng.choice(PLAYERS))
+        log.log_player_ends_turn(player)
+        log.flush()
+    log.log_player_wins(PLAYERS[0])
+    log.close()
+
+
+def run(cls, log_dir, turns):
+    log = cls(auto_flush=False, log_dir=log_dir, keep_open=True)
+    play(log, turns)
+    return log.dump()
+
+
+def main(turns=500, repeat=5):
+    with tempfile.TemporaryDirectory() as log_dir:
+        assert run(catanlog.CatanLog, log_dir, turns) == run(StrBufferCatanLog, log_dir, turns)
+        print('{} turns, best of {}'.format(turns, repeat))
+        for cls in (StrBufferCatanLog, catanlog.CatanLog):
+            best = min(timeit.repeat(lambda: run(cls, log_dir, turns), number=1, repeat=repeat))
+            print('{:>20}: {:8.2f} ms'.format(cls.__name__, best * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
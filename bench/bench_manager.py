@@ -0,0 +1,83 @@
+"""
+Log many concurrent games, interleaved turn by turn, with one plain CatanLog per game and
+with a LogManager holding a fixed number of files open.
+
+A plain CatanLog opens and closes its file on every line. The LogManager batches lines
+across games and writes them through its FilePool. Both runs are checked to write
+identical files before timings are reported.
+
+    $ python bench/bench_manager.py [games] [turns] [max_open]
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import catanlog
+import catanlog_manager
+
+from bench_buffer import NUMBERS, PORTS, RESOURCES, TERRAIN, Player
+
+
+TIMESTAMP = datetime.datetime(2016, 1, 1)
+
+
+def players_of(game):
+    return [Player(seat, 'g{}p{}'.format(game, seat), color)
+            for seat, color in enumerate(('red', 'orange', 'blue', 'green'), 1)]
+
+
+def play_interleaved(logs, turns, seed=0):
+    """
+    Play one game per log, a turn of each game at a time
+    """
+    rng = random.Random(seed)
+    players = [players_of(game) for game in range(len(logs))]
+    for log, ps in zip(logs, players):
+        log.log_game_start(ps, TERRAIN, NUMBERS, PORTS, timestamp=TIMESTAMP)
+    for turn in range(turns):
+        for log, ps in zip(logs, players):
+            player = ps[turn % len(ps)]
+            log.log_player_roll(player, rng.randint(1, 6) + rng.randint(1, 6))
+            log.log_player_buys_road(player, '({} {})'.format(rng.randint(1, 19), rng.choice('NE SE SW NW E W'.split())))
+            log.log_player_trades_with_port(player, [(4, rng.choice(RESOURCES))], PORTS[0], [(1, rng.choice(RESOURCES))])
+            log.log_player_ends_turn(player, seconds=30)
+    for log, ps in zip(logs, players):
+        log.log_player_wins(ps[0])
+
+
+def read_all(log_dir):
+    contents = dict()
+    for name in os.listdir(log_dir):
+        with open(os.path.join(log_dir, name), 'r') as fp:
+            contents[name] = fp.read()
+    return contents
+
+
+def main(games=10000, turns=4, max_open=64):
+    with tempfile.TemporaryDirectory() as plain_dir, tempfile.TemporaryDirectory() as managed_dir:
+        start = time.perf_counter()
+        play_interleaved([catanlog.CatanLog(log_dir=plain_dir) for _ in range(games)], turns)
+        plain = time.perf_counter() - start
+
+        start = time.perf_counter()
+        manager = catanlog_manager.LogManager(log_dir=managed_dir, max_open=max_open)
+        play_interleaved([manager.log(game) for game in range(games)], turns)
+        manager.close()
+        managed = time.perf_counter() - start
+
+        assert read_all(plain_dir) == read_all(managed_dir)
+        lines = sum(text.count('\n') for text in read_all(managed_dir).values())
+
+    print('{} games, {} turns, {} lines'.format(games, turns, lines))
+    print('{:>12}: {:8.2f} s, {} opens, 1 file open at a time'.format('CatanLog', plain, lines))
+    print('{:>12}: {:8.2f} s, {} opens, at most {} files open'.format('LogManager', managed,
+                                                                     manager.pool.opens, max_open))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,63 @@
+"""
+Measure the memory per event of parsed games: catanlog_reader events, catanlog_compact
+records, and catanlog_compact.GameArrays. Then measure the memory a CatanLog holds once its
+game is over, keeping every line and with keep_lines.
+
+    $ python bench/bench_memory.py [turns]
+"""
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import catanlog
+import catanlog_compact
+import catanlog_reader
+
+from bench_buffer import play
+
+
+def measure(build):
+    """
+    Return the result of build() and the bytes it still holds once built
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main(turns=500):
+    with tempfile.TemporaryDirectory() as log_dir:
+        log = catanlog.CatanLog(auto_flush=False, log_dir=log_dir)
+        play(log, turns, erase=False)
+        text = log.dump()
+
+    events, events_bytes = measure(lambda: list(catanlog_reader.parse(io.StringIO(text))))
+    num_events = len(events) - 1
+    game, records_bytes = measure(lambda: next(catanlog_compact.games(iter(events))))
+    arrays, arrays_bytes = measure(game.to_arrays)
+
+    print('{} turns, {} events'.format(turns, num_events))
+    for name, nbytes in (('catanlog_reader', events_bytes),
+                         ('CompactGame', records_bytes),
+                         ('GameArrays', arrays_bytes)):
+        print('{:>16}: {:8.1f} bytes/event'.format(name, nbytes / num_events))
+
+    for keep_lines in (None, 16):
+        with tempfile.TemporaryDirectory() as log_dir:
+            def build():
+                log = catanlog.CatanLog(auto_flush=False, log_dir=log_dir, keep_lines=keep_lines)
+                play(log, turns, erase=False)
+                return log
+            _, log_bytes = measure(build)
+        print('{:>16}: {:8d} bytes held by the log'.format('keep_lines={}'.format(keep_lines), log_bytes))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
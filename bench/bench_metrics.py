@@ -0,0 +1,51 @@
+"""
+Measure the cost of catanlog_metrics on a synthetic game, with metrics off and on, in the
+buffered and keep_open writer modes.
+
+With metrics off, a log must run exactly the code of CatanLog: this is checked first, by
+asserting that no method of the log is shadowed on the instance. The overhead reported for
+'off' is then the noise of the measurement, taken as the difference between two
+interleaved sets of runs of the same log.
+
+    $ python bench/bench_metrics.py [turns]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import catanlog
+import catanlog_metrics
+
+from bench_writer import replay, synthetic_game
+
+
+def main(turns=200, repeat=20):
+    calls = synthetic_game(turns)
+    with tempfile.TemporaryDirectory() as log_dir:
+        def make(keep_open, metrics):
+            return catanlog.CatanLog(auto_flush=keep_open, keep_open=keep_open, log_dir=log_dir,
+                                     metrics=catanlog_metrics.Metrics() if metrics else None)
+
+        log = make(True, False)
+        assert not [name for name, value in vars(log).items() if callable(value)]
+        log.close()
+
+        print('{} turns, {} calls, best of {}'.format(turns, len(calls), repeat))
+        for keep_open in (False, True):
+            runs = (('off', False), ('off again', False), ('on', True))
+            best = dict()
+            for _ in range(repeat):
+                for name, metrics in runs:
+                    elapsed = timeit.timeit(lambda: replay(make(keep_open, metrics), calls), number=1)
+                    best[name] = min(best.get(name, elapsed), elapsed)
+            for name, _ in runs:
+                print('{:>9} metrics {:>9}: {:8.2f} ms, {:6.1f} ns/call over off'.format(
+                    'keep_open' if keep_open else 'buffered', name, best[name] * 1000,
+                    (best[name] - best['off']) * 1e9 / len(calls)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,53 @@
+"""
+Measure the cost of disabled logging: a synthetic game played with no logger at all, with
+NoopCatanLog, and with the NoopCatanLog it replaced, which built a closure on every call.
+
+    $ python bench/bench_noop.py [turns]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import catanlog
+
+from bench_writer import synthetic_game
+
+
+class ClosureNoopCatanLog(object):
+    """
+    NoopCatanLog as it was: a new closure per attribute access, positional args only.
+    """
+    def __getattr__(self, name):
+        def method(*args):
+            return None
+        return method
+
+
+def no_logger(calls):
+    for name, args in calls:
+        pass
+
+
+def with_logger(log, calls):
+    for name, args in calls:
+        getattr(log, name)(*args)
+
+
+def main(turns=200, repeat=20):
+    calls = synthetic_game(turns)
+    games = (('no logger', lambda: no_logger(calls)),
+             ('NoopCatanLog', lambda: with_logger(catanlog.NoopCatanLog(), calls)),
+             ('closure noop', lambda: with_logger(ClosureNoopCatanLog(), calls)))
+    print('{} turns, {} calls, best of {}'.format(turns, len(calls), repeat))
+    baseline = None
+    for name, game in games:
+        best = min(timeit.repeat(game, number=10, repeat=repeat)) / 10
+        baseline = best if baseline is None else baseline
+        print('{:>14}: {:8.1f} us/game, {:6.1f} ns/call over no logger'.format(
+            name, best * 1e6, (best - baseline) * 1e9 / len(calls)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
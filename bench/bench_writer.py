@@ -0,0 +1,324 @@
+"""
+Benchmark the CatanLog writer modes, and the readers, on synthetic games.
+
+Games are generated up front as lists of log_* calls on lightweight stand-ins for catan's
+players and board, then replayed through each writer mode:
+- auto_flush: CatanLog(), which opens, appends to and closes the file on every call
+- keep_open: CatanLog(keep_open=True), which holds the file and coalesces flushes
+- buffered: CatanLog(auto_flush=False), flushed once at the end of the game
+- stdout: CatanLog(use_stdout=True), with stdout redirected to os.devnull
+- noop: NoopCatanLog()
+
+For each mode it reports the mean and percentile latency of a log_* call, lines per second,
+syscalls per line, and peak memory. The written logs are then read back with
+catanlog_reader, and as .catanb with catanlog_binary, for their lines per second.
+
+Syscalls are counted from /proc/self/io (read and write calls) plus two for every file
+opened (open and close), so they are not available on every platform and do not count
+the fstat/lseek calls Python makes on open.
+
+Results are written as JSON. Given earlier results with --compare, each metric is printed
+alongside its ratio to the earlier value.
+
+    $ python bench/bench_writer.py --turns 200 --output bench.json
+    $ python bench/bench_writer.py --turns 200 --compare bench.json
+"""
+import argparse
+import builtins
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import catanlog
+import catanlog_binary
+import catanlog_reader
+
+from bench_buffer import NUMBERS, PORTS, RESOURCES, TERRAIN, Player
+
+
+COLORS = ('red', 'orange', 'blue', 'green', 'white', 'brown')
+DIRECTIONS = ('N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW')
+TIMESTAMP = datetime.datetime(2016, 1, 1)
+
+MODES = ('auto_flush', 'keep_open', 'buffered', 'stdout', 'noop')
+
+
+def location(rng):
+    return '({} {})'.format(rng.randint(1, 19), rng.choice(DIRECTIONS))
+
+
+def resources(rng, num):
+    return [(1, rng.choice(RESOURCES)) for _ in range(num)]
+
+
+def synthetic_game(turns, num_players=4, trade_rate=0.5, dev_card_rate=0.2, seed=0):
+    """
+    Generate the log_* calls of a game.
+
+    Each turn rolls, builds a road, trades with a port and with another player with
+    probability trade_rate each, and buys and plays a dev card with probability dev_card_rate.
+
+    :return: list of (method name, args)
+    """
+    rng = random.Random(seed)
+    players = [Player(seat, 'player{}'.format(seat), COLORS[seat - 1]) for seat in range(1, num_players + 1)]
+    calls = [('log_game_start', (players, TERRAIN, NUMBERS, PORTS, TIMESTAMP))]
+    for turn in range(turns):
+        player = players[turn % num_players]
+        others = [p for p in players if p is not player]
+        roll = rng.randint(1, 6) + rng.randint(1, 6)
+        calls.append(('log_player_roll', (player, roll)))
+        if roll == 7:
+            calls.append(('log_player_moves_robber_and_steals', (player, str(rng.randint(1, 19)), rng.choice(others))))
+        calls.append(('log_player_buys_road', (player, location(rng))))
+        if rng.random() < trade_rate:
+            calls.append(('log_player_trades_with_port', (player, resources(rng, 4), rng.choice(PORTS), resources(rng, 1))))
+        if rng.random() < trade_rate:
+            calls.append(('log_player_trades_with_other_player',
+                          (player, resources(rng, 2), rng.choice(others), resources(rng, 1))))
+        if rng.random() < dev_card_rate:
+            calls.append(('log_player_buys_dev_card', (player,)))
+            card = rng.randrange(5)
+            if card == 0:
+                calls.append(('log_player_plays_knight', (player, str(rng.randint(1, 19)), rng.choice(others))))
+            elif card == 1:
+                calls.append(('log_player_plays_road_builder', (player, location(rng), location(rng))))
+            elif card == 2:
+                calls.append(('log_player_plays_year_of_plenty', (player, rng.choice(RESOURCES), rng.choice(RESOURCES))))
+            elif card == 3:
+                calls.append(('log_player_plays_monopoly', (player, rng.choice(RESOURCES))))
+            else:
+                calls.append(('log_player_plays_victory_point', (player,)))
+        if turn % 10 == 0:
+            calls.append(('log_player_buys_settlement', (player, location(rng))))
+        if turn % 25 == 0:
+            calls.append(('log_player_buys_city', (player, location(rng))))
+        calls.append(('log_player_ends_turn', (player, rng.randint(5, 120))))
+    calls.append(('log_player_wins', (players[0],)))
+    return calls
+
+
+def make_log(mode, log_dir):
+    if mode == 'auto_flush':
+        return catanlog.CatanLog(log_dir=log_dir)
+    elif mode == 'keep_open':
+        return catanlog.CatanLog(log_dir=log_dir, keep_open=True)
+    elif mode == 'buffered':
+        return catanlog.CatanLog(auto_flush=False, log_dir=log_dir)
+    elif mode == 'stdout':
+        return catanlog.CatanLog(log_dir=log_dir, use_stdout=True)
+    elif mode == 'noop':
+        return catanlog.NoopCatanLog()
+    raise ValueError('mode must be one of: {}'.format(', '.join(MODES)))
+
+
+def replay(log, calls, latencies=None):
+    """
+    Make the calls on log, then flush and close it. With latencies, append each call's time in ns.
+    """
+    if latencies is None:
+        for name, args in calls:
+            getattr(log, name)(*args)
+    else:
+        clock = time.perf_counter_ns
+        for name, args in calls:
+            method = getattr(log, name)
+            start = clock()
+            method(*args)
+            latencies.append(clock() - start)
+    log.flush()
+    log.close()
+
+
+def _proc_io():
+    try:
+        with open('/proc/self/io', 'r') as fp:
+            fields = dict(line.split(': ') for line in fp.read().splitlines())
+        return int(fields['syscr']) + int(fields['syscw'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+@contextlib.contextmanager
+def counting_opens(counter):
+    real_open = builtins.open
+
+    def counted_open(*args, **kwargs):
+        counter[0] += 1
+        return real_open(*args, **kwargs)
+
+    builtins.open = counted_open
+    try:
+        yield
+    finally:
+        builtins.open = real_open
+
+
+@contextlib.contextmanager
+def quiet_stdout():
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            yield
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def bench_mode(mode, calls, num_lines, repeat):
+    """
+    Measure one writer mode.
+
+    :return: dict of metrics
+    """
+    with tempfile.TemporaryDirectory() as log_dir, quiet_stdout():
+        best = None
+        for _ in range(repeat):
+            log = make_log(mode, log_dir)
+            start = time.perf_counter()
+            replay(log, calls)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            if mode != 'noop' and os.path.exists(log.logpath()):
+                os.remove(log.logpath())
+
+        latencies = list()
+        replay(make_log(mode, log_dir), calls, latencies)
+        latencies.sort()
+
+        opens = [0]
+        before = _proc_io()
+        with counting_opens(opens):
+            replay(make_log(mode, log_dir), calls)
+        after = _proc_io()
+        syscalls = None if before is None else after - before + 2 * opens[0]
+
+        tracemalloc.start()
+        replay(make_log(mode, log_dir), calls)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        'seconds': best,
+        'call_ns_mean': sum(latencies) / len(latencies),
+        'call_ns_p50': percentile(latencies, 0.5),
+        'call_ns_p99': percentile(latencies, 0.99),
+        'lines_per_second': num_lines / best,
+        'syscalls_per_line': None if syscalls is None else syscalls / num_lines,
+        'opens_per_line': opens[0] / num_lines,
+        'peak_memory_bytes': peak,
+    }
+
+
+def bench_readers(calls, num_lines, repeat):
+    """
+    Measure reading the game back as .catan and as .catanb.
+
+    :return: dict of reader name -> dict of metrics
+    """
+    results = dict()
+    with tempfile.TemporaryDirectory() as log_dir:
+        log = make_log('buffered', log_dir)
+        replay(log, calls)
+        text_path = log.logpath()
+        binary_path = os.path.join(log_dir, 'game.catanb')
+        catanlog_binary.text_to_binary(text_path, binary_path)
+        for name, path, read in (('catanlog_reader', text_path, catanlog_reader.read),
+                                 ('catanlog_binary', binary_path, catanlog_binary.read)):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for _ in read(path):
+                    pass
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = {'seconds': best, 'lines_per_second': num_lines / best,
+                             'file_bytes': os.path.getsize(path)}
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(turns=200, players=4, trade_rate=0.5, dev_card_rate=0.2, seed=0, repeat=5, modes=MODES):
+    """
+    Run the benchmark suite, and return its results as a JSON-serializable dict
+    """
+    calls = synthetic_game(turns, players, trade_rate, dev_card_rate, seed)
+    reference = catanlog.CatanLog(auto_flush=False)
+    for name, args in calls:
+        getattr(reference, name)(*args)
+    num_lines = reference.dump().count('\n')
+
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'turns': turns, 'players': players, 'trade_rate': trade_rate,
+                   'dev_card_rate': dev_card_rate, 'seed': seed, 'repeat': repeat},
+        'calls': len(calls),
+        'lines': num_lines,
+        'writers': {mode: bench_mode(mode, calls, num_lines, repeat) for mode in modes},
+        'readers': bench_readers(calls, num_lines, repeat),
+    }
+
+
+def report(results, baseline=None):
+    """
+    Print results as a table, with ratios to the baseline's results where given
+    """
+    print('{} calls, {} lines, commit {}'.format(results['calls'], results['lines'], results['commit']))
+    if baseline is not None and baseline.get('params') != results['params']:
+        print('warning: comparing against a run with different params: {}'.format(baseline.get('params')))
+    for section in ('writers', 'readers'):
+        for name, metrics in sorted(results[section].items()):
+            print('{}:'.format(name))
+            for metric, value in sorted(metrics.items()):
+                line = '    {:>20}: {}'.format(metric, 'n/a' if value is None else '{:.6g}'.format(value))
+                old = (baseline or dict()).get(section, dict()).get(name, dict()).get(metric)
+                if old and value is not None:
+                    line += '  ({:.2f}x of {})'.format(value / old, baseline.get('commit'))
+                print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark the CatanLog writer modes and readers')
+    parser.add_argument('--turns', type=int, default=200, help='turns per game')
+    parser.add_argument('--players', type=int, default=4, help='players per game, up to {}'.format(len(COLORS)))
+    parser.add_argument('--trade-rate', type=float, default=0.5, help='chance of each kind of trade per turn')
+    parser.add_argument('--dev-card-rate', type=float, default=0.2, help='chance of a dev card per turn')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per mode, the best is kept')
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--output', default=None, help='write the results to this JSON file')
+    parser.add_argument('--compare', default=None, help='JSON results of an earlier run to compare against')
+    args = parser.parse_args(argv)
+
+    results = run(args.turns, args.players, args.trade_rate, args.dev_card_rate, args.seed, args.repeat, args.modes)
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare, 'r') as fp:
+            baseline = json.load(fp)
+    report(results, baseline)
+    if args.output is not None:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
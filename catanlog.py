@@ -3,10 +3,14 @@ module catanlog provides a reference implementation for the catanlog (.catan) fi
 
 See class CatanLog for documentation.
 """
+import bisect
 import copy
 import datetime
+import mmap
 import os
+import socket
 import sys
+import time
 
 __version__ = '0.9.3'
 
@@ -26,35 +30,136 @@ class CatanLog(object):
 
     Use #dump to get the log as a string.
     Use #flush to write the log to a file.
+    Use #close to flush and release the file handle when keep_open=True.
 
     TODO maybe log private information as well (which dev card picked up, which card stolen)
     """
-    def __init__(self, auto_flush=True, log_dir='log', use_stdout=False):
+    def __init__(self, auto_flush=True, log_dir='log', use_stdout=False,
+                 keep_open=False, flush_size=4096, flush_interval=1.0, fmt='catan', index=False,
+                 compression=None, metrics=None, exclusive=False, shard=None, keep_lines=None,
+                 stats=None):
         """
         Create a CatanLog object using the given options. The defaults are fine.
 
+        By default, every log() call opens the logfile, appends to it, and closes it again, so
+        the file on disk is always complete. With keep_open=True, one file handle is held for
+        the whole game and auto_flush coalesces writes: the log is only flushed at the end of
+        a line, once flush_size characters are pending or flush_interval seconds have passed
+        since the last flush, and always when a player wins.
+
         :param auto_flush: flush the log to file after every log() call, bool
         :param log_dir: directory to write the log to, str
         :param use_stdout: if True, flush() will write to stdout instead of to file
-        """
-        self._buffer = str()
+        :param keep_open: if True, hold the logfile open between flushes, bool
+        :param flush_size: with keep_open, flush once this many characters are pending, int
+        :param flush_interval: with keep_open, flush once this many seconds have passed, float
+        :param fmt: 'catan' to write text, 'catanb' to write the binary encoding of module
+                    catanlog_binary, or 'catanref' to write text whose board layouts are stored
+                    once in log_dir/layouts, see module catanlog_layout. dump() returns the
+                    full text in every case.
+        :param index: if True, write a sidecar index of turns and rolls next to the logfile, for
+                      random access with catanlog_index.IndexedLog, bool
+        :param compression: None, or 'gzip', 'lzma' or 'zstd' to compress the logfile as described
+                            in module catanlog_compress. The method's suffix is appended to the
+                            logfile's name. Call close() to end the compressed stream.
+        :param metrics: catanlog_metrics.Metrics to count this log's calls, flushes and files
+                        in, or None to count nothing
+        :param exclusive: if True, each game gets a new logfile, created with O_EXCL so that no
+                          other log, in this process or another, can claim the same name. A name
+                          already taken gets a '-1', '-2', ... suffix. bool
+        :param shard: subdirectory of log_dir to write to, str, or True for one per host and
+                      process, named '<hostname>-<pid>', so that parallel workers never contend
+                      for names
+        :param keep_lines: if an int, drop lines from memory once they are flushed, keeping
+                           only the latest keep_lines of them for eraseln. dump() then reads
+                           the rest back from the logfile, so a game's memory stays bounded
+                           however long it runs. Requires an uncompressed .catan logfile.
+                           None, the default, keeps the whole game in memory.
+        :param stats: catanlog_stats.Stats to count this log's rolls, builds, trades and turns
+                      in as they are logged, or None
+        """
+        self._buffer = _LineBuffer()
 
         self._chars_flushed = 0
         self._auto_flush = auto_flush
         self._log_dir = log_dir
         self._use_stdout = use_stdout
 
+        self._keep_open = keep_open
+        self._flush_size = flush_size
+        self._flush_interval = flush_interval
+        self._last_flush_time = time.monotonic()
+        self._logpath = None
+        self._file = None
+        self._file_path = None
+        self._exclusive = exclusive
+        self._shard = shard
+
+        if fmt not in ('catan', 'catanb', 'catanref'):
+            raise ValueError('fmt must be one of: catan, catanb, catanref')
+        self._fmt = fmt
+        self._encoder = self._new_encoder()
+
+        self._compressor = None
+        if compression is not None:
+            import catanlog_compress
+            self._compressor = catanlog_compress.Compressor(compression)
+            if compression == 'lzma' and auto_flush and not keep_open:
+                raise ValueError('lzma compression writes a stream per flush, so it requires '
+                                 'keep_open=True or auto_flush=False')
+
+        if index and (use_stdout or fmt != 'catan' or compression is not None):
+            raise ValueError('index requires an uncompressed .catan logfile')
+        self._index = index
+        self._index_writer = None
+
+        if keep_lines is not None and (use_stdout or fmt != 'catan' or compression is not None):
+            raise ValueError('keep_lines requires an uncompressed .catan logfile')
+        self._keep_lines = keep_lines
+        self._dropped_bytes = 0
+
         self._game_start_timestamp = datetime.datetime.now()
         self._latest_timestamp = copy.deepcopy(self._game_start_timestamp)
         self._players = list()
 
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.attach(self)
+        self.stats = stats
+        if stats is not None:
+            stats.attach(self)
+
+    def _new_encoder(self):
+        """
+        Return an encoder from text to the bytes of fmt, or None to write text as it is
+        """
+        if self._fmt == 'catanb':
+            import catanlog_binary
+            return catanlog_binary.Encoder()
+        elif self._fmt == 'catanref':
+            import catanlog_layout
+            return catanlog_layout.Encoder(os.path.join(self._dir(), catanlog_layout.LAYOUT_DIR))
+        return None
+
     def _log(self, content):
         """
         Write a string to the log
         """
-        self._buffer += content
+        self._buffer.append(content)
         if self._auto_flush:
-            self.flush()
+            if not self._keep_open:
+                # a compressed log is flushed a whole line at a time, as every flush costs bytes
+                if self._compressor is None or content.endswith('\n'):
+                    self.flush()
+            elif content.endswith('\n') and self._flush_due():
+                self.flush()
+
+    def _flush_due(self):
+        """
+        With keep_open, whether enough characters or time have built up to warrant a flush
+        """
+        return (len(self._buffer) - self._chars_flushed >= self._flush_size or
+                time.monotonic() - self._last_flush_time >= self._flush_interval)
 
     def _logln(self, content):
         """
@@ -62,31 +167,104 @@ class CatanLog(object):
         """
         self._log('{0}\n'.format(content))
 
-    def eraseln(self):
+    def eraseln(self, count=1):
         """
-        Erase the latest line from the log
+        Erase the latest count lines from the log. A line still being written counts as the latest.
+
+        Lines which were already flushed are erased from the logfile too, by truncating it, so
+        the file and dump() stay the same. This is not possible once they are encoded as .catanb
+        or compressed, which raises ValueError. Erasing takes time proportional to the text erased.
+
+        :param count: int, number of lines to erase
         """
-        self._buffer = '\n'.join(self._buffer.split('\n')[:-2])
+        if count < 1:
+            raise ValueError('count must be at least 1')
+        start = self._buffer.erase_start(count)
+        if start >= self._chars_flushed:
+            self._buffer.erase_lines(count)
+            return
+        if not self._use_stdout and (self._encoder is not None or self._compressor is not None):
+            raise ValueError('cannot erase lines already flushed to a .catanb, .catanref or compressed logfile')
+        erased = self._buffer.erase_lines(count)
+        nbytes = len(erased[:self._chars_flushed - start].encode('utf-8'))
+        self._chars_flushed = start
+        if not self._use_stdout:
+            self._truncate(nbytes)
+            if self._index_writer is not None:
+                self._index_writer.truncate(nbytes)
 
     def reset(self):
         """
         Erase the log and reset the timestamp
         """
-        self._buffer = ''
+        self._end_stream()
+        self._close_file()
+        self._close_index_writer()
+        self._buffer.clear()
         self._chars_flushed = 0
+        self._dropped_bytes = 0
+        self._encoder = self._new_encoder()
         self._game_start_timestamp = datetime.datetime.now()
+        self._release_logpath()
+
+    def resume(self, path, tail_size=4096):
+        """
+        Continue the last game in an existing logfile, eg after a restart. Later log() calls
+        append to it as if this log had written it.
+
+        The players, their seats and the timestamp are read from the game's header, and about
+        tail_size bytes of complete lines from the end of the file are kept in memory, for
+        eraseln. The rest of the file is not read: the header is found by searching backwards
+        from the end. dump() reads back what is not in memory, as with keep_lines. The turn in
+        progress is taken to have begun when the file was last written.
+
+        :param path: str, path to an uncompressed .catan logfile
+        :param tail_size: int, bytes to read from the end of the file
+        """
+        if self._use_stdout or self._fmt != 'catan' or self._compressor is not None:
+            raise ValueError('resume requires an uncompressed .catan logfile')
+        import catanlog_reader
+        header_lines, game_start, tail_start, tail = _read_game(path, tail_size, self._open)
+        parser = catanlog_reader.Parser()
+        header = [event for line in header_lines for event in parser.feed(line)][0]
+
+        self.reset()
+        self._game_start_timestamp = header.timestamp
+        self._latest_timestamp = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+        self._set_players(header.players)
+        self._logpath = path
+        # offsets before the tail count bytes: they only need to be consistent with each other
+        self._buffer.start = self._dropped_bytes = tail_start - game_start
+        self._buffer.append(tail)
+        self._chars_flushed = len(self._buffer)
 
     def dump(self):
         """
-        Dump the entire log to a string, and return it
+        Dump the entire log to a string, and return it.
+
+        With keep_lines, the lines no longer in memory are read back from the end of the logfile.
         """
-        return self._buffer
+        if not self._dropped_bytes:
+            return self._buffer.getvalue()
+        kept = self._buffer.tail(self._buffer.start)
+        kept_bytes = len(kept[:self._chars_flushed - self._buffer.start].encode('utf-8'))
+        self._sync()
+        with self._open(self.logpath(), 'rb') as fp:
+            fp.seek(-(self._dropped_bytes + kept_bytes), os.SEEK_END)
+            return fp.read(self._dropped_bytes).decode('utf-8') + kept
+
+    def _sync(self):
+        """
+        Make sure everything flushed is in the logfile, for reading it back
+        """
+        if self._file is not None:
+            self._file.flush()
 
     def _latest(self):
         """
         Get all characters written to _log since the last flush()
         """
-        return self._buffer[self._chars_flushed:]
+        return self._buffer.tail(self._chars_flushed)
 
     def logpath(self):
         """
@@ -96,14 +274,52 @@ class CatanLog(object):
 
         The filename contains the log's timestamp and the names of players in the game.
         The logpath changes when reset() or _set_players() are called, as they change the
-        timestamp and the players, respectively.
+        timestamp and the players, respectively. Between those calls the path is cached.
+
+        With exclusive, the file is created when the path is first asked for.
         """
-        name = '{}-{}.catan'.format(self.timestamp_str(),
-                                    '-'.join([p.name for p in self._players]))
-        path = os.path.join(self._log_dir, name)
-        if not os.path.exists(self._log_dir):
-            os.mkdir(self._log_dir)
-        return path
+        if self._logpath is None:
+            stem = '{}-{}'.format(self.timestamp_str(), '-'.join([p.name for p in self._players]))
+            suffix = self._suffix()
+            log_dir = self._dir()
+            # makedirs with exist_ok does not race with other processes creating the directory
+            os.makedirs(log_dir, exist_ok=True)
+            if self._exclusive and not self._use_stdout:
+                self._logpath = _create_exclusive(os.path.join(log_dir, stem), suffix, self._open)
+            else:
+                self._logpath = os.path.join(log_dir, stem + suffix)
+        return self._logpath
+
+    def _suffix(self):
+        """
+        Return the suffix of the logfile, eg '.catan', or '.catanb.gz' for compressed .catanb
+        """
+        suffix = '.' + self._fmt
+        if self._compressor is not None:
+            import catanlog_compress
+            suffix += catanlog_compress.SUFFIXES[self._compressor.method]
+        return suffix
+
+    def _dir(self):
+        """
+        Return the directory of the logfile: log_dir, or its shard
+        """
+        if self._shard is None:
+            return self._log_dir
+        shard = self._shard if self._shard is not True else '{}-{}'.format(socket.gethostname(), os.getpid())
+        return os.path.join(self._log_dir, shard)
+
+    def _release_logpath(self):
+        """
+        Forget the logpath, removing the file created for it by exclusive if nothing was written
+        """
+        if self._exclusive and self._logpath is not None and self._chars_flushed == 0:
+            try:
+                if os.path.getsize(self._logpath) == 0:
+                    os.remove(self._logpath)
+            except OSError:
+                pass
+        self._logpath = None
 
     def timestamp_str(self):
         return self._game_start_timestamp.strftime('%Y-%m-%d %H:%M:%S')
@@ -115,17 +331,119 @@ class CatanLog(object):
         """
         latest = self._latest()
         self._chars_flushed += len(latest)
+        self._last_flush_time = time.monotonic()
+        data = latest if self._encoder is None else self._encoder.feed(latest)
+        if self._compressor is not None:
+            data = self._compressor.feed(data)
+
+        if self._index:
+            self._open_index_writer()
+        self._write(data)
+        if self._index:
+            self._index_writer.write(latest)
+        if self._keep_lines is not None:
+            self._dropped_bytes += len(self._buffer.drop(self._chars_flushed, self._keep_lines).encode('utf-8'))
+
+    def _write(self, data):
+        """
+        Write flushed data to stdout or to the logfile.
+
+        :param data: str, or bytes when writing .catanb or compressing
+        """
         if self._use_stdout:
-            file = sys.stdout
+            file = sys.stdout if isinstance(data, str) else sys.stdout.buffer
+        elif self._keep_open:
+            file = self._open_file()
         else:
-            file = open(self.logpath(), 'a')
+            file = self._open(self.logpath(), self._mode())
 
-        print(latest, file=file, flush=True, end='')
+        if isinstance(data, str):
+            print(data, file=file, flush=True, end='')
+        else:
+            file.write(data)
+            file.flush()
 
-        if not self._use_stdout:
+        if not self._use_stdout and not self._keep_open:
             file.close()
 
-    def log_game_start(self, players, terrain, numbers, ports):
+    def _truncate(self, nbytes):
+        """
+        Remove the last nbytes written from the logfile
+        """
+        if self._file is not None:
+            self._file.flush()
+            fd = self._file.fileno()
+            os.ftruncate(fd, os.fstat(fd).st_size - nbytes)
+        else:
+            path = self.logpath()
+            os.truncate(path, os.path.getsize(path) - nbytes)
+
+    def close(self):
+        """
+        Flush the log and close the logfile, if keep_open left it open.
+
+        Logging may continue after close(); the logfile is reopened on the next flush.
+        """
+        if self._latest():
+            self.flush()
+        self._end_stream()
+        self._close_file()
+        self._close_index_writer()
+
+    def _end_stream(self):
+        """
+        With compression, end the compressed stream in the logfile, if one was begun
+        """
+        if self._compressor is not None and self._compressor.started:
+            self._write(self._compressor.finish())
+
+    def _open_file(self):
+        """
+        Return the held file handle for the current logpath, (re)opening it if necessary
+        """
+        path = self.logpath()
+        if self._file is None or self._file_path != path:
+            self._close_file()
+            self._file = self._open(path, self._mode())
+            self._file_path = path
+        return self._file
+
+    def _open_index_writer(self):
+        """
+        Start following the current logpath with an index writer, if not already
+        """
+        path = self.logpath()
+        if self._index_writer is None or self._index_writer.log_path != path:
+            import catanlog_index
+            self._close_index_writer()
+            offset = os.path.getsize(path) if os.path.exists(path) else 0
+            self._index_writer = catanlog_index.IndexWriter(path, offset, keep_open=self._keep_open,
+                                                            opener=self._open)
+
+    def _close_index_writer(self):
+        if self._index_writer is not None:
+            self._index_writer.close()
+            self._index_writer = None
+
+    def _open(self, path, mode):
+        return open(path, mode)
+
+    def _mode(self):
+        return 'a' if self._encoder is None and self._compressor is None else 'ab'
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._file_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def log_game_start(self, players, terrain, numbers, ports, timestamp=None):
         """
         Begin a game.
 
@@ -137,8 +455,11 @@ class CatanLog(object):
         :param terrain: list of 19 catan.board.Terrain objects.
         :param numbers: list of 19 catan.board.HexNumber objects.
         :param ports: list of catan.board.Port objects.
+        :param timestamp: datetime.datetime, the game's timestamp if not now, eg when re-logging a game
         """
         self.reset()
+        if timestamp is not None:
+            self._game_start_timestamp = timestamp
         self._set_players(players)
         self._logln('{} v{}'.format(__name__, __version__))
         self._logln('timestamp: {0}'.format(self.timestamp_str()))
@@ -312,12 +633,15 @@ class CatanLog(object):
         """
         self._logln('{0} plays victory point'.format(player.color))
 
-    def log_player_ends_turn(self, player):
+    def log_player_ends_turn(self, player, seconds=None):
         """
         :param player: catan.game.Player
+        :param seconds: integer, the length of the turn if not measured since the last turn ended
         """
-        seconds_delta = (datetime.datetime.now() - self._latest_timestamp).total_seconds()
-        self._logln('{0} ends turn after {1}s'.format(player.color, round(seconds_delta)))
+        if seconds is None:
+            seconds_delta = (datetime.datetime.now() - self._latest_timestamp).total_seconds()
+            seconds = round(seconds_delta)
+        self._logln('{0} ends turn after {1}s'.format(player.color, seconds))
         self._latest_timestamp = datetime.datetime.now()
 
     def log_player_wins(self, player):
@@ -325,6 +649,49 @@ class CatanLog(object):
         :param player: catan.game.Player
         """
         self._logln('{0} wins'.format(player.color))
+        if self._keep_open and self._auto_flush:
+            self.flush()
+
+    def log_events(self, events):
+        """
+        Log many events at once, as the log_player_* methods would one by one.
+
+        Each event is a tuple of the kind of event, the player, and the remaining arguments
+        of its log_player_* method: eg ('roll', player, 6) for log_player_roll(player, 6).
+        The kinds are the names of the log_player_* methods without the 'log_player_' prefix.
+        See EVENT_KINDS.
+
+        The events are formatted together, appended to the log in one write and, with
+        auto_flush, flushed once. The text is identical to that of the log_player_* methods.
+
+        :param events: iterable of tuples (kind, catan.game.Player, args...)
+        """
+        prefixes = dict()
+        lines = list()
+        wins = False
+        for kind, player, *args in events:
+            prefix = prefixes.get(id(player))
+            if prefix is None:
+                prefix = prefixes[id(player)] = player.color + ' '
+            if kind == 'ends_turn':
+                now = datetime.datetime.now()
+                if not args or args[0] is None:
+                    args = [round((now - self._latest_timestamp).total_seconds())]
+                self._latest_timestamp = now
+            elif kind == 'wins':
+                wins = True
+            elif kind == 'plays_knight':
+                lines.append(prefix + 'plays knight\n')
+            try:
+                formatter = _formatters[kind]
+            except KeyError:
+                raise ValueError('unknown event kind: {}'.format(kind))
+            lines.append(formatter(prefix, *args))
+        if not lines:
+            return
+        self._buffer.extend(lines)
+        if self._auto_flush and (not self._keep_open or wins or self._flush_due()):
+            self.flush()
 
     def _log_board_terrain(self, terrain):
         """
@@ -371,20 +738,261 @@ class CatanLog(object):
         Players will always be set in seat order (1,2,3,4)
         """
         self._players = list()
+        self._release_logpath()
         _players = list(_players)
         _players.sort(key=lambda p: p.seat)
         for p in _players:
             self._players.append(p)
 
 
+def _create_exclusive(stem, suffix, opener=open):
+    """
+    Create an empty file named stem + suffix, or stem-1 + suffix, stem-2 + suffix, ... for the
+    first name no other process has taken, and return its path
+
+    :param opener: function(path, mode) returning an open file, eg a CatanLog's _open
+    """
+    n = 0
+    while True:
+        path = '{}{}{}'.format(stem, '-{}'.format(n) if n else '', suffix)
+        try:
+            # mode 'x' creates the file with O_EXCL
+            opener(path, 'x').close()
+            return path
+        except FileExistsError:
+            n += 1
+
+
+def _read_game(path, tail_size, opener=open):
+    """
+    Find the last game in a .catan file without reading the rest of it.
+
+    :param opener: function(path, mode) returning an open file, eg a CatanLog's _open
+    :return: (lines of its header, offset of its header, offset of its tail, text of its tail).
+             The tail holds the complete lines in the last tail_size bytes of the game, and the
+             line the file ends partway through, if any.
+    """
+    with opener(path, 'rb') as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if not size:
+            raise ValueError('no game in {}'.format(path))
+        version = '{} v'.format(__name__).encode('utf-8')
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end = mm.rfind(b'\n...CATAN!\n') + 1
+            game_start = mm.rfind(b'\n' + version, 0, header_end) + 1
+            if not header_end or mm[game_start:game_start + len(version)] != version:
+                raise ValueError('no game in {}'.format(path))
+            header_end += len(b'...CATAN!\n')
+            header_lines = mm[game_start:header_end].decode('utf-8').splitlines(True)
+            tail_start = max(header_end, size - tail_size)
+            if tail_start > header_end:
+                # the tail begins after a newline, so it is never split partway through a character
+                tail_start = mm.find(b'\n', tail_start - 1) + 1 or size
+            tail = mm[tail_start:].decode('utf-8')
+    return header_lines, game_start, tail_start, tail
+
+
+def _format_items(items):
+    return '[' + ', '.join([str(num) + ' ' + res.value for num, res in items]) + ']'
+
+
+def _format_roll(prefix, roll):
+    deuces = roll == 2 if type(roll) is int else int(roll) == 2
+    return prefix + 'rolls ' + str(roll) + (' ...DEUCES!\n' if deuces else '\n')
+
+
+def _format_moves_robber_and_steals(prefix, location, victim):
+    return prefix + 'moves robber to ' + str(location) + ', steals from ' + victim.color + '\n'
+
+
+def _format_trades_with_port(prefix, to_port, port, to_player):
+    return (prefix + 'trades ' + _format_items(to_port) + ' to port ' + port.type.value + ' for ' +
+            _format_items(to_player) + '\n')
+
+
+def _format_trades_with_other_player(prefix, to_other, other, to_player):
+    return (prefix + 'trades ' + _format_items(to_other) + ' to player ' + other.color + ' for ' +
+            _format_items(to_player) + '\n')
+
+
+_formatters = {
+    'roll': _format_roll,
+    'moves_robber_and_steals': _format_moves_robber_and_steals,
+    'buys_road': '{}buys road, builds at {}\n'.format,
+    'buys_settlement': '{}buys settlement, builds at {}\n'.format,
+    'buys_city': '{}buys city, builds at {}\n'.format,
+    'buys_dev_card': '{}buys dev card\n'.format,
+    'trades_with_port': _format_trades_with_port,
+    'trades_with_other_player': _format_trades_with_other_player,
+    # log_events writes the 'plays knight' line, and then the robber's move with this formatter
+    'plays_knight': _format_moves_robber_and_steals,
+    'plays_road_builder': '{}plays road builder, builds at {} and {}\n'.format,
+    'plays_year_of_plenty': lambda prefix, resource1, resource2: '{}plays year of plenty, takes {} and {}\n'.format(
+        prefix, resource1.value, resource2.value),
+    'plays_monopoly': lambda prefix, resource: prefix + 'plays monopoly on ' + resource.value + '\n',
+    'plays_victory_point': '{}plays victory point\n'.format,
+    'ends_turn': '{}ends turn after {}s\n'.format,
+    'wins': '{}wins\n'.format,
+}
+
+EVENT_KINDS = tuple(_formatters)
+
+
+class _LineBuffer(object):
+    """
+    class _LineBuffer is the append-only text store behind CatanLog.
+
+    Complete lines are kept as a list of segments, alongside the offset at which each one
+    ends. The line currently being written is kept as a list of pieces. Appending, erasing
+    the latest line and reading everything after an offset cost time proportional to the
+    text they touch, not to the length of the whole log.
+
+    The oldest lines may be dropped, see drop(). Offsets still count from the start of the
+    text, and start is the offset of the first line kept.
+    """
+    def __init__(self):
+        self._lines = list()
+        self._ends = list()
+        self._partial = list()
+        self._partial_len = 0
+        self.start = 0
+
+    def __len__(self):
+        return self._complete_len() + self._partial_len
+
+    def _complete_len(self):
+        return self._ends[-1] if self._ends else self.start
+
+    def clear(self):
+        self._lines = list()
+        self._ends = list()
+        self._partial = list()
+        self._partial_len = 0
+        self.start = 0
+
+    def append(self, content):
+        """
+        Append a string, which may complete, contain, or begin any number of lines
+        """
+        if '\n' not in content:
+            if content:
+                self._partial.append(content)
+                self._partial_len += len(content)
+            return
+        pieces = content.split('\n')
+        self._partial.append(pieces[0])
+        self._end_line(''.join(self._partial) + '\n')
+        for piece in pieces[1:-1]:
+            self._end_line(piece + '\n')
+        last = pieces[-1]
+        self._partial = [last] if last else list()
+        self._partial_len = len(last)
+
+    def extend(self, lines):
+        """
+        Append a list of complete lines, each ending in a newline
+        """
+        if self._partial:
+            self.append(''.join(lines))
+            return
+        end = self._complete_len()
+        ends = self._ends
+        for line in lines:
+            end += len(line)
+            ends.append(end)
+        self._lines.extend(lines)
+
+    def _end_line(self, line):
+        self._lines.append(line)
+        self._ends.append(self._complete_len() + len(line))
+
+    def erase_start(self, count):
+        """
+        Return the offset from which erase_lines(count) would erase
+        """
+        keep = len(self._lines) - count + (1 if self._partial else 0)
+        if keep < 0 and self.start:
+            raise ValueError('only the latest {} lines are kept in memory'.format(count + keep))
+        return self._ends[keep - 1] if keep > 0 else self.start
+
+    def erase_lines(self, count):
+        """
+        Erase the latest count lines, counting a line still being written as the latest, and
+        return the text erased
+        """
+        start = self.erase_start(count)
+        erased = self.tail(start)
+        keep = bisect.bisect_right(self._ends, start)
+        del self._lines[keep:]
+        del self._ends[keep:]
+        self._partial = list()
+        self._partial_len = 0
+        return erased
+
+    def drop(self, end, keep):
+        """
+        Forget the complete lines ending at or before offset end, except the latest keep lines,
+        and return the text forgotten. Lines are forgotten in batches of more than keep, so
+        that dropping costs constant time per line.
+        """
+        count = min(bisect.bisect_right(self._ends, end), len(self._lines) - keep)
+        if count <= keep:
+            return ''
+        dropped = ''.join(self._lines[:count])
+        self.start = self._ends[count - 1]
+        del self._lines[:count]
+        del self._ends[:count]
+        return dropped
+
+    def tail(self, start):
+        """
+        Return all text from offset start onwards
+        """
+        if start < self.start:
+            raise ValueError('text before offset {} is no longer in memory'.format(self.start))
+        partial = ''.join(self._partial)
+        self._partial = [partial] if partial else list()
+        complete_len = self._complete_len()
+        if start >= complete_len:
+            return partial[start - complete_len:]
+        i = bisect.bisect_right(self._ends, start)
+        line_start = self._ends[i - 1] if i > 0 else self.start
+        return ''.join([self._lines[i][start - line_start:]] + self._lines[i + 1:] + [partial])
+
+    def getvalue(self):
+        return self.tail(0)
+
+
+def _noop(*args, **kwargs):
+    return None
+
+
+def _with_noop_methods(cls):
+    """
+    Give cls a no-op staticmethod for every public method of CatanLog
+    """
+    for name in dir(CatanLog):
+        if not name.startswith('_') and callable(getattr(CatanLog, name)):
+            setattr(cls, name, staticmethod(_noop))
+    return cls
+
+
+@_with_noop_methods
 class NoopCatanLog(object):
     """
     class NoopCatanLog implements no-op versions of all methods defined by CatanLog.
 
     It can be used in place of a CatanLog instance if the caller does not want any
-    logging to occur.
+    logging to occur. Its methods are defined once, when the module is imported, and
+    accept any arguments.
     """
+    __slots__ = ()
+
     def __getattr__(self, name):
-        def method(*args):
-            return None
-        return method
+        return _noop
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
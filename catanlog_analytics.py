@@ -0,0 +1,280 @@
+"""
+module catanlog_analytics computes aggregate statistics over directories of catanlog files.
+
+Each file is parsed in a streaming fashion by a worker in a process pool, and reduced to a
+small Summary. Summaries of files are merged into one Summary for the whole corpus.
+
+    $ python -m catanlog_analytics log/ --workers 8 --cache log/.analytics.json
+
+See function analyze for documentation.
+"""
+import argparse
+import collections
+import concurrent.futures
+import glob
+import json
+import os
+import sys
+
+import catanlog_compress
+import catanlog_reader as reader
+
+
+BUILD_ORDER_LENGTH = 5
+
+_pieces = {
+    reader.BuysRoad: 'road',
+    reader.BuysSettlement: 'settlement',
+    reader.BuysCity: 'city',
+    reader.BuysDevCard: 'dev card',
+}
+
+
+class Summary(object):
+    """
+    class Summary holds aggregate statistics of any number of games.
+
+    Every statistic is a counter, so summaries of disjoint sets of games merge by addition.
+
+    - games: number of games
+    - rolls: roll value -> count
+    - seats: seat -> games played from that seat
+    - wins: seat -> games won from that seat
+    - build_orders: the first BUILD_ORDER_LENGTH pieces a player built, as 'settlement,road,...' -> count
+    - trades: port type, or 'player' for trades between players -> number of trades
+    - trade_volume: port type, or 'player' -> number of resources given
+    - turn_seconds: turn length in seconds -> count
+    """
+    fields = ('rolls', 'seats', 'wins', 'build_orders', 'trades', 'trade_volume', 'turn_seconds')
+
+    def __init__(self):
+        self.games = 0
+        for field in self.fields:
+            setattr(self, field, collections.Counter())
+
+    def add(self, events):
+        """
+        Add the games in a stream of events, as yielded by catanlog_reader.parse()
+        """
+        seats = dict()
+        builds = dict()
+        for event in events:
+            kind = type(event)
+            if kind is reader.Header:
+                self._end_game(builds)
+                self.games += 1
+                seats = {p.color: p.seat for p in event.players}
+                builds = {color: list() for color in seats}
+                self.seats.update(seats.values())
+            elif kind is reader.Roll:
+                self.rolls[event.roll] += 1
+            elif kind in _pieces:
+                builds.setdefault(event.player, list()).append(_pieces[kind])
+            elif kind is reader.PlaysRoadBuilder:
+                builds.setdefault(event.player, list()).extend(['road', 'road'])
+            elif kind is reader.TradesWithPort:
+                self.trades[event.port] += 1
+                self.trade_volume[event.port] += sum(num for num, _ in event.to_port)
+            elif kind is reader.TradesWithPlayer:
+                self.trades['player'] += 1
+                self.trade_volume['player'] += sum(num for num, _ in event.to_other)
+            elif kind is reader.EndsTurn:
+                self.turn_seconds[event.seconds] += 1
+            elif kind is reader.Wins and event.player in seats:
+                self.wins[seats[event.player]] += 1
+        self._end_game(builds)
+
+    def _end_game(self, builds):
+        for pieces in builds.values():
+            if pieces:
+                self.build_orders[','.join(pieces[:BUILD_ORDER_LENGTH])] += 1
+
+    def merge(self, other):
+        """
+        Add the games of another Summary to this one, and return this one
+        """
+        self.games += other.games
+        for field in self.fields:
+            getattr(self, field).update(getattr(other, field))
+        return self
+
+    def win_rates(self):
+        return {seat: self.wins[seat] / played for seat, played in sorted(self.seats.items())}
+
+    def mean_turn_seconds(self):
+        turns = sum(self.turn_seconds.values())
+        return sum(s * n for s, n in self.turn_seconds.items()) / turns if turns else None
+
+    def to_dict(self):
+        d = {'games': self.games}
+        for field in self.fields:
+            d[field] = {str(k): v for k, v in getattr(self, field).items()}
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        summary = cls()
+        summary.games = d['games']
+        for field in cls.fields:
+            counter = getattr(summary, field)
+            for k, v in d[field].items():
+                counter[int(k) if field in ('rolls', 'seats', 'wins', 'turn_seconds') else k] = v
+        return summary
+
+
+def summarize_file(path):
+    """
+    Summarize the games in one .catan, .catanb or .catanref file, compressed or not.
+
+    :return: (path, Summary as a dict, or None if the file could not be read or parsed,
+              error message or None)
+    """
+    summary = Summary()
+    try:
+        if catanlog_compress.strip_suffix(path).endswith('.catanb'):
+            import catanlog_binary
+            summary.add(catanlog_binary.read(path))
+        elif catanlog_compress.strip_suffix(path).endswith('.catanref'):
+            import catanlog_layout
+            summary.add(catanlog_layout.read(path))
+        else:
+            summary.add(reader.read(path))
+    except (OSError, ValueError, UnicodeDecodeError) as e:
+        return path, None, str(e)
+    return path, summary.to_dict(), None
+
+
+def _summarize_files(paths):
+    return [summarize_file(path) for path in paths]
+
+
+def find_logs(paths):
+    """
+    Expand directories and glob patterns into a sorted list of log files
+    """
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.update(os.path.join(root, f) for f in files
+                             if catanlog_compress.strip_suffix(f).endswith(('.catan', '.catanb', '.catanref')))
+        else:
+            found.update(glob.glob(path))
+    return sorted(found)
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime, stat.st_size]
+
+
+def analyze(paths, workers=None, cache=None, chunksize=64, errors=None):
+    """
+    Summarize every log in paths, using a pool of worker processes.
+
+    Files are handed to workers chunksize at a time, with a bounded number of chunks in
+    flight, and each result is merged into the total as it arrives. Without a cache, only
+    the paths of the files are held, not a summary per file.
+
+    With a cache, the summary of each file is kept in a JSON file keyed by path along with
+    the file's mtime and size. Files whose mtime and size are unchanged since the last run are
+    not parsed again, and files no longer present drop out of the result. Files which could not
+    be read or parsed are not cached, so they are tried, and reported, again on the next run.
+
+    :param paths: list of str, log files, directories or glob patterns
+    :param workers: int, number of worker processes, default os.cpu_count()
+    :param cache: str, path of the JSON cache file, or None for no cache
+    :param chunksize: int, files per task
+    :param errors: list, if given, (path, message) is appended for each file which could not be read
+                   or parsed
+    :return: Summary
+    """
+    files = find_logs(paths)
+    cached = dict()
+    if cache is not None and os.path.exists(cache):
+        with open(cache, 'r') as fp:
+            cached = json.load(fp)
+
+    total = Summary()
+    # summaries of single files are only kept to be written to the cache
+    entries = dict() if cache is not None else None
+    todo = list()
+    for path in files:
+        if entries is None:
+            todo.append(path)
+            continue
+        try:
+            stamp = _stamp(path)
+        except OSError as e:
+            if errors is not None:
+                errors.append((path, str(e)))
+            continue
+        entry = cached.get(path)
+        if entry is not None and entry['stamp'] == stamp and entry['summary'] is not None:
+            entries[path] = entry
+            total.merge(Summary.from_dict(entry['summary']))
+        else:
+            entries[path] = {'stamp': stamp, 'summary': None}
+            todo.append(path)
+    cached = None
+
+    chunks = [todo[i:i + chunksize] for i in range(0, len(todo), chunksize)]
+    if chunks:
+        max_in_flight = 4 * (workers or os.cpu_count() or 1)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = set()
+            for chunk in chunks:
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = concurrent.futures.wait(
+                        in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    _collect(done, total, entries, errors)
+                in_flight.add(pool.submit(_summarize_files, chunk))
+            done, _ = concurrent.futures.wait(in_flight)
+            _collect(done, total, entries, errors)
+
+    if cache is not None:
+        with open(cache, 'w') as fp:
+            json.dump(entries, fp)
+    return total
+
+
+def _collect(futures, total, entries, errors):
+    """
+    Merge the summaries of finished tasks into total, and into entries if it is not None.
+    Files which failed are removed from entries.
+    """
+    for future in futures:
+        for path, summary, error in future.result():
+            if summary is not None:
+                total.merge(Summary.from_dict(summary))
+                if entries is not None:
+                    entries[path]['summary'] = summary
+            else:
+                if entries is not None:
+                    del entries[path]
+                if errors is not None:
+                    errors.append((path, error))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='aggregate statistics over catanlog files')
+    parser.add_argument('paths', nargs='+', help='log files, directories or glob patterns')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, default one per core')
+    parser.add_argument('--cache', default=None, help='JSON file of per-file summaries, for incremental re-runs')
+    parser.add_argument('--chunksize', type=int, default=64, help='files per task')
+    args = parser.parse_args(argv)
+
+    errors = list()
+    summary = analyze(args.paths, workers=args.workers, cache=args.cache, chunksize=args.chunksize,
+                      errors=errors)
+    result = summary.to_dict()
+    result['win_rates'] = summary.win_rates()
+    result['mean_turn_seconds'] = summary.mean_turn_seconds()
+    json.dump(result, sys.stdout, indent=2, sort_keys=True)
+    print()
+    for path, error in errors:
+        print('{}: {}'.format(path, error), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
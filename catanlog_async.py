@@ -0,0 +1,318 @@
+"""
+module catanlog_async provides CatanLogs which never write to disk on the caller's thread.
+
+ThreadedCatanLog hands flushed text to a background writer thread. AsyncioCatanLog hands it
+to a task on the running asyncio event loop, which writes in the loop's default executor.
+Both are drop-in replacements for CatanLog: every log_* method is unchanged.
+
+Flushed text waits in a queue of at most max_queue items. When the queue is full, the
+policy decides what happens to the next item:
+- 'block': wait for the writer to make room (ThreadedCatanLog only)
+- 'drop-oldest': discard the oldest queued item, leaving a gap in the logfile. Lines already
+  flushed cannot be erased, as the text they would be erased from may have been dropped.
+- 'spill': keep it in memory anyway, letting the queue grow past max_queue
+
+Call close() (or, for AsyncioCatanLog, await aclose()) to write everything still queued.
+Logging may continue after close(): the writer is started again by the next flush.
+"""
+import asyncio
+import collections
+import itertools
+import os
+import sys
+import threading
+
+import catanlog
+
+
+POLICIES = ('block', 'drop-oldest', 'spill')
+
+# queued in place of data, to remove the last nbytes of the logfile once what is before it is written
+_Truncate = collections.namedtuple('_Truncate', ['nbytes'])
+
+
+class _Queue(object):
+    """
+    class _Queue is a queue of (path, data) items bounded by a backpressure policy.
+    """
+    def __init__(self, max_queue, policy):
+        if policy not in POLICIES:
+            raise ValueError('policy must be one of: {}'.format(', '.join(POLICIES)))
+        self.max_queue = max_queue
+        self.policy = policy
+        self.dropped = 0
+        self.spilled = 0
+        self.closed = False
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.max_queue:
+                if self.policy == 'block':
+                    while len(self._items) >= self.max_queue:
+                        self._cond.wait()
+                elif self.policy == 'drop-oldest':
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    self.spilled += 1
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def take(self, n, wait=False):
+        """
+        Remove and return up to n items. With wait, wait for at least one item unless the
+        queue is closed.
+        """
+        with self._cond:
+            while wait and not self._items and not self.closed:
+                self._cond.wait()
+            batch = [self._items.popleft() for _ in range(min(n, len(self._items)))]
+            self._cond.notify_all()
+            return batch
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        with self._cond:
+            self.closed = False
+
+
+class _Writer(object):
+    """
+    class _Writer writes batches of (path, data) items, holding the latest logfile open.
+    """
+    def __init__(self, binary):
+        self._binary = binary
+        self._file = None
+        self._path = None
+
+    def write(self, batch):
+        for path, group in itertools.groupby(batch, key=lambda item: item[0]):
+            chunks = list()
+            for _, data in group:
+                if isinstance(data, _Truncate):
+                    self._write(path, chunks)
+                    chunks = list()
+                    fd = self._open(path).fileno()
+                    os.ftruncate(fd, os.fstat(fd).st_size - data.nbytes)
+                else:
+                    chunks.append(data)
+            self._write(path, chunks)
+
+    def _write(self, path, chunks):
+        if not chunks:
+            return
+        if path is None:
+            out = sys.stdout.buffer if self._binary else sys.stdout
+        else:
+            out = self._open(path)
+        out.write((b'' if self._binary else '').join(chunks))
+        out.flush()
+
+    def _open(self, path):
+        if self._path != path:
+            self.close()
+            self._file = open(path, 'ab' if self._binary else 'a')
+            self._path = path
+        return self._file
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._path = None
+
+
+class _QueuedCatanLog(catanlog.CatanLog):
+    """
+    class _QueuedCatanLog is a CatanLog whose flushes are queued rather than written.
+
+    Lines are queued whole: with auto_flush, the log is flushed at the end of each line.
+    """
+    def __init__(self, auto_flush=True, log_dir='log', use_stdout=False, max_queue=1024,
+                 policy='block', batch_size=64, **kwargs):
+        """
+        :param max_queue: int, flushes which may be queued before the policy applies
+        :param policy: str, one of POLICIES
+        :param batch_size: int, most flushes written at once
+        :param kwargs: other CatanLog options. keep_open, index and keep_lines are not supported.
+        """
+        if kwargs.get('keep_open') or kwargs.get('index') or kwargs.get('keep_lines') is not None:
+            raise ValueError('{} does not support keep_open, index or keep_lines'.format(type(self).__name__))
+        if kwargs.get('compression') and policy == 'drop-oldest':
+            raise ValueError('the drop-oldest policy would corrupt a compressed log')
+        super(_QueuedCatanLog, self).__init__(auto_flush=auto_flush, log_dir=log_dir,
+                                              use_stdout=use_stdout, **kwargs)
+        self._queue = _Queue(max_queue, policy)
+        self._batch_size = batch_size
+        self._writer = _Writer(binary=self._mode() == 'ab')
+        self._error = None
+
+    @property
+    def dropped(self):
+        """
+        Number of flushes discarded by the 'drop-oldest' policy
+        """
+        return self._queue.dropped
+
+    def _log(self, content):
+        self._buffer.append(content)
+        if self._auto_flush and content.endswith('\n'):
+            self.flush()
+
+    def eraseln(self, count=1):
+        if (self._queue.policy == 'drop-oldest' and not self._use_stdout and count >= 1 and
+                self._buffer.erase_start(count) < self._chars_flushed):
+            raise ValueError('cannot erase lines already flushed under the drop-oldest policy')
+        super(_QueuedCatanLog, self).eraseln(count)
+
+    eraseln.__doc__ = catanlog.CatanLog.eraseln.__doc__
+
+    def _write(self, data):
+        if data:
+            self._put((None if self._use_stdout else self.logpath(), data))
+
+    def _truncate(self, nbytes):
+        self._put((self.logpath(), _Truncate(nbytes)))
+
+    def _put(self, item):
+        if self._error is not None:
+            raise self._error
+        if self._queue.closed:
+            self._queue.reopen()
+            self._restart()
+        self._queue.put(item)
+        self._wake()
+
+    def _restart(self):
+        """
+        Start the writer again for a log written to after close()
+        """
+        pass
+
+    def _wake(self):
+        pass
+
+    def _drain(self, wait):
+        """
+        Write queued batches until the queue is empty, or, with wait, until it is closed
+        """
+        while True:
+            batch = self._queue.take(self._batch_size, wait=wait)
+            if not batch:
+                return
+            self._writer.write(batch)
+
+
+class ThreadedCatanLog(_QueuedCatanLog):
+    """
+    class ThreadedCatanLog is a CatanLog which writes to disk on a background thread.
+    """
+    def __init__(self, *args, **kwargs):
+        super(ThreadedCatanLog, self).__init__(*args, **kwargs)
+        self._restart()
+
+    def _restart(self):
+        self._thread = threading.Thread(target=self._run, name='catanlog-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._drain(wait=True)
+        except Exception as e:
+            self._error = e
+            self._queue.close()
+            self._queue.take(len(self._queue))
+
+    def close(self):
+        """
+        Flush the log, wait for the writer thread to write everything queued, and stop it.
+        Logging to it again starts a new writer thread.
+        """
+        if self._latest():
+            self.flush()
+        self._end_stream()
+        self._queue.close()
+        self._thread.join()
+        self._writer.close()
+        if self._error is not None:
+            raise self._error
+
+
+class AsyncioCatanLog(_QueuedCatanLog):
+    """
+    class AsyncioCatanLog is a CatanLog which writes to disk from a task on the running
+    asyncio event loop, doing the writes in the loop's default executor. It must be used
+    from the event loop's thread. The 'block' policy is not supported, as it would block the loop.
+    """
+    def __init__(self, auto_flush=True, log_dir='log', use_stdout=False, max_queue=1024,
+                 policy='spill', batch_size=64, **kwargs):
+        if policy == 'block':
+            raise ValueError('AsyncioCatanLog does not support the block policy')
+        super(AsyncioCatanLog, self).__init__(auto_flush, log_dir, use_stdout, max_queue,
+                                              policy, batch_size, **kwargs)
+        self._task = None
+        self._pending = None
+
+    def _wake(self):
+        if self._task is None or self._task.done():
+            self._pending = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._pending.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._pending.wait()
+            self._pending.clear()
+            while True:
+                batch = self._queue.take(self._batch_size)
+                if not batch:
+                    break
+                try:
+                    await loop.run_in_executor(None, self._writer.write, batch)
+                except Exception as e:
+                    self._error = e
+                    return
+            if self._queue.closed:
+                return
+
+    async def aclose(self):
+        """
+        Flush the log, wait for the writer task to write everything queued, and stop it.
+        """
+        if self._latest():
+            self.flush()
+        self._end_stream()
+        self._queue.close()
+        if self._task is not None:
+            self._pending.set()
+            await self._task
+            self._task = None
+        await asyncio.get_running_loop().run_in_executor(None, self._writer.close)
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """
+        Flush the log and write everything queued, blocking the calling thread. Only once the
+        writer task is done, eg when its event loop has stopped: until then, await aclose().
+        """
+        if self._task is not None and not self._task.done():
+            raise RuntimeError('cannot close while the writer task runs, await aclose() instead')
+        if self._latest():
+            self.flush()
+        self._end_stream()
+        self._queue.close()
+        self._drain(wait=False)
+        self._writer.close()
+        if self._error is not None:
+            raise self._error
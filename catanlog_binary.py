@@ -0,0 +1,360 @@
+"""
+module catanlog_binary implements .catanb, a compact binary encoding of catanlog (.catan) files.
+
+A .catanb file holds exactly the information of the .catan file it encodes, and converts
+losslessly in both directions. See text_to_binary and binary_to_text.
+
+Integers are unsigned LEB128 varints, strings are a varint byte length followed by utf-8.
+Codes are those of module catanlog_compact. A file is a sequence of games, each of which is
+
+    header  0xFF 'CATANB' format
+            version (string), timestamp (varint, seconds since the epoch)
+            players (varint count, then seat (varint), name (string), color (string) each)
+            terrain (varint count, then one resource code byte each)
+            numbers (varint count, then one byte each, 0 for None)
+            ports (varint count, then tile_id (varint), direction byte, port type byte each)
+    events  kind byte, player, then the event's args:
+            - args are varints, in the order of catanlog_compact.Event.args
+            - trades are preceded by their number of args, other kinds have a fixed number
+            - the seconds of an ends turn are zigzag-encoded
+            - players are varint color codes. A code one past the end of the game's color table
+              is followed by the new color as a string
+"""
+import datetime
+
+import catanlog_compact as compact
+import catanlog_compress
+import catanlog_reader as reader
+
+
+FORMAT = 1
+MAGIC = b'\xffCATANB'
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_arity = {
+    compact.ROLL: 1,
+    compact.MOVES_ROBBER: 2,
+    compact.BUYS_ROAD: 1,
+    compact.BUYS_SETTLEMENT: 1,
+    compact.BUYS_CITY: 1,
+    compact.BUYS_DEV_CARD: 0,
+    compact.PLAYS_KNIGHT: 2,
+    compact.PLAYS_ROAD_BUILDER: 2,
+    compact.PLAYS_YEAR_OF_PLENTY: 2,
+    compact.PLAYS_MONOPOLY: 1,
+    compact.PLAYS_VICTORY_POINT: 0,
+    compact.ENDS_TURN: 1,
+    compact.WINS: 0,
+}
+# index of the arg holding a color code, by kind
+_color_arg = {
+    compact.MOVES_ROBBER: 1,
+    compact.PLAYS_KNIGHT: 1,
+    compact.TRADES_WITH_PLAYER: 0,
+}
+
+
+def _varint(n, out):
+    while n > 0x7F:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _string(s, out):
+    data = s.encode('utf-8')
+    _varint(len(data), out)
+    out.extend(data)
+
+
+def _zigzag(n):
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def _unzigzag(n):
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+class Encoder(object):
+    """
+    class Encoder encodes catanlog_reader events to .catanb bytes, one event at a time.
+    """
+    def __init__(self):
+        self.game = None
+        self._known_colors = 0
+        self._parser = reader.Parser()
+        self._partial = ''
+
+    def encode(self, event):
+        """
+        :param event: Header or gameplay event, as yielded by catanlog_reader.parse()
+        :return: bytes
+        """
+        out = bytearray()
+        if type(event) is reader.Header:
+            self._encode_header(event, out)
+            return bytes(out)
+        if self.game is None:
+            raise ValueError('gameplay event before any header: {!r}'.format(event))
+        record = self.game.encode(event)
+        out.append(record.kind)
+        self._color(record.seat, out)
+        args = record.args
+        if record.kind == compact.ENDS_TURN:
+            args = (_zigzag(args[0]),)
+        elif record.kind not in _arity:
+            _varint(len(args), out)
+        color_arg = _color_arg.get(record.kind)
+        for i, arg in enumerate(args):
+            if i == color_arg:
+                self._color(arg, out)
+            else:
+                _varint(arg, out)
+        return bytes(out)
+
+    def _color(self, code, out):
+        _varint(code, out)
+        if code > self._known_colors:
+            _string(self.game.color(code), out)
+            self._known_colors = code
+
+    def _encode_header(self, header, out):
+        self.game = compact.CompactGame(header)
+        self._known_colors = len(self.game.colors)
+        out.extend(MAGIC)
+        out.append(FORMAT)
+        _string(header.version, out)
+        _varint(int((header.timestamp - _EPOCH).total_seconds()), out)
+        _varint(len(header.players), out)
+        for player in header.players:
+            _varint(player.seat, out)
+            _string(player.name, out)
+            _string(player.color, out)
+        _varint(len(header.terrain), out)
+        out.extend(compact.resource_code(t) for t in header.terrain)
+        _varint(len(header.numbers), out)
+        out.extend(0 if n is None else n for n in header.numbers)
+        _varint(len(header.ports), out)
+        for port in header.ports:
+            _varint(port.tile_id, out)
+            out.append(compact.DIRECTIONS.index(port.direction))
+            out.append(compact.port_code(port.type))
+
+    def feed(self, text):
+        """
+        Encode catanlog text, which may end partway through a line. The rest of the line is
+        encoded once it is fed.
+
+        :param text: str
+        :return: bytes
+        """
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        out = bytearray()
+        for line in lines:
+            for event in self._parser.feed(line):
+                out.extend(self.encode(event))
+        return bytes(out)
+
+
+class _Incomplete(Exception):
+    """
+    Raised when a record runs past the end of the bytes read so far.
+    """
+
+
+class Decoder(object):
+    """
+    class Decoder decodes .catanb bytes to catanlog_compact records, one record at a time.
+    """
+    def __init__(self):
+        self.game = None
+
+    def decode(self, buf, pos):
+        """
+        Decode the record at buf[pos:].
+
+        :return: (CompactGame or catanlog_compact.Event, position after the record). A CompactGame
+                 is returned for each header; its records are not filled in.
+        :raises _Incomplete: if buf ends partway through the record
+        """
+        if self.game is not None and pos < len(buf) and buf[pos] != MAGIC[0]:
+            # fast path: a record whose varints are all one byte, naming no new colors
+            kind = buf[pos]
+            fixed = _arity.get(kind)
+            first = pos + 2 if fixed is not None else pos + 3
+            if first <= len(buf):
+                end = first + (fixed if fixed is not None else buf[first - 1])
+                fields = buf[pos + 1:end]
+                known = len(self.game.colors)
+                if (end <= len(buf) and max(fields) < 0x80 and fields[0] <= known and
+                        (kind not in _color_arg or buf[first + _color_arg[kind]] <= known)):
+                    args = tuple(buf[first:end])
+                    if kind == compact.ENDS_TURN:
+                        args = (_unzigzag(args[0]),)
+                    return compact.Event(kind, fields[0], args), end
+
+        self._buf = buf
+        self._pos = pos
+        if self._byte() == MAGIC[0]:
+            return self._decode_header(), self._pos
+        if self.game is None:
+            raise ValueError('byte {}: gameplay event before any header'.format(pos))
+        kind = buf[pos]
+        new_colors = list()
+        seat = self._color(new_colors)
+        if kind in _arity:
+            num_args = _arity[kind]
+        else:
+            num_args = self._varint()
+        color_arg = _color_arg.get(kind)
+        args = tuple(self._color(new_colors) if i == color_arg else self._varint()
+                     for i in range(num_args))
+        if kind == compact.ENDS_TURN:
+            args = (_unzigzag(args[0]),)
+        for color in new_colors:
+            self.game.seat(color)
+        return compact.Event(kind, seat, args), self._pos
+
+    def _decode_header(self):
+        if self._bytes(len(MAGIC) - 1) != MAGIC[1:]:
+            raise ValueError('byte {}: not a .catanb game header'.format(self._pos))
+        if self._byte() != FORMAT:
+            raise ValueError('byte {}: unsupported .catanb format'.format(self._pos))
+        version = self._string()
+        timestamp = _EPOCH + datetime.timedelta(seconds=self._varint())
+        players = [reader.Player(self._varint(), self._string(), self._string())
+                   for _ in range(self._varint())]
+        terrain = [compact.RESOURCES[self._byte()] for _ in range(self._varint())]
+        numbers = [self._byte() or None for _ in range(self._varint())]
+        ports = [reader.Port(self._varint(), compact.DIRECTIONS[self._byte()], compact.PORT_TYPES[self._byte()])
+                 for _ in range(self._varint())]
+        self.game = compact.CompactGame(reader.Header(version, timestamp, players, terrain, numbers, ports))
+        return self.game
+
+    def _byte(self):
+        if self._pos >= len(self._buf):
+            raise _Incomplete()
+        self._pos += 1
+        return self._buf[self._pos - 1]
+
+    def _bytes(self, n):
+        if self._pos + n > len(self._buf):
+            raise _Incomplete()
+        self._pos += n
+        return self._buf[self._pos - n:self._pos]
+
+    def _varint(self):
+        n, shift = 0, 0
+        while True:
+            b = self._byte()
+            n |= (b & 0x7F) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def _string(self):
+        return self._bytes(self._varint()).decode('utf-8')
+
+    def _color(self, new_colors):
+        code = self._varint()
+        if code > len(self.game.colors) + len(new_colors):
+            new_colors.append(self._string())
+        return code
+
+
+def parse_records(fp, chunk_size=1 << 20):
+    """
+    Parse a .catanb stream, yielding a CompactGame for each header followed by its records.
+
+    The stream is read chunk_size bytes at a time, never all at once.
+
+    :param fp: binary file object
+    :return: generator of CompactGame and catanlog_compact.Event
+    """
+    decoder = Decoder()
+    buf = b''
+    pos = 0
+    while True:
+        chunk = fp.read(chunk_size)
+        buf = buf[pos:] + chunk
+        pos = 0
+        while pos < len(buf):
+            try:
+                item, pos = decoder.decode(buf, pos)
+            except _Incomplete:
+                if not chunk:
+                    raise ValueError('.catanb stream ends partway through a record')
+                break
+            yield item
+        if not chunk:
+            return
+
+
+def parse(fp, chunk_size=1 << 20):
+    """
+    Parse a .catanb stream, yielding the same events catanlog_reader.parse() yields for
+    the equivalent .catan text.
+
+    :param fp: binary file object
+    :return: generator of Header and gameplay events
+    """
+    game = None
+    for item in parse_records(fp, chunk_size):
+        if type(item) is compact.CompactGame:
+            game = item
+            yield game.header
+        else:
+            yield game.decode(item)
+
+
+def read(path):
+    """
+    Parse the .catanb file at the given path, yielding events as they are read.
+
+    :param path: str, path to a .catanb file, which may be compressed, see module catanlog_compress
+    :return: generator of Header and gameplay events
+    """
+    with catanlog_compress.open_log(path, binary=True) as fp:
+        for event in parse(fp):
+            yield event
+
+
+def read_games(path):
+    """
+    Read the .catanb file at the given path, yielding one CompactGame at a time with its
+    records filled in.
+
+    :param path: str, path to a .catanb file
+    :return: generator of CompactGame
+    """
+    game = None
+    with catanlog_compress.open_log(path, binary=True) as fp:
+        for item in parse_records(fp):
+            if type(item) is compact.CompactGame:
+                if game is not None:
+                    yield game
+                game = item
+            else:
+                game.records.append(item)
+    if game is not None:
+        yield game
+
+
+def text_to_binary(src, dst):
+    """
+    Convert the .catan file at path src to a .catanb file at path dst.
+    """
+    encoder = Encoder()
+    with catanlog_compress.open_log(src) as fin, open(dst, 'wb') as fout:
+        for event in reader.parse(fin):
+            fout.write(encoder.encode(event))
+
+
+def binary_to_text(src, dst):
+    """
+    Convert the .catanb file at path src to a .catan file at path dst.
+    """
+    with open(dst, 'w') as fout:
+        for text in reader.render(read(src)):
+            fout.write(text)
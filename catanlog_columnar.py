@@ -0,0 +1,362 @@
+"""
+module catanlog_columnar exports a corpus of catanlog files as columnar tables, for vectorised
+analysis with NumPy or pandas.
+
+There is one table per kind of fact, each a set of equal-length integer columns:
+
+- games: game_id, file_id, players, winner (seat, 0 if none), turns, timestamp (seconds since the epoch)
+- players: game_id, seat, color (index into the export's colors)
+- board: game_id, tile, terrain (catanlog_compact.RESOURCES index), number (0 for none)
+- ports: game_id, tile, direction (1 + catanlog_compact.DIRECTIONS index), type (PORT_TYPES index)
+- rolls: game_id, turn, seat, value
+- builds: game_id, turn, seat, piece (see PIECES), location (catanlog_compact.location_code)
+- robber: game_id, turn, seat, tile, victim (seat, 0 if none), knight (1 if by a knight)
+- trades: game_id, turn, seat, other (seat, 0 for a port), port (PORT_TYPES index, -1 for a player),
+          give_<resource> and take_<resource> for each of RESOURCES
+- dev_cards: game_id, turn, seat, card (see DEV_CARDS), resource1, resource2 (RESOURCES index, -1 if none)
+- turns: game_id, turn, seat, seconds
+
+Turns are numbered from 0 within each game. Seats are those of the game's header. Players who
+are not in the header, like 'nobody' robbed by a knight, are seat 0.
+
+Tables are written in one of two layouts:
+- 'raw': a directory holding each column as a file of little-endian integers named
+  <table>.<column>, described by meta.json. Each can be memory-mapped, eg with numpy.memmap.
+- 'npz': one .npz file holding each column as the array '<table>.<column>'. Requires numpy.
+
+load() reads either layout back, as numpy arrays when numpy is installed and otherwise as
+memoryviews of the memory-mapped files. With numpy, queries are one-liners, eg
+
+    tables = catanlog_columnar.load('corpus')
+    rolls = tables['rolls']
+    histogram = numpy.bincount(rolls['value'], minlength=13)
+
+    $ python -m catanlog_columnar log/ corpus --layout raw
+
+See function export for documentation.
+"""
+import argparse
+import array
+import collections
+import datetime
+import json
+import mmap
+import os
+import sys
+import tempfile
+
+import catanlog_analytics
+import catanlog_compact as compact
+import catanlog_compress
+import catanlog_reader as reader
+
+
+PIECES = ('road', 'settlement', 'city')
+DEV_CARDS = ('bought', 'knight', 'road builder', 'year of plenty', 'monopoly', 'victory point')
+RESOURCES = compact.RESOURCES[:5]
+
+# column name -> array typecode, by table
+TABLES = collections.OrderedDict([
+    ('games', (('game_id', 'i'), ('file_id', 'i'), ('players', 'b'), ('winner', 'b'), ('turns', 'i'),
+               ('timestamp', 'q'))),
+    ('players', (('game_id', 'i'), ('seat', 'b'), ('color', 'h'))),
+    ('board', (('game_id', 'i'), ('tile', 'b'), ('terrain', 'b'), ('number', 'b'))),
+    ('ports', (('game_id', 'i'), ('tile', 'b'), ('direction', 'b'), ('type', 'b'))),
+    ('rolls', (('game_id', 'i'), ('turn', 'i'), ('seat', 'b'), ('value', 'b'))),
+    ('builds', (('game_id', 'i'), ('turn', 'i'), ('seat', 'b'), ('piece', 'b'), ('location', 'h'))),
+    ('robber', (('game_id', 'i'), ('turn', 'i'), ('seat', 'b'), ('tile', 'b'), ('victim', 'b'),
+                ('knight', 'b'))),
+    ('trades', (('game_id', 'i'), ('turn', 'i'), ('seat', 'b'), ('other', 'b'), ('port', 'b')) +
+               tuple(('give_' + res, 'h') for res in RESOURCES) +
+               tuple(('take_' + res, 'h') for res in RESOURCES)),
+    ('dev_cards', (('game_id', 'i'), ('turn', 'i'), ('seat', 'b'), ('card', 'b'), ('resource1', 'b'),
+                   ('resource2', 'b'))),
+    ('turns', (('game_id', 'i'), ('turn', 'i'), ('seat', 'b'), ('seconds', 'i'))),
+])
+
+# array typecode -> numpy dtype, for the little-endian files of the raw layout
+_dtypes = {'b': '<i1', 'B': '<u1', 'h': '<i2', 'i': '<i4', 'q': '<i8'}
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_piece_codes = {reader.BuysRoad: 0, reader.BuysSettlement: 1, reader.BuysCity: 2}
+_card_codes = {reader.PlaysRoadBuilder: 2, reader.PlaysYearOfPlenty: 3, reader.PlaysMonopoly: 4,
+               reader.PlaysVictoryPoint: 5}
+
+META = 'meta.json'
+ROWS_PER_WRITE = 1 << 16
+
+
+def _counts(items):
+    counts = [0] * len(RESOURCES)
+    for num, res in items:
+        counts[compact.resource_code(res)] += num
+    return counts
+
+
+class Tables(object):
+    """
+    class Tables accumulates the rows of every table as columns of array.array.
+
+    With a directory, the columns are appended to their files every ROWS_PER_WRITE rows, so
+    memory use does not grow with the corpus.
+    """
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.rows = collections.Counter()
+        self.colors = list()
+        self._color_codes = dict()
+        self.columns = {table: [array.array(typecode) for _, typecode in columns]
+                        for table, columns in TABLES.items()}
+
+    def color(self, color):
+        code = self._color_codes.get(color)
+        if code is None:
+            code = self._color_codes[color] = len(self.colors)
+            self.colors.append(color)
+        return code
+
+    def append(self, table, row):
+        columns = self.columns[table]
+        for column, value in zip(columns, row):
+            column.append(value)
+        self.rows[table] += 1
+        if self.directory is not None and len(columns[0]) >= ROWS_PER_WRITE:
+            self.write(table)
+
+    def write(self, table):
+        """
+        Append the buffered rows of a table to its column files, and clear them
+        """
+        for (name, _), column in zip(TABLES[table], self.columns[table]):
+            if sys.byteorder != 'little':
+                column.byteswap()
+            with open(os.path.join(self.directory, '{}.{}'.format(table, name)), 'ab') as fp:
+                column.tofile(fp)
+            del column[:]
+
+    def add_game(self, game_id, file_id, header, events):
+        """
+        Add the rows of one game
+
+        :param header: catanlog_reader.Header
+        :param events: iterable of the game's gameplay events
+        """
+        seats = {p.color: p.seat for p in header.players}
+        for p in header.players:
+            self.append('players', (game_id, p.seat, self.color(p.color)))
+        for i, terrain in enumerate(header.terrain):
+            number = header.numbers[i] if i < len(header.numbers) else None
+            self.append('board', (game_id, i + 1, compact.resource_code(terrain), number or 0))
+        for port in header.ports:
+            self.append('ports', (game_id, port.tile_id, compact.DIRECTIONS.index(port.direction) + 1,
+                                  compact.port_code(port.type)))
+
+        turn = 0
+        winner = 0
+        for event in events:
+            kind = type(event)
+            seat = seats.get(event.player, 0)
+            if kind is reader.Roll:
+                self.append('rolls', (game_id, turn, seat, event.roll))
+            elif kind in _piece_codes:
+                self.append('builds', (game_id, turn, seat, _piece_codes[kind],
+                                       compact.location_code(event.location)))
+            elif kind is reader.MovesRobber or kind is reader.PlaysKnight:
+                knight = kind is reader.PlaysKnight
+                if knight:
+                    self.append('dev_cards', (game_id, turn, seat, 1, -1, -1))
+                self.append('robber', (game_id, turn, seat, int(event.location), seats.get(event.victim, 0),
+                                       int(knight)))
+            elif kind is reader.TradesWithPort:
+                self.append('trades', (game_id, turn, seat, 0, compact.port_code(event.port)) +
+                            tuple(_counts(event.to_port)) + tuple(_counts(event.to_player)))
+            elif kind is reader.TradesWithPlayer:
+                self.append('trades', (game_id, turn, seat, seats.get(event.other, 0), -1) +
+                            tuple(_counts(event.to_other)) + tuple(_counts(event.to_player)))
+            elif kind is reader.BuysDevCard:
+                self.append('dev_cards', (game_id, turn, seat, 0, -1, -1))
+            elif kind in _card_codes:
+                resource1 = resource2 = -1
+                if kind is reader.PlaysRoadBuilder:
+                    for location in (event.location1, event.location2):
+                        self.append('builds', (game_id, turn, seat, 0, compact.location_code(location)))
+                elif kind is reader.PlaysYearOfPlenty:
+                    resource1, resource2 = compact.resource_code(event.resource1), compact.resource_code(event.resource2)
+                elif kind is reader.PlaysMonopoly:
+                    resource1 = compact.resource_code(event.resource)
+                self.append('dev_cards', (game_id, turn, seat, _card_codes[kind], resource1, resource2))
+            elif kind is reader.EndsTurn:
+                self.append('turns', (game_id, turn, seat, event.seconds))
+                turn += 1
+            elif kind is reader.Wins:
+                winner = seat
+        timestamp = int((header.timestamp - _EPOCH).total_seconds())
+        self.append('games', (game_id, file_id, len(header.players), winner, turn, timestamp))
+
+
+def _games(events):
+    """
+    Group a stream of events into (header, list of events) per game
+    """
+    header, body = None, list()
+    for event in events:
+        if type(event) is reader.Header:
+            if header is not None:
+                yield header, body
+            header, body = event, list()
+        elif header is not None:
+            body.append(event)
+    if header is not None:
+        yield header, body
+
+
+def _read(path):
+    if catanlog_compress.strip_suffix(path).endswith('.catanb'):
+        import catanlog_binary
+        return catanlog_binary.read(path)
+    elif catanlog_compress.strip_suffix(path).endswith('.catanref'):
+        import catanlog_layout
+        return catanlog_layout.read(path)
+    return reader.read(path)
+
+
+def export(paths, out, layout='raw', errors=None):
+    """
+    Export every game in the given logs as columnar tables.
+
+    Games are read one at a time and their rows written every ROWS_PER_WRITE rows, so memory
+    use does not grow with the corpus. The npz layout is written from the raw layout in a
+    temporary directory.
+
+    :param paths: list of str, log files, directories or glob patterns, see catanlog_analytics.find_logs
+    :param out: str, the directory to write for the 'raw' layout, or the .npz file to write
+    :param layout: 'raw' or 'npz'
+    :param errors: list, if given, (path, message) is appended for each file which failed to parse,
+                   and the rest of the file is skipped. Otherwise the ValueError is raised.
+    :return: dict of table name -> number of rows
+    """
+    if layout not in ('raw', 'npz'):
+        raise ValueError('layout must be one of: raw, npz')
+    if layout == 'raw':
+        return _export_raw(paths, out, errors)
+
+    numpy = _numpy()
+    if numpy is None:
+        raise ValueError('the npz layout requires numpy')
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = _export_raw(paths, tmp, errors)
+        tables = load(tmp)
+        arrays = {'{}.{}'.format(table, name): column
+                  for table in TABLES for name, column in tables[table].items()}
+        arrays[META] = numpy.array(json.dumps(tables['meta']))
+        numpy.savez(out, **arrays)
+        del tables, arrays
+    return rows
+
+
+def _export_raw(paths, out, errors):
+    os.makedirs(out, exist_ok=True)
+    for table, columns in TABLES.items():
+        for name, _ in columns:
+            with open(os.path.join(out, '{}.{}'.format(table, name)), 'wb'):
+                pass
+    tables = Tables(out)
+
+    files = catanlog_analytics.find_logs(paths)
+    game_id = 0
+    for file_id, path in enumerate(files):
+        try:
+            # each game is added as soon as it is parsed, so a file failing part way keeps
+            # the games before the failure
+            for header, events in _games(_read(path)):
+                tables.add_game(game_id, file_id, header, events)
+                game_id += 1
+        except (ValueError, UnicodeDecodeError) as e:
+            if errors is None:
+                raise
+            errors.append((path, str(e)))
+
+    for table in TABLES:
+        tables.write(table)
+    meta = {
+        'files': files,
+        'colors': tables.colors,
+        'tables': {table: {'rows': tables.rows[table],
+                           'columns': collections.OrderedDict((name, _dtypes[typecode])
+                                                              for name, typecode in columns)}
+                   for table, columns in TABLES.items()},
+    }
+    with open(os.path.join(out, META), 'w') as fp:
+        json.dump(meta, fp, indent=2)
+    return dict(tables.rows)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def load(path, use_numpy=True):
+    """
+    Load exported tables.
+
+    Columns of the raw layout are memory-mapped: numpy.memmap arrays with numpy, otherwise
+    memoryviews of the integer type of the column.
+
+    :param path: str, a directory of the raw layout or a .npz file
+    :param use_numpy: if False, return memoryviews even when numpy is installed, bool
+    :return: dict of table name -> dict of column name -> array, with the export's meta.json
+             under 'meta'
+    """
+    numpy = _numpy() if use_numpy else None
+    if not os.path.isdir(path):
+        if numpy is None:
+            raise ValueError('loading the npz layout requires numpy')
+        data = numpy.load(path)
+        meta = json.loads(str(data[META]))
+        result = {table: {name: data['{}.{}'.format(table, name)] for name in info['columns']}
+                  for table, info in meta['tables'].items()}
+        result['meta'] = meta
+        return result
+
+    with open(os.path.join(path, META), 'r') as fp:
+        meta = json.load(fp)
+    typecodes = {dtype: typecode for typecode, dtype in _dtypes.items()}
+    result = {'meta': meta}
+    for table, info in meta['tables'].items():
+        result[table] = dict()
+        for name, dtype in info['columns'].items():
+            column_path = os.path.join(path, '{}.{}'.format(table, name))
+            if numpy is not None:
+                column = numpy.memmap(column_path, dtype=dtype, mode='r') if info['rows'] else numpy.zeros(0, dtype)
+            elif info['rows']:
+                if sys.byteorder != 'little':
+                    raise ValueError('memoryviews of the raw layout require a little-endian machine')
+                with open(column_path, 'rb') as fp:
+                    column = memoryview(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)).cast(typecodes[dtype])
+            else:
+                column = memoryview(array.array(typecodes[dtype]))
+            result[table][name] = column
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='export catanlog files as columnar tables')
+    parser.add_argument('paths', nargs='+', help='log files, directories or glob patterns')
+    parser.add_argument('out', help='directory for the raw layout, or .npz file')
+    parser.add_argument('--layout', choices=('raw', 'npz'), default='raw')
+    args = parser.parse_args(argv)
+
+    errors = list()
+    rows = export(args.paths, args.out, layout=args.layout, errors=errors)
+    for table in TABLES:
+        print('{:>10}: {} rows'.format(table, rows.get(table, 0)))
+    for path, error in errors:
+        print('{}: {}'.format(path, error), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
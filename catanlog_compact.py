@@ -0,0 +1,291 @@
+"""
+module catanlog_compact encodes parsed catanlog events as compact records of small integers.
+
+Events from catanlog_reader carry the strings which appear in the log: colors, terrain
+values, port types and hexgrid location strings. When analysing many games, those
+objects dominate memory. This module replaces them with small-int codes:
+
+- kind: one code per gameplay action, see KINDS
+- seat: players are coded by their position in the game's color table. The table holds the
+        players of the header in seat order (so seat 1 is code 1), followed by any other colors
+        which appear in the game, like 'nobody' as the victim of a robber
+- resource: index into RESOURCES, the terrain values logged by CatanLog
+- port: index into PORT_TYPES, the port types logged by CatanLog._log_board_ports
+- location: tile_id << 4 | direction code, see location_code()
+
+Each Event is one __slots__ object of 56 bytes (CPython 3.11) whose args tuple is interned
+per game, so repeated actions share their args. The array-backed GameArrays form costs 6 bytes
+per event plus 4 bytes per argument. Measured by bench/bench_memory.py on a trade-heavy
+500-turn game, events take about 470 bytes each as catanlog_reader namedtuples, 88 bytes
+as CompactGame records and 20 bytes as GameArrays.
+"""
+import array
+import sys
+
+import catanlog_reader as reader
+
+
+KINDS = (
+    reader.Roll,
+    reader.MovesRobber,
+    reader.BuysRoad,
+    reader.BuysSettlement,
+    reader.BuysCity,
+    reader.BuysDevCard,
+    reader.TradesWithPort,
+    reader.TradesWithPlayer,
+    reader.PlaysKnight,
+    reader.PlaysRoadBuilder,
+    reader.PlaysYearOfPlenty,
+    reader.PlaysMonopoly,
+    reader.PlaysVictoryPoint,
+    reader.EndsTurn,
+    reader.Wins,
+)
+(ROLL, MOVES_ROBBER, BUYS_ROAD, BUYS_SETTLEMENT, BUYS_CITY, BUYS_DEV_CARD, TRADES_WITH_PORT,
+ TRADES_WITH_PLAYER, PLAYS_KNIGHT, PLAYS_ROAD_BUILDER, PLAYS_YEAR_OF_PLENTY, PLAYS_MONOPOLY,
+ PLAYS_VICTORY_POINT, ENDS_TURN, WINS) = range(len(KINDS))
+
+RESOURCES = ('wood', 'brick', 'wheat', 'sheep', 'ore', 'desert')
+PORT_TYPES = ('4:1', '3:1', 'wood', 'brick', 'wheat', 'sheep', 'ore')
+DIRECTIONS = ('N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW')
+
+_kind_codes = {kind: code for code, kind in enumerate(KINDS)}
+_resource_codes = {res: code for code, res in enumerate(RESOURCES)}
+_port_codes = {port: code for code, port in enumerate(PORT_TYPES)}
+_direction_codes = {dirn: code + 1 for code, dirn in enumerate(DIRECTIONS)}
+
+
+def location_code(location):
+    """
+    Code a hexgrid location string.
+
+    Tiles ('12') code as tile_id << 4. Nodes and edges ('(12 NW)') code as tile_id << 4 | d,
+    where d is 1 + the index of the direction in DIRECTIONS.
+
+    :param location: string, see hexgrid.location()
+    :return: int
+    """
+    if location.startswith('('):
+        tile_id, direction = location[1:-1].split(' ')
+        return int(tile_id) << 4 | _direction_codes[direction]
+    return int(location) << 4
+
+
+def location_str(code):
+    """
+    Inverse of location_code.
+    """
+    tile_id, direction = code >> 4, code & 0xF
+    if direction == 0:
+        return str(tile_id)
+    return '({} {})'.format(tile_id, DIRECTIONS[direction - 1])
+
+
+def resource_code(resource):
+    return _resource_codes[resource]
+
+
+def port_code(port_type):
+    return _port_codes[port_type]
+
+
+class Event(object):
+    """
+    class Event is the compact record of one gameplay action.
+
+    :param kind: int, index into KINDS
+    :param seat: int, the acting player's code in the game's color table
+    :param args: tuple of int, the coded arguments of the action, in the order of the fields
+                 of the matching catanlog_reader event. Trades code as
+                 (port or other player, len(given), num, resource, ..., num, resource, ...)
+    """
+    __slots__ = ('kind', 'seat', 'args')
+
+    def __init__(self, kind, seat, args):
+        self.kind = kind
+        self.seat = seat
+        self.args = args
+
+    def __repr__(self):
+        return 'Event({}, {}, {})'.format(KINDS[self.kind].__name__, self.seat, self.args)
+
+    def __eq__(self, other):
+        return (isinstance(other, Event) and
+                (self.kind, self.seat, self.args) == (other.kind, other.seat, other.args))
+
+    def __hash__(self):
+        return hash((self.kind, self.seat, self.args))
+
+
+class CompactGame(object):
+    """
+    class CompactGame holds one game as its Header and a list of Event records.
+
+    Use #add to encode catanlog_reader events, #events to decode them again, and #to_arrays
+    for the struct-of-arrays form.
+    """
+    def __init__(self, header):
+        """
+        :param header: catanlog_reader.Header
+        """
+        self.header = header
+        self.colors = [p.color for p in header.players]
+        self.records = list()
+        self._color_codes = {color: code + 1 for code, color in enumerate(self.colors)}
+        self._interned = dict()
+
+    def seat(self, color):
+        """
+        Return the code of a color, extending the color table if it is new to this game
+        """
+        code = self._color_codes.get(color)
+        if code is None:
+            self.colors.append(color)
+            code = self._color_codes[color] = len(self.colors)
+        return code
+
+    def color(self, code):
+        return self.colors[code - 1]
+
+    def add(self, event):
+        """
+        Encode a catanlog_reader gameplay event and append its record
+        """
+        self.records.append(self.encode(event))
+
+    def encode(self, event):
+        kind = _kind_codes[type(event)]
+        seat = self.seat(event.player)
+        if kind == ROLL:
+            args = (event.roll,)
+        elif kind in (MOVES_ROBBER, PLAYS_KNIGHT):
+            args = (location_code(event.location), self.seat(event.victim))
+        elif kind in (BUYS_ROAD, BUYS_SETTLEMENT, BUYS_CITY):
+            args = (location_code(event.location),)
+        elif kind == TRADES_WITH_PORT:
+            args = self._trade_args(port_code(event.port), event.to_port, event.to_player)
+        elif kind == TRADES_WITH_PLAYER:
+            args = self._trade_args(self.seat(event.other), event.to_other, event.to_player)
+        elif kind == PLAYS_ROAD_BUILDER:
+            args = (location_code(event.location1), location_code(event.location2))
+        elif kind == PLAYS_YEAR_OF_PLENTY:
+            args = (_resource_codes[event.resource1], _resource_codes[event.resource2])
+        elif kind == PLAYS_MONOPOLY:
+            args = (_resource_codes[event.resource],)
+        elif kind == ENDS_TURN:
+            args = (event.seconds,)
+        else:
+            args = ()
+        args = self._interned.setdefault(args, args)
+        return Event(kind, seat, args)
+
+    @staticmethod
+    def _trade_args(counterparty, given, taken):
+        args = [counterparty, len(given)]
+        for num, res in list(given) + list(taken):
+            args.append(num)
+            args.append(_resource_codes[res])
+        return tuple(args)
+
+    def decode(self, record):
+        """
+        Decode a record back to the catanlog_reader event it was encoded from
+        """
+        kind, player, args = record.kind, self.color(record.seat), record.args
+        if kind == ROLL:
+            return reader.Roll(player, args[0])
+        elif kind in (MOVES_ROBBER, PLAYS_KNIGHT):
+            return KINDS[kind](player, location_str(args[0]), self.color(args[1]))
+        elif kind in (BUYS_ROAD, BUYS_SETTLEMENT, BUYS_CITY):
+            return KINDS[kind](player, location_str(args[0]))
+        elif kind in (TRADES_WITH_PORT, TRADES_WITH_PLAYER):
+            items = [(args[i], RESOURCES[args[i + 1]]) for i in range(2, len(args), 2)]
+            given, taken = items[:args[1]], items[args[1]:]
+            if kind == TRADES_WITH_PORT:
+                return reader.TradesWithPort(player, given, PORT_TYPES[args[0]], taken)
+            return reader.TradesWithPlayer(player, given, self.color(args[0]), taken)
+        elif kind == PLAYS_ROAD_BUILDER:
+            return reader.PlaysRoadBuilder(player, location_str(args[0]), location_str(args[1]))
+        elif kind == PLAYS_YEAR_OF_PLENTY:
+            return reader.PlaysYearOfPlenty(player, RESOURCES[args[0]], RESOURCES[args[1]])
+        elif kind == PLAYS_MONOPOLY:
+            return reader.PlaysMonopoly(player, RESOURCES[args[0]])
+        elif kind == ENDS_TURN:
+            return reader.EndsTurn(player, args[0])
+        return KINDS[kind](player)
+
+    def events(self):
+        """
+        Generate the Header followed by the decoded gameplay events
+        """
+        yield self.header
+        for record in self.records:
+            yield self.decode(record)
+
+    def to_arrays(self):
+        return GameArrays.from_records(self.records)
+
+
+class GameArrays(object):
+    """
+    class GameArrays is the struct-of-arrays form of a game's records.
+
+    Event i has kind kinds[i], seat seats[i], and args args[starts[i]:starts[i + 1]].
+    """
+    def __init__(self, kinds, seats, starts, args):
+        self.kinds = kinds
+        self.seats = seats
+        self.starts = starts
+        self.args = args
+
+    @classmethod
+    def from_records(cls, records):
+        kinds, seats, starts, args = array.array('B'), array.array('B'), array.array('I', [0]), array.array('i')
+        for record in records:
+            kinds.append(record.kind)
+            seats.append(record.seat)
+            args.extend(record.args)
+            starts.append(len(args))
+        return cls(kinds, seats, starts, args)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, i):
+        return Event(self.kinds[i], self.seats[i], tuple(self.args[self.starts[i]:self.starts[i + 1]]))
+
+    def records(self):
+        return [self[i] for i in range(len(self))]
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.kinds, self.seats, self.starts, self.args))
+
+
+def games(events):
+    """
+    Group a stream of catanlog_reader events into CompactGames, yielding each game once the
+    next one begins or the stream ends.
+
+    :param events: iterable of events, as yielded by catanlog_reader.parse()
+    :return: generator of CompactGame
+    """
+    game = None
+    for event in events:
+        if type(event) is reader.Header:
+            if game is not None:
+                yield game
+            game = CompactGame(event)
+        elif game is None:
+            raise ValueError('gameplay event before any header: {!r}'.format(event))
+        else:
+            game.add(event)
+    if game is not None:
+        yield game
+
+
+def sizeof(record):
+    """
+    Return the bytes used by a record, counting its args tuple in full even if shared
+    """
+    return sys.getsizeof(record) + sys.getsizeof(record.args)
@@ -0,0 +1,207 @@
+"""
+module catanlog_compress writes and reads compressed catanlog files.
+
+CatanLog(compression='gzip') writes its log through a Compressor, to a file named after the
+log with a suffix for the compression method appended, eg '.catan.gz'. open_log() opens a
+log for reading, detecting compression by the file's first bytes, so catanlog_reader.read
+and catanlog_binary.read read compressed and plain logs alike.
+
+Methods:
+- gzip: one gzip member per game, sync-flushed on every flush so the file always decompresses
+  up to the last flush. The member is ended on close() or reset().
+- lzma: one .xz stream per flush, as xz streams cannot be sync-flushed. As a stream per line
+  would be larger than the line, CatanLog requires auto_flush=False or keep_open=True with it.
+- zstd: as gzip, with zstd frames. Requires the zstandard package.
+
+A log which was never closed ends partway through a gzip member or zstd frame. open_log()
+reads it up to the last flush; gzip -d does too, though it warns of an unexpected end of file.
+"""
+import io
+import lzma
+import zlib
+
+
+SUFFIXES = {
+    'gzip': '.gz',
+    'lzma': '.xz',
+    'zstd': '.zst',
+}
+
+_MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'\xfd7zXZ\x00': 'lzma',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+
+CHUNK_SIZE = 1 << 20
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError('zstd compression requires the zstandard package')
+    return zstandard
+
+
+def strip_suffix(path):
+    """
+    Return path without its compression suffix, if it has one
+    """
+    for suffix in SUFFIXES.values():
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+class Compressor(object):
+    """
+    class Compressor compresses the text (or bytes) flushed by a CatanLog.
+    """
+    def __init__(self, method, level=None):
+        """
+        :param method: str, one of SUFFIXES
+        :param level: int, compression level, or None for the method's default
+        """
+        if method not in SUFFIXES:
+            raise ValueError('compression must be one of: {}'.format(', '.join(sorted(SUFFIXES))))
+        self.method = method
+        self.level = level
+        self.started = False
+        if method == 'zstd':
+            self._zstandard = _zstandard()
+        self._stream = None
+
+    def _new_stream(self):
+        if self.method == 'gzip':
+            level = zlib.Z_DEFAULT_COMPRESSION if self.level is None else self.level
+            return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif self.method == 'zstd':
+            kwargs = dict() if self.level is None else {'level': self.level}
+            return self._zstandard.ZstdCompressor(**kwargs).compressobj()
+        return None
+
+    def feed(self, data):
+        """
+        Compress data, returning bytes which may be appended to what was returned before
+
+        :param data: str or bytes
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not data:
+            return b''
+        if self.method == 'lzma':
+            kwargs = dict() if self.level is None else {'preset': self.level}
+            return lzma.compress(data, **kwargs)
+        if self._stream is None:
+            self._stream = self._new_stream()
+        self.started = True
+        if self.method == 'gzip':
+            return self._stream.compress(data) + self._stream.flush(zlib.Z_SYNC_FLUSH)
+        return self._stream.compress(data) + self._stream.flush(self._zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        """
+        End the current gzip member or zstd frame, returning its last bytes. A later feed()
+        begins a new one.
+        """
+        if self._stream is None:
+            return b''
+        stream, self._stream, self.started = self._stream, None, False
+        return stream.flush()
+
+
+class _DecompressingReader(io.RawIOBase):
+    """
+    class _DecompressingReader decompresses a file of any number of concatenated gzip members,
+    xz streams or zstd frames, as a raw binary stream.
+
+    A last member which was never ended is read up to its end, rather than raising.
+    """
+    def __init__(self, fp, method):
+        self._fp = fp
+        self._method = method
+        self._errors = (zlib.error, lzma.LZMAError) if method != 'zstd' else (_zstandard().ZstdError,)
+        self._decompressor = self._new_decompressor()
+        self._pending = b''
+        self._pos = 0
+
+    def _new_decompressor(self):
+        if self._method == 'gzip':
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self._method == 'lzma':
+            return lzma.LZMADecompressor()
+        return _zstandard().ZstdDecompressor().decompressobj()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._pos == len(self._pending):
+            chunk = self._fp.read(CHUNK_SIZE)
+            if not chunk:
+                return 0
+            pieces = list()
+            while chunk:
+                try:
+                    pieces.append(self._decompressor.decompress(chunk))
+                except self._errors as e:
+                    raise ValueError('corrupt {} stream: {}'.format(self._method, e))
+                if not self._decompressor.eof:
+                    break
+                chunk = self._decompressor.unused_data
+                self._decompressor = self._new_decompressor()
+            self._pending, self._pos = b''.join(pieces), 0
+        n = min(len(b), len(self._pending) - self._pos)
+        b[:n] = self._pending[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        self._fp.close()
+        super(_DecompressingReader, self).close()
+
+
+def detect(fp):
+    """
+    Return the compression method of a binary file object by its first bytes, or None if it is
+    not compressed. The file's position is left where it was.
+    """
+    pos = fp.tell()
+    head = fp.read(max(len(magic) for magic in _MAGIC))
+    fp.seek(pos)
+    for magic, method in _MAGIC.items():
+        if head.startswith(magic):
+            return method
+    return None
+
+
+def open_log(path, binary=False):
+    """
+    Open a log for reading, decompressing it if it is compressed.
+
+    :param path: str, path to a .catan or .catanb file, compressed or not
+    :param binary: if True, return a binary file object, otherwise text, bool
+    :return: file object
+    """
+    fp = open(path, 'rb')
+    if detect(fp) is None and not binary:
+        fp.close()
+        return open(path, 'r')
+    return open_stream(fp, binary)
+
+
+def open_stream(fp, binary=False):
+    """
+    Wrap a binary file object holding a log for reading, decompressing it if it is compressed.
+
+    :param fp: binary file object, eg io.BytesIO
+    :param binary: if True, return a binary file object, otherwise text, bool
+    :return: file object
+    """
+    method = detect(fp)
+    if method is None:
+        return fp if binary else io.TextIOWrapper(fp, encoding='utf-8')
+    stream = io.BufferedReader(_DecompressingReader(fp, method), CHUNK_SIZE)
+    return stream if binary else io.TextIOWrapper(stream, encoding='utf-8')
@@ -0,0 +1,306 @@
+"""
+module catanlog_follow reads a catanlog (.catan) file while it is still being written.
+
+A Follower remembers how far into the file it has read, and on each poll returns only the
+complete lines appended since. A partial last line is held back until its newline arrives.
+
+The file may change under the follower:
+- truncated or rewritten, eg by CatanLog.eraseln or by truncating the file: the follower
+  notices that the bytes it last read are gone, and starts over from the start of the file
+- replaced by another file, as when CatanLog.reset() or a new game changes logpath(): give
+  the follower a function returning the current path, eg latest_log(log_dir), and it
+  switches files when the path changes
+
+In both cases the follower returns a Restart before the lines of the file read from the start.
+
+follow() blocks until there is something new, using inotify on Linux and polling os.stat
+elsewhere, or if inotify is not available.
+
+    follower = Follower(latest_log('log'))
+    for item in follower.follow_events():
+        if isinstance(item, Restart):
+            ...  # start the spectator's view over
+        else:
+            ...  # a catanlog_reader event
+"""
+import collections
+import ctypes
+import ctypes.util
+import errno
+import glob
+import os
+import select
+import time
+
+import catanlog_reader as reader
+
+
+Restart = collections.namedtuple('Restart', ['path', 'reason'])
+
+# bytes before the read offset which are checked to be unchanged on each poll
+CHECK_SIZE = 64
+
+
+def latest_log(log_dir, pattern='*.catan'):
+    """
+    Return a function which returns the most recently modified log in log_dir, or None if
+    there are none, for following whichever game is being written.
+    """
+    def path():
+        paths = glob.glob(os.path.join(log_dir, pattern))
+        return max(paths, key=_mtime_ns) if paths else None
+    return path
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+
+class Follower(object):
+    """
+    class Follower yields the lines, or events, appended to a log since it last looked.
+    """
+    def __init__(self, path, offset=0, poll_interval=0.25, use_inotify=True):
+        """
+        :param path: str, the path of the log, or a function returning the current path (or None)
+        :param offset: int, byte offset to start reading from, eg to skip what was already read
+        :param poll_interval: float, seconds between checks when polling
+        :param use_inotify: if False, always poll, bool
+        """
+        self._path_fn = path if callable(path) else (lambda: path)
+        self.path = None
+        self.offset = offset
+        self._start_offset = offset
+        self._check = b''
+        self._ino = None
+        self._parser = reader.Parser()
+        self._watcher = _watcher(poll_interval, use_inotify)
+
+    def close(self):
+        self._watcher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _restart(self, path, reason):
+        self.path = path
+        self.offset = 0
+        self._check = b''
+        self._ino = None
+        self._parser = reader.Parser()
+        return Restart(path, reason)
+
+    def poll(self):
+        """
+        Return the complete lines appended since the last poll, preceded by a Restart if the
+        follower had to start over.
+
+        :return: list of str and Restart
+        """
+        items = list()
+        path = self._path_fn()
+        if path != self.path:
+            if self.path is None and self.offset == self._start_offset:
+                self.path = path
+            else:
+                items.append(self._restart(path, 'new path'))
+        if path is None:
+            return items
+        self._watcher.watch(path)
+
+        try:
+            fp = open(path, 'rb')
+        except FileNotFoundError:
+            return items
+        with fp:
+            stat = os.fstat(fp.fileno())
+            if self._ino is not None and stat.st_ino != self._ino:
+                items.append(self._restart(path, 'replaced'))
+            elif stat.st_size < self.offset or not self._unchanged(fp):
+                items.append(self._restart(path, 'truncated'))
+            self._ino = stat.st_ino
+            fp.seek(self.offset)
+            data = fp.read()
+
+        # a partial last line is read again on the next poll, once its newline has arrived
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return items
+        complete = data[:end]
+        self.offset += end
+        self._check = (self._check + complete)[-CHECK_SIZE:]
+        items.extend(line + '\n' for line in complete.decode('utf-8').split('\n')[:-1])
+        return items
+
+    def _unchanged(self, fp):
+        """
+        Whether the bytes just before the offset are those read last time
+        """
+        if not self._check:
+            return True
+        fp.seek(self.offset - len(self._check))
+        return fp.read(len(self._check)) == self._check
+
+    def poll_events(self):
+        """
+        Return the events completed by the lines appended since the last poll, preceded by a
+        Restart if the follower had to start over. Events are those of catanlog_reader.
+
+        :return: list of events and Restart
+        """
+        items = list()
+        for item in self.poll():
+            if isinstance(item, Restart):
+                items.append(item)
+            else:
+                items.extend(self._parser.feed(item))
+        return items
+
+    def follow(self, timeout=None):
+        """
+        Yield lines, and Restarts, as they are appended, waiting for changes in between.
+
+        :param timeout: float, stop once nothing has changed for this many seconds, or None
+                        to follow forever
+        """
+        return self._follow(self.poll, timeout)
+
+    def follow_events(self, timeout=None):
+        """
+        As follow, yielding events instead of lines
+        """
+        return self._follow(self.poll_events, timeout)
+
+    def _follow(self, poll, timeout):
+        idle_since = time.monotonic()
+        while True:
+            items = poll()
+            for item in items:
+                yield item
+            now = time.monotonic()
+            if items:
+                idle_since = now
+            elif timeout is not None and now - idle_since >= timeout:
+                return
+            wait = None if timeout is None else max(0.0, timeout - (now - idle_since))
+            self._watcher.wait(self.path, wait)
+
+
+class _PollingWatcher(object):
+    """
+    class _PollingWatcher waits for a file or its directory to change by polling os.stat.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+
+    def watch(self, path):
+        pass
+
+    def wait(self, path, timeout):
+        """
+        Return once path or its directory changes, or timeout seconds pass
+        """
+        before = self._stamp(path)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return
+            time.sleep(self.interval if remaining is None else min(self.interval, remaining))
+            if self._stamp(path) != before:
+                return
+
+    @staticmethod
+    def _stamp(path):
+        stamps = list()
+        for p in (path, os.path.dirname(path) or '.') if path else ():
+            try:
+                stat = os.stat(p)
+                stamps.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                stamps.append(None)
+        return stamps
+
+    def close(self):
+        pass
+
+
+class _InotifyWatcher(object):
+    """
+    class _InotifyWatcher waits for changes in the directory of the followed file with inotify.
+    """
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._dir = None
+        self._wd = None
+
+    def watch(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        if directory == self._dir:
+            return
+        if self._wd is not None:
+            # fails only if the kernel removed the watch already, eg with its directory
+            self._libc.inotify_rm_watch(self._fd, self._wd)
+            self._dir = self._wd = None
+            # events of the old directory, and the removal's own, would wake wait() for nothing
+            self._drain()
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+        self._dir = directory
+        self._wd = wd
+
+    def wait(self, path, timeout):
+        """
+        Return once anything changes in the watched directory, or timeout seconds pass
+        """
+        if self._dir is None:
+            time.sleep(0.25 if timeout is None else min(0.25, timeout))
+            return
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if ready:
+            self._drain()
+
+    def _drain(self):
+        """
+        Read and discard every queued event
+        """
+        while True:
+            try:
+                os.read(self._fd, 4096)
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+                return
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def _watcher(poll_interval, use_inotify):
+    if use_inotify:
+        try:
+            return _InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return _PollingWatcher(poll_interval)
@@ -0,0 +1,262 @@
+"""
+module catanlog_index provides random access into catanlog (.catan) files by turn and by roll.
+
+An index records the byte offsets of
+- g: the start of each game, ie of its version line
+- h: the end of each game's header, ie the start of its first turn
+- t: the end of each 'ends turn' line, ie the start of the next turn
+- r: the start of each roll line
+
+CatanLog(index=True) writes the index alongside the log while it writes, to a sidecar file
+named after the log with '.idx' appended. Each line of the sidecar is a kind and an offset,
+eg 't 1042'. IndexedLog reads the sidecar, or scans the log with mmap when there is none.
+"""
+import array
+import bisect
+import mmap
+import os
+
+import catanlog_reader as reader
+
+
+SUFFIX = '.idx'
+
+_VERSION = b'catanlog v'
+_HEADER_END = b'...CATAN!\n'
+_ENDS_TURN = b' ends turn after '
+_ROLLS = b' rolls '
+
+
+def index_path(path):
+    return path + SUFFIX
+
+
+class IndexWriter(object):
+    """
+    class IndexWriter follows the text written to a log and appends index entries for it to
+    the log's sidecar.
+    """
+    def __init__(self, path, offset=0, keep_open=False, opener=open):
+        """
+        :param path: str, path of the log being indexed
+        :param offset: int, bytes already in the log
+        :param keep_open: if True, hold the sidecar open between writes, bool
+        :param opener: function(path, mode) returning an open file, eg the log's _open
+        """
+        self.log_path = path
+        self.path = index_path(path)
+        self.offset = offset
+        self._partial = ''
+        self._keep_open = keep_open
+        self._opener = opener
+        self._file = None
+
+    def entries(self, text):
+        """
+        Return the index entries completed by text, which continues the text given before
+        """
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        entries = list()
+        for line in lines:
+            start = self.offset
+            self.offset += len(line.encode('utf-8')) + 1
+            words = line.split(' ', 2)
+            if line == '...CATAN!':
+                entries.append('h {}\n'.format(self.offset))
+            elif line.startswith(_VERSION.decode('utf-8')):
+                entries.append('g {}\n'.format(start))
+            elif len(words) < 2:
+                continue
+            elif words[1] == 'rolls':
+                entries.append('r {}\n'.format(start))
+            elif words[1] == 'ends' and line.startswith(' ends turn after ', len(words[0])):
+                entries.append('t {}\n'.format(self.offset))
+        return ''.join(entries)
+
+    def write(self, text):
+        """
+        Append the entries completed by text to the sidecar
+        """
+        entries = self.entries(text)
+        if not entries:
+            return
+        if self._file is None:
+            self._file = self._opener(self.path, 'a')
+        self._file.write(entries)
+        self._file.flush()
+        if not self._keep_open:
+            self.close()
+
+    def truncate(self, nbytes):
+        """
+        Follow the removal of the last nbytes of the log, which leaves it ending in a newline,
+        by removing the entries for the removed text from the sidecar
+        """
+        self.close()
+        self.offset += len(self._partial.encode('utf-8')) - nbytes
+        self._partial = ''
+        if os.path.exists(self.path):
+            _truncate_index(self.path, self.offset, self._opener)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _truncate_index(path, offset, opener=open):
+    """
+    Remove the entries at the end of a sidecar which are for text from offset on: the ends of
+    headers and turns after offset, and the starts of games and rolls at or after it. The sidecar is
+    read backwards, in blocks which double until an entry to keep is found.
+    """
+    with opener(path, 'r+b') as fp:
+        size = fp.seek(0, os.SEEK_END)
+        block = 4096
+        while True:
+            start = max(0, size - block)
+            fp.seek(start)
+            lines = fp.read().split(b'\n')[:-1]
+            keep = size
+            # the first line of a block may begin before it
+            for line in reversed(lines[1 if start else 0:]):
+                kind, at = line.split(b' ')
+                if int(at) < offset or (int(at) == offset and kind in (b'h', b't')):
+                    break
+                keep -= len(line) + 1
+            else:
+                if start:
+                    block *= 2
+                    continue
+            fp.truncate(keep)
+            return
+
+
+class IndexedLog(object):
+    """
+    class IndexedLog reads turns and rolls of a log directly, without parsing what comes before.
+
+    Turns are numbered from 0 within each game, and games from 0 within the file. Rolls are
+    numbered from 0 within the file.
+    """
+    def __init__(self, path):
+        """
+        :param path: str, path to a .catan file, with or without a sidecar index
+        """
+        self.path = path
+        self._fp = open(path, 'rb')
+        size = os.fstat(self._fp.fileno()).st_size
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        if os.path.exists(index_path(path)):
+            self.starts, self.headers, self.turn_ends, self.rolls = _read_index(index_path(path))
+        else:
+            self.starts, self.headers, self.turn_ends, self.rolls = _scan(self._mm)
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def num_games(self):
+        return len(self.headers)
+
+    def _game_bounds(self, game):
+        # a game's turns run from the end of its header to the start of the next game
+        start = self.headers[game]
+        end = self.starts[game + 1] if game + 1 < len(self.starts) else len(self._mm)
+        return start, end
+
+    def num_turns(self, game=0):
+        """
+        Return the number of turns in a game, counting a turn still in progress
+        """
+        start, end = self._game_bounds(game)
+        first, last = bisect.bisect_right(self.turn_ends, start), bisect.bisect_right(self.turn_ends, end)
+        in_progress = (self.turn_ends[last - 1] if last > first else start) < end
+        return last - first + in_progress
+
+    def turn_bounds(self, turn, game=0):
+        """
+        Return the byte offsets (start, end) of a turn
+        """
+        start, end = self._game_bounds(game)
+        first = bisect.bisect_right(self.turn_ends, start)
+        if not 0 <= turn < self.num_turns(game):
+            raise IndexError('game {} has no turn {}'.format(game, turn))
+        turn_start = self.turn_ends[first + turn - 1] if turn > 0 else start
+        turn_end = self.turn_ends[first + turn] if first + turn < len(self.turn_ends) else end
+        return turn_start, min(turn_end, end)
+
+    def read_turn(self, turn, game=0):
+        """
+        Return the text of a turn
+        """
+        start, end = self.turn_bounds(turn, game)
+        return self._mm[start:end].decode('utf-8')
+
+    def turn_events(self, turn, game=0):
+        """
+        Return the events of a turn, as parsed by catanlog_reader
+        """
+        return list(reader.parse(self.read_turn(turn, game).splitlines(True)))
+
+    def read_roll(self, n):
+        """
+        Return the nth roll in the file, as a catanlog_reader.Roll
+        """
+        start = self.rolls[n]
+        end = self._mm.find(b'\n', start)
+        event, = reader.Parser().feed(self._mm[start:end].decode('utf-8'))
+        return event
+
+
+def _read_index(path):
+    offsets = {'g': array.array('Q'), 'h': array.array('Q'), 't': array.array('Q'), 'r': array.array('Q')}
+    with open(path, 'r') as fp:
+        for line in fp:
+            kind, offset = line.split(' ')
+            offsets[kind].append(int(offset))
+    return offsets['g'], offsets['h'], offsets['t'], offsets['r']
+
+
+def _scan(mm):
+    """
+    Build the index of a log without a sidecar, by searching its bytes
+    """
+    starts, headers, turn_ends, rolls = array.array('Q'), array.array('Q'), array.array('Q'), array.array('Q')
+    needles = ((_VERSION, starts), (_HEADER_END, headers), (_ENDS_TURN, turn_ends), (_ROLLS, rolls))
+    for needle, offsets in needles:
+        pos = mm.find(needle)
+        while pos != -1:
+            line_start = mm.rfind(b'\n', 0, pos) + 1
+            line_end = mm.find(b'\n', pos)
+            line_end = len(mm) if line_end == -1 else line_end + 1
+            if needle is _VERSION:
+                if pos == line_start:
+                    offsets.append(line_start)
+            elif needle is _HEADER_END:
+                if pos == line_start:
+                    offsets.append(line_end)
+            elif b' ' not in mm[line_start:pos]:
+                offsets.append(line_end if needle is _ENDS_TURN else line_start)
+            pos = mm.find(needle, line_end)
+    return starts, headers, turn_ends, rolls
+
+
+def write_index(path):
+    """
+    Write the sidecar index of an existing log
+    """
+    with open(path, 'r') as fp:
+        writer = IndexWriter(path)
+        with open(writer.path, 'w') as out:
+            for line in fp:
+                out.write(writer.entries(line))
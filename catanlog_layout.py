@@ -0,0 +1,207 @@
+"""
+module catanlog_layout implements .catanref, a catanlog (.catan) file whose headers refer to a
+shared store of board layouts instead of repeating them.
+
+The layout of a game is the part of its header written by CatanLog.log_game_start between the
+timestamp and '...CATAN!': the players and their seats, the terrain, the numbers and the ports.
+In a .catanref file each layout is replaced by one line naming it by the SHA-1 of its text,
+
+    catanlog v0.9.3
+    timestamp: 2016-01-01 00:00:00
+    layout: 0a4d55a8d778e5022fab701977c5d840bbe05cb7
+    ...CATAN!
+    red rolls 6
+    ...
+
+and the layout itself is stored once, whatever the number of games played on it, as
+<layout_dir>/<hash>. By default layout_dir is the directory 'layouts' beside the log. Games
+on the same board and roster thus share one file, and can be grouped by board from the third
+line of each log alone, see layouts().
+
+Write .catanref directly with CatanLog(fmt='catanref'). Convert with archive() and rehydrate().
+read() yields the same events as catanlog_reader.read.
+"""
+import hashlib
+import os
+import tempfile
+
+import catanlog_compress
+import catanlog_reader as reader
+
+
+SUFFIX = '.catanref'
+LAYOUT_DIR = 'layouts'
+
+_VERSION_PREFIX = 'catanlog v'
+_HEADER_END = '...CATAN!\n'
+_LAYOUT_PREFIX = 'layout: '
+
+
+def default_layout_dir(path):
+    """
+    Return the layout directory of a log: 'layouts' in the log's directory
+    """
+    return os.path.join(os.path.dirname(path), LAYOUT_DIR)
+
+
+def layout_hash(layout):
+    """
+    :param layout: str, the lines of a layout
+    :return: str, the hash naming it
+    """
+    return hashlib.sha1(layout.encode('utf-8')).hexdigest()
+
+
+class Encoder(object):
+    """
+    class Encoder turns catanlog text into .catanref text, storing each new layout as it goes.
+    """
+    def __init__(self, layout_dir):
+        """
+        :param layout_dir: str, directory of the layout store, created if it does not exist
+        """
+        self.layout_dir = layout_dir
+        self._partial = ''
+        self._layout = None
+        self._stored = set()
+
+    def feed(self, text):
+        """
+        Encode catanlog text, which may end partway through a line. The rest of the line is
+        encoded once it is fed, and the layout of a header once its '...CATAN!' is.
+
+        :param text: str
+        :return: bytes, utf-8
+        """
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        out = list()
+        for line in lines:
+            line += '\n'
+            if self._layout is not None:
+                if line == _HEADER_END:
+                    out.append(_LAYOUT_PREFIX + self.store(''.join(self._layout)) + '\n')
+                    out.append(line)
+                    self._layout = None
+                elif not line.startswith('timestamp: '):
+                    self._layout.append(line)
+                else:
+                    out.append(line)
+            else:
+                if line.startswith(_VERSION_PREFIX):
+                    self._layout = list()
+                out.append(line)
+        return ''.join(out).encode('utf-8')
+
+    def finish(self):
+        """
+        Return whatever is held back as it was fed: a partial line, or a header with no '...CATAN!'
+
+        :return: bytes, utf-8
+        """
+        held = ''.join(self._layout or ()) + self._partial
+        self._layout = None
+        self._partial = ''
+        return held.encode('utf-8')
+
+    def store(self, layout):
+        """
+        Store a layout unless it is stored already, and return its hash
+        """
+        digest = layout_hash(layout)
+        if digest not in self._stored:
+            path = os.path.join(self.layout_dir, digest)
+            if not os.path.exists(path):
+                os.makedirs(self.layout_dir, exist_ok=True)
+                # written under a temporary name and renamed, so a reader never sees half a layout
+                fd, tmp = tempfile.mkstemp(dir=self.layout_dir, prefix='.' + digest)
+                with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+                    fp.write(layout)
+                os.replace(tmp, path)
+            self._stored.add(digest)
+        return digest
+
+
+def load_layout(layout_dir, digest):
+    with open(os.path.join(layout_dir, digest), 'r', encoding='utf-8') as fp:
+        return fp.read()
+
+
+def rehydrate_lines(lines, layout_dir):
+    """
+    Yield the lines of the .catan text encoded by the lines of a .catanref file. Each layout
+    is read from layout_dir once.
+    """
+    loaded = dict()
+    for line in lines:
+        if line.startswith(_LAYOUT_PREFIX):
+            digest = line[len(_LAYOUT_PREFIX):].rstrip('\n')
+            layout = loaded.get(digest)
+            if layout is None:
+                layout = loaded[digest] = load_layout(layout_dir, digest).splitlines(True)
+            for layout_line in layout:
+                yield layout_line
+        else:
+            yield line
+
+
+def read(path, layout_dir=None):
+    """
+    Parse the .catanref file at the given path, yielding events as they are read.
+
+    :param path: str, path to a .catanref file, which may be compressed, see module catanlog_compress
+    :param layout_dir: str, the layout store, by default default_layout_dir(path)
+    :return: generator of Header and gameplay events
+    """
+    layout_dir = default_layout_dir(path) if layout_dir is None else layout_dir
+    with catanlog_compress.open_log(path) as fp:
+        for event in reader.parse(rehydrate_lines(fp, layout_dir)):
+            yield event
+
+
+def layouts(path):
+    """
+    Return the hashes of the layouts of the games in a .catanref file, in order, without
+    reading their layouts
+    """
+    with catanlog_compress.open_log(path) as fp:
+        return [line[len(_LAYOUT_PREFIX):].rstrip('\n') for line in fp if line.startswith(_LAYOUT_PREFIX)]
+
+
+def group_by_layout(paths):
+    """
+    Group .catanref files by the layouts of their games, reading no more than their layout lines
+
+    :param paths: iterable of str, paths to .catanref files
+    :return: dict of layout hash -> list of (path, game number within the file)
+    """
+    groups = dict()
+    for path in paths:
+        for game, digest in enumerate(layouts(path)):
+            groups.setdefault(digest, list()).append((path, game))
+    return groups
+
+
+def archive(src, dst, layout_dir=None):
+    """
+    Convert the .catan file at path src to a .catanref file at path dst.
+
+    :param layout_dir: str, the layout store, by default default_layout_dir(dst)
+    """
+    encoder = Encoder(default_layout_dir(dst) if layout_dir is None else layout_dir)
+    with catanlog_compress.open_log(src) as fin, open(dst, 'wb') as fout:
+        for line in fin:
+            fout.write(encoder.feed(line))
+        fout.write(encoder.finish())
+
+
+def rehydrate(src, dst, layout_dir=None):
+    """
+    Convert the .catanref file at path src to a .catan file at path dst.
+
+    :param layout_dir: str, the layout store, by default default_layout_dir(src)
+    """
+    layout_dir = default_layout_dir(src) if layout_dir is None else layout_dir
+    with catanlog_compress.open_log(src) as fin, open(dst, 'w', encoding='utf-8') as fout:
+        for line in rehydrate_lines(fin, layout_dir):
+            fout.write(line)
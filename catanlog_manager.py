@@ -0,0 +1,261 @@
+"""
+module catanlog_manager logs many concurrent games through a bounded pool of open files.
+
+A LogManager owns one CatanLog per game, keyed by any hashable game id. The games' flushes
+are collected in memory and written out together, at most every batch_interval seconds or
+once batch_size characters are pending, through a FilePool which holds at most max_open
+files open, closing the least recently used. A process hosting thousands of games thus uses
+a fixed number of file descriptors, and opens each file about once per batch rather than
+once per line.
+
+    manager = LogManager(log_dir='log', max_open=64)
+    manager.log(game_id).log_game_start(players, terrain, numbers, ports)
+    ...
+    manager.close(game_id)
+
+See class LogManager for documentation.
+"""
+import collections
+import os
+import threading
+
+import catanlog
+
+
+class FilePool(object):
+    """
+    class FilePool appends to files through at most max_open open file handles.
+
+    Handles are kept open between writes, and the least recently used is closed when another
+    file must be opened.
+    """
+    def __init__(self, max_open=64):
+        """
+        :param max_open: int, most files held open at once
+        """
+        if max_open < 1:
+            raise ValueError('max_open must be at least 1')
+        self.max_open = max_open
+        self.opens = 0
+        self._files = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._files)
+
+    def write(self, path, data):
+        """
+        Append data to the file at path.
+
+        :param data: str, or bytes to append in binary mode
+        """
+        file = self._files.get(path)
+        if file is None:
+            while len(self._files) >= self.max_open:
+                _, lru = self._files.popitem(last=False)
+                lru.close()
+            file = open(path, 'ab' if isinstance(data, bytes) else 'a')
+            self.opens += 1
+            self._files[path] = file
+        else:
+            self._files.move_to_end(path)
+        file.write(data)
+
+    def flush(self):
+        for file in self._files.values():
+            file.flush()
+
+    def close(self, path=None):
+        """
+        Close the file at path, or every file if path is None
+        """
+        paths = list(self._files) if path is None else [path]
+        for p in paths:
+            file = self._files.pop(p, None)
+            if file is not None:
+                file.close()
+
+
+class ManagedCatanLog(catanlog.CatanLog):
+    """
+    class ManagedCatanLog is a CatanLog whose flushes are handed to its LogManager.
+
+    With auto_flush, the log is flushed at the end of each line.
+    """
+    def __init__(self, manager, **kwargs):
+        """
+        :param manager: LogManager
+        :param kwargs: CatanLog options. use_stdout, keep_open and index are not supported.
+        """
+        if kwargs.get('use_stdout') or kwargs.get('keep_open') or kwargs.get('index'):
+            raise ValueError('ManagedCatanLog does not support use_stdout, keep_open or index')
+        super(ManagedCatanLog, self).__init__(**kwargs)
+        self._manager = manager
+
+    def _log(self, content):
+        self._buffer.append(content)
+        if self._auto_flush and content.endswith('\n'):
+            self.flush()
+
+    def _write(self, data):
+        if data:
+            self._manager._enqueue(self.logpath(), data)
+
+    def _truncate(self, nbytes):
+        self._manager._truncate(self.logpath(), nbytes)
+
+    def _sync(self):
+        with self._manager._lock:
+            self._manager._write_pending()
+
+
+class LogManager(object):
+    """
+    class LogManager owns the CatanLogs of many concurrent games.
+
+    Use #log to get (or create) the CatanLog of a game, and log to it as usual. #dump and
+    #reset behave exactly as CatanLog's. Use #flush to write every game's pending output
+    now, and #close to flush and forget a finished game, or every game.
+
+    Output is written when batch_size characters are pending, when a timer fires
+    batch_interval seconds after the first pending output, and on flush() and close().
+    Between writes it is only in memory, and the files on disk lag behind dump().
+
+    LogManager is thread-safe: games may be logged to from different threads, each game's log
+    being used by one thread at a time. The manager's own timer only writes output the logs
+    have already handed over, and never touches a log while its thread may be logging.
+    """
+    def __init__(self, log_dir='log', max_open=64, batch_size=2**16, batch_interval=1.0, **kwargs):
+        """
+        :param log_dir: directory to write the logs to, str
+        :param max_open: most files held open at once, int
+        :param batch_size: write out once this many characters are pending, int
+        :param batch_interval: write out at most this many seconds after output is pending, float,
+                               or None for no timer
+        :param kwargs: other options for each game's CatanLog, eg fmt='catanb'
+        """
+        self.pool = FilePool(max_open)
+        self._log_dir = log_dir
+        self._batch_size = batch_size
+        self._batch_interval = batch_interval
+        self._log_kwargs = kwargs
+        self._games = dict()
+        self._pending = collections.OrderedDict()
+        self._pending_size = 0
+        self._lock = threading.RLock()
+        self._timer = None
+
+    def __len__(self):
+        return len(self._games)
+
+    def __contains__(self, game):
+        return game in self._games
+
+    def games(self):
+        return list(self._games)
+
+    def log(self, game):
+        """
+        Return the CatanLog of a game, creating it if necessary
+        """
+        log = self._games.get(game)
+        if log is None:
+            with self._lock:
+                log = self._games.get(game)
+                if log is None:
+                    log = ManagedCatanLog(self, log_dir=self._log_dir, **self._log_kwargs)
+                    self._games[game] = log
+        return log
+
+    __getitem__ = log
+
+    def dump(self, game):
+        """
+        Dump the entire log of a game to a string, and return it
+        """
+        return self._games[game].dump()
+
+    def resume(self, game, path):
+        """
+        Continue the last game in an existing logfile as the log of a game, see CatanLog.resume
+        """
+        log = self.log(game)
+        log.resume(path)
+        return log
+
+    def reset(self, game):
+        """
+        Erase the log of a game and reset its timestamp. Output already flushed stays in its file.
+        """
+        self._games[game].reset()
+
+    def _enqueue(self, path, data):
+        with self._lock:
+            chunks = self._pending.get(path)
+            if chunks is None:
+                self._pending[path] = chunks = list()
+            chunks.append(data)
+            self._pending_size += len(data)
+            if self._pending_size >= self._batch_size:
+                self._write_pending()
+            elif self._timer is None and self._batch_interval is not None:
+                self._timer = threading.Timer(self._batch_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _write_pending(self):
+        pending, self._pending, self._pending_size = self._pending, collections.OrderedDict(), 0
+        for path, chunks in pending.items():
+            self.pool.write(path, (b'' if isinstance(chunks[0], bytes) else '').join(chunks))
+        self.pool.flush()
+
+    def _truncate(self, path, nbytes):
+        """
+        Remove the last nbytes of a game's output, writing what is pending first
+        """
+        with self._lock:
+            self._write_pending()
+            os.truncate(path, os.path.getsize(path) - nbytes)
+
+    def flush(self):
+        """
+        Write the pending output of every game to its file. What a game's log has not flushed
+        yet, eg with auto_flush=False, is left to it, see close().
+        """
+        with self._lock:
+            if self._timer is not None:
+                if self._timer is not threading.current_thread():
+                    self._timer.cancel()
+                self._timer = None
+            self._write_pending()
+
+    def close(self, game=None):
+        """
+        Flush a game's log, close its file and forget it, or do so for every game if game is None.
+        The games closed must no longer be logged to from other threads.
+        """
+        with self._lock:
+            if game is None:
+                for log in self._games.values():
+                    if log._latest():
+                        log.flush()
+                    log._end_stream()
+                self.flush()
+                self.pool.close()
+                self._games.clear()
+                return
+            log = self._games.pop(game)
+            if log._latest():
+                log.flush()
+            log._end_stream()
+            path = log.logpath()
+            chunks = self._pending.pop(path, None)
+            if chunks is not None:
+                self._pending_size -= sum(len(c) for c in chunks)
+                self.pool.write(path, (b'' if isinstance(chunks[0], bytes) else '').join(chunks))
+            self.pool.close(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,149 @@
+"""
+module catanlog_metrics counts what CatanLogs spend their time on.
+
+A Metrics object counts, over every log it is attached to,
+- calls: calls of each log_* method, including those made by other log_* methods, eg the
+  robber move of log_player_plays_knight
+- buffered: characters appended to the logs
+- flushed: characters flushed, and written: characters of text, or bytes of .catanb or
+  compressed output, handed to the logfile (or to stdout, a queue or a LogManager)
+- flushes: calls of flush(), and their latency as a histogram of power-of-two buckets of
+  microseconds
+- opens: files opened by the logs themselves: their logfiles, including those created by
+  exclusive and read back by dump() and resume(), and index sidecars. See FilePool.opens for
+  a LogManager's files
+
+Attach it with CatanLog(metrics=Metrics()). Attaching wraps the log's methods on the
+instance, so a log without metrics runs exactly the code it did before, at no cost. See
+bench/bench_metrics.py.
+
+    metrics = catanlog_metrics.Metrics(on_flush=lambda seconds, chars: histogram.observe(seconds))
+    log = catanlog.CatanLog(metrics=metrics)
+    ...
+    metrics.snapshot()
+
+Counters are updated without a lock: a Metrics shared by logs on several threads may
+undercount slightly, but never blocks them.
+"""
+import collections
+import functools
+import time
+
+
+class Metrics(object):
+    """
+    class Metrics holds the counters of one or more CatanLogs, and the callbacks to forward
+    them elsewhere as they change.
+    """
+    def __init__(self, on_call=None, on_flush=None, on_open=None):
+        """
+        :param on_call: function(method name), called after each log_* call
+        :param on_flush: function(seconds, chars), called after each flush
+        :param on_open: function(path), called after a log opens a file
+        """
+        self.on_call = on_call
+        self.on_flush = on_flush
+        self.on_open = on_open
+        self.reset()
+
+    def reset(self):
+        """
+        Zero every counter
+        """
+        self.calls = collections.Counter()
+        self.buffered = 0
+        self.flushed = 0
+        self.written = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self.flush_latency = collections.Counter()
+        self.opens = 0
+
+    def snapshot(self):
+        """
+        Return the counters as a dict of plain values. flush_latency maps the upper bound
+        of each bucket, in microseconds, to the number of flushes which took less than it.
+        """
+        return {
+            'calls': dict(self.calls),
+            'buffered': self.buffered,
+            'flushed': self.flushed,
+            'written': self.written,
+            'flushes': self.flushes,
+            'flush_seconds': self.flush_seconds,
+            'flush_latency': {1 << bucket: count for bucket, count in sorted(self.flush_latency.items())},
+            'opens': self.opens,
+        }
+
+    def attach(self, log):
+        """
+        Count the calls of a log from now on, by wrapping its methods on the instance
+        """
+        for name in dir(type(log)):
+            if name.startswith('log_') and name != 'log_events':
+                setattr(log, name, self._counted(name, getattr(log, name)))
+        setattr(log, 'log_events', self._counted_events(log, log.log_events))
+        setattr(log, '_log', self._counted_log(log._log))
+        setattr(log, 'flush', self._timed_flush(log, log.flush))
+        setattr(log, '_write', self._counted_write(log._write))
+        setattr(log, '_open', self._counted_open(log._open))
+
+    def _counted(self, name, method):
+        @functools.wraps(method)
+        def counted(*args, **kwargs):
+            result = method(*args, **kwargs)
+            self.calls[name] += 1
+            if self.on_call is not None:
+                self.on_call(name)
+            return result
+        return counted
+
+    def _counted_events(self, log, log_events):
+        @functools.wraps(log_events)
+        def counted(events):
+            before = len(log._buffer)
+            result = log_events(events)
+            self.buffered += max(0, len(log._buffer) - before)
+            self.calls['log_events'] += 1
+            if self.on_call is not None:
+                self.on_call('log_events')
+            return result
+        return counted
+
+    def _counted_log(self, _log):
+        def counted(content):
+            self.buffered += len(content)
+            return _log(content)
+        return counted
+
+    def _timed_flush(self, log, flush):
+        @functools.wraps(flush)
+        def timed():
+            before = log._chars_flushed
+            start = time.perf_counter()
+            result = flush()
+            seconds = time.perf_counter() - start
+            chars = log._chars_flushed - before
+            self.flushed += chars
+            self.flushes += 1
+            self.flush_seconds += seconds
+            self.flush_latency[int(seconds * 1e6).bit_length()] += 1
+            if self.on_flush is not None:
+                self.on_flush(seconds, chars)
+            return result
+        return timed
+
+    def _counted_write(self, _write):
+        def counted(data):
+            self.written += len(data)
+            return _write(data)
+        return counted
+
+    def _counted_open(self, _open):
+        def counted(path, mode):
+            file = _open(path, mode)
+            self.opens += 1
+            if self.on_open is not None:
+                self.on_open(path)
+            return file
+        return counted
@@ -0,0 +1,357 @@
+"""
+module catanlog_reader reads catanlog (.catan) files back into events.
+
+See function parse for documentation.
+"""
+import collections
+import datetime
+import re
+
+import catanlog
+import catanlog_compress
+
+
+Player = collections.namedtuple('Player', ['seat', 'name', 'color'])
+Port = collections.namedtuple('Port', ['tile_id', 'direction', 'type'])
+
+# header of a game, as written by CatanLog.log_game_start
+Header = collections.namedtuple('Header', ['version', 'timestamp', 'players', 'terrain', 'numbers', 'ports'])
+
+# one event per gameplay action, fields named after the parameters of the CatanLog method
+# which wrote them. Players are given by color, resources by terrain value, ports by port type.
+Roll = collections.namedtuple('Roll', ['player', 'roll'])
+MovesRobber = collections.namedtuple('MovesRobber', ['player', 'location', 'victim'])
+BuysRoad = collections.namedtuple('BuysRoad', ['player', 'location'])
+BuysSettlement = collections.namedtuple('BuysSettlement', ['player', 'location'])
+BuysCity = collections.namedtuple('BuysCity', ['player', 'location'])
+BuysDevCard = collections.namedtuple('BuysDevCard', ['player'])
+TradesWithPort = collections.namedtuple('TradesWithPort', ['player', 'to_port', 'port', 'to_player'])
+TradesWithPlayer = collections.namedtuple('TradesWithPlayer', ['player', 'to_other', 'other', 'to_player'])
+PlaysKnight = collections.namedtuple('PlaysKnight', ['player', 'location', 'victim'])
+PlaysRoadBuilder = collections.namedtuple('PlaysRoadBuilder', ['player', 'location1', 'location2'])
+PlaysYearOfPlenty = collections.namedtuple('PlaysYearOfPlenty', ['player', 'resource1', 'resource2'])
+PlaysMonopoly = collections.namedtuple('PlaysMonopoly', ['player', 'resource'])
+PlaysVictoryPoint = collections.namedtuple('PlaysVictoryPoint', ['player'])
+EndsTurn = collections.namedtuple('EndsTurn', ['player', 'seconds'])
+Wins = collections.namedtuple('Wins', ['player'])
+
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_version_re = re.compile(r'^(\S+) v(\d+\.\d+\.\d+)$')
+_player_re = re.compile(r'^name: (.*), color: (\S+), seat: (\d+)$')
+_port_re = re.compile(r'^(\S+)\((\d+) (\w+)\)$')
+
+_body_res = {
+    'rolls': [(re.compile(r'^(\S+) rolls (\d+)(?: \.\.\.DEUCES!)?$'),
+               lambda m: Roll(m.group(1), int(m.group(2))))],
+    'moves': [(re.compile(r'^(\S+) moves robber to (.+), steals from (\S+)$'),
+               lambda m: MovesRobber(*m.groups()))],
+    'buys': [(re.compile(r'^(\S+) buys road, builds at (.+)$'),
+              lambda m: BuysRoad(*m.groups())),
+             (re.compile(r'^(\S+) buys settlement, builds at (.+)$'),
+              lambda m: BuysSettlement(*m.groups())),
+             (re.compile(r'^(\S+) buys city, builds at (.+)$'),
+              lambda m: BuysCity(*m.groups())),
+             (re.compile(r'^(\S+) buys dev card$'),
+              lambda m: BuysDevCard(*m.groups()))],
+    'trades': [(re.compile(r'^(\S+) trades \[(.*)\] to port (\S+) for \[(.*)\]$'),
+                lambda m: TradesWithPort(m.group(1), _parse_items(m.group(2)), m.group(3),
+                                         _parse_items(m.group(4)))),
+               (re.compile(r'^(\S+) trades \[(.*)\] to player (\S+) for \[(.*)\]$'),
+                lambda m: TradesWithPlayer(m.group(1), _parse_items(m.group(2)), m.group(3),
+                                           _parse_items(m.group(4))))],
+    'plays': [(re.compile(r'^(\S+) plays knight$'),
+               lambda m: PlaysKnight(m.group(1), None, None)),
+              (re.compile(r'^(\S+) plays road builder, builds at (.+?) and (.+)$'),
+               lambda m: PlaysRoadBuilder(*m.groups())),
+              (re.compile(r'^(\S+) plays year of plenty, takes (\S+) and (\S+)$'),
+               lambda m: PlaysYearOfPlenty(*m.groups())),
+              (re.compile(r'^(\S+) plays monopoly on (\S+)$'),
+               lambda m: PlaysMonopoly(*m.groups())),
+              (re.compile(r'^(\S+) plays victory point$'),
+               lambda m: PlaysVictoryPoint(*m.groups()))],
+    'ends': [(re.compile(r'^(\S+) ends turn after (-?\d+)s$'),
+              lambda m: EndsTurn(m.group(1), int(m.group(2))))],
+    'wins': [(re.compile(r'^(\S+) wins$'),
+              lambda m: Wins(*m.groups()))],
+}
+
+
+def _parse_items(text):
+    """
+    '3 wood, 1 brick' -> [(3, 'wood'), (1, 'brick')]
+    """
+    if not text:
+        return list()
+    items = list()
+    for item in text.split(', '):
+        num, res = item.split(' ')
+        items.append((int(num), res))
+    return items
+
+
+class Parser(object):
+    """
+    class Parser turns the lines of a catanlog into events, one line at a time.
+
+    Feed it lines in order with #feed, which returns the events completed by that line, and
+    call #close at the end of input. Most lines complete exactly one event. The header lines
+    complete a single Header event at '...CATAN!', and a 'plays knight' line is completed by
+    the robber move on the line after it.
+
+    Any number of games may follow one another in the same input; each begins with a Header.
+    """
+    def __init__(self):
+        self.lineno = 0
+        self._header = None
+        self._header_lines = None
+        self._knight = None
+
+    def feed(self, line):
+        """
+        :param line: one line of the log, with or without its trailing newline
+        :return: list of events completed by this line
+        """
+        self.lineno += 1
+        if line.endswith('\n'):
+            line = line[:-1]
+
+        if self._header is not None:
+            return self._feed_header(line)
+        if self._knight is not None:
+            knight, self._knight = self._knight, None
+            match = _body_res['moves'][0][0].match(line)
+            if match is None or match.group(1) != knight.player:
+                self._error(line, 'expected the robber move of a knight played by {}'.format(knight.player))
+            return [knight._replace(location=match.group(2), victim=match.group(3))]
+
+        match = _version_re.match(line)
+        if match is not None:
+            self._header = dict(version=match.group(2))
+            self._header_lines = self._header_fields()
+            next(self._header_lines)
+            return list()
+
+        event = self._parse_body(line)
+        if isinstance(event, PlaysKnight):
+            self._knight = event
+            return list()
+        return [event]
+
+    def close(self):
+        """
+        Signal the end of input.
+
+        :return: list of events still pending, always empty for a complete log
+        """
+        if self._header is not None:
+            raise ValueError('line {}: log ends inside a header'.format(self.lineno))
+        if self._knight is not None:
+            raise ValueError('line {}: log ends after a knight with no robber move'.format(self.lineno))
+        return list()
+
+    def _parse_body(self, line):
+        words = line.split(' ', 2)
+        if len(words) > 1:
+            for regex, build in _body_res.get(words[1], ()):
+                match = regex.match(line)
+                if match is not None:
+                    return build(match)
+        self._error(line, 'unrecognized line')
+
+    def _feed_header(self, line):
+        try:
+            done = self._header_lines.send(line)
+        except ValueError as e:
+            self._error(line, str(e))
+        if not done:
+            return list()
+        header, self._header, self._header_lines = Header(**self._header), None, None
+        return [header]
+
+    def _header_fields(self):
+        """
+        Coroutine which receives the header lines after the version line, in order, and
+        yields True once the header is complete.
+        """
+        header = self._header
+        line = yield
+        header['timestamp'] = datetime.datetime.strptime(_strip_prefix(line, 'timestamp: '),
+                                                         TIMESTAMP_FORMAT)
+        line = yield False
+        num_players = int(_strip_prefix(line, 'players: '))
+        players = list()
+        for _ in range(num_players):
+            line = yield False
+            match = _player_re.match(line)
+            if match is None:
+                raise ValueError('expected a player')
+            players.append(Player(int(match.group(3)), match.group(1), match.group(2)))
+        header['players'] = players
+        line = yield False
+        terrain = _strip_prefix(line, 'terrain: ')
+        header['terrain'] = terrain.split(' ') if terrain else list()
+        line = yield False
+        numbers = _strip_prefix(line, 'numbers: ')
+        header['numbers'] = [None if n == 'None' else int(n) for n in numbers.split(' ')] if numbers else list()
+        line = yield False
+        header['ports'] = _parse_ports(_strip_prefix(line, 'ports: '))
+        line = yield False
+        if line != '...CATAN!':
+            raise ValueError('expected ...CATAN!')
+        yield True
+
+    def _error(self, line, message):
+        raise ValueError('line {}: {}: {!r}'.format(self.lineno, message, line))
+
+
+def _strip_prefix(line, prefix):
+    if not line.startswith(prefix):
+        raise ValueError('expected {!r}'.format(prefix.strip()))
+    return line[len(prefix):]
+
+
+def _parse_ports(text):
+    """
+    '3:1(1 NW) wood(2 W)' -> [Port(1, 'NW', '3:1'), Port(2, 'W', 'wood')]
+    """
+    ports = list()
+    if not text:
+        return ports
+    words = text.split(' ')
+    for type_tile, direction in zip(words[::2], words[1::2]):
+        match = _port_re.match('{} {}'.format(type_tile, direction))
+        if match is None:
+            raise ValueError('expected a port')
+        ports.append(Port(int(match.group(2)), match.group(3), match.group(1)))
+    return ports
+
+
+def parse(lines):
+    """
+    Parse a catanlog, yielding events as they are read.
+
+    Lines are consumed lazily, so a file object may be passed to stream a log of any size,
+    including many games concatenated into one file.
+
+    :param lines: iterable of str, the lines of the log
+    :return: generator of Header and gameplay events
+    """
+    parser = Parser()
+    for line in lines:
+        for event in parser.feed(line):
+            yield event
+    for event in parser.close():
+        yield event
+
+
+def read(path):
+    """
+    Parse the catanlog at the given path, yielding events as they are read.
+
+    :param path: str, path to a .catan file, which may be compressed, see module catanlog_compress
+    :return: generator of Header and gameplay events
+    """
+    with catanlog_compress.open_log(path) as fp:
+        for event in parse(fp):
+            yield event
+
+
+class _Value(collections.namedtuple('_Value', ['value'])):
+    """
+    Stands in for catan.board.Terrain, HexNumber and PortType when re-emitting events.
+    """
+
+
+def _player(color):
+    return Player(None, None, color)
+
+
+def _items(items):
+    return [(num, _Value(res)) for num, res in items]
+
+
+def emit(event, log):
+    """
+    Log an event through the matching method of a CatanLog.
+
+    Emitting every event parsed from a log reproduces that log exactly, as long as it was
+    written by this version of catanlog.
+
+    :param event: an event yielded by parse()
+    :param log: CatanLog
+    """
+    kind = type(event)
+    if kind is Header:
+        log.log_game_start(event.players,
+                           [_Value(t) for t in event.terrain],
+                           [_Value(n) for n in event.numbers],
+                           [_catanlog_port(p) for p in event.ports],
+                           timestamp=event.timestamp)
+    elif kind is Roll:
+        log.log_player_roll(_player(event.player), event.roll)
+    elif kind is MovesRobber:
+        log.log_player_moves_robber_and_steals(_player(event.player), event.location, _player(event.victim))
+    elif kind is BuysRoad:
+        log.log_player_buys_road(_player(event.player), event.location)
+    elif kind is BuysSettlement:
+        log.log_player_buys_settlement(_player(event.player), event.location)
+    elif kind is BuysCity:
+        log.log_player_buys_city(_player(event.player), event.location)
+    elif kind is BuysDevCard:
+        log.log_player_buys_dev_card(_player(event.player))
+    elif kind is TradesWithPort:
+        log.log_player_trades_with_port(_player(event.player), _items(event.to_port),
+                                        _catanlog_port(Port(None, None, event.port)), _items(event.to_player))
+    elif kind is TradesWithPlayer:
+        log.log_player_trades_with_other_player(_player(event.player), _items(event.to_other),
+                                                _player(event.other), _items(event.to_player))
+    elif kind is PlaysKnight:
+        log.log_player_plays_knight(_player(event.player), event.location, _player(event.victim))
+    elif kind is PlaysRoadBuilder:
+        log.log_player_plays_road_builder(_player(event.player), event.location1, event.location2)
+    elif kind is PlaysYearOfPlenty:
+        log.log_player_plays_year_of_plenty(_player(event.player), _Value(event.resource1), _Value(event.resource2))
+    elif kind is PlaysMonopoly:
+        log.log_player_plays_monopoly(_player(event.player), _Value(event.resource))
+    elif kind is PlaysVictoryPoint:
+        log.log_player_plays_victory_point(_player(event.player))
+    elif kind is EndsTurn:
+        log.log_player_ends_turn(_player(event.player), seconds=event.seconds)
+    elif kind is Wins:
+        log.log_player_wins(_player(event.player))
+    else:
+        raise ValueError('not a catanlog event: {!r}'.format(event))
+
+
+class _CatanLogPort(collections.namedtuple('_CatanLogPort', ['tile_id', 'direction', 'type'])):
+    """
+    Stands in for catan.board.Port when re-emitting events.
+    """
+
+
+def _catanlog_port(port):
+    """
+    Convert a parsed Port to the shape CatanLog expects of a catan.board.Port.
+    """
+    return _CatanLogPort(port.tile_id, port.direction, _Value(port.type))
+
+
+def render(events):
+    """
+    Render events back to catanlog text, yielding the text of each event in turn.
+
+    Unlike emit(), headers keep the version they were read with.
+
+    :param events: iterable of events, as yielded by parse()
+    :return: generator of str
+    """
+    log = catanlog.CatanLog(auto_flush=False)
+    for event in events:
+        emit(event, log)
+        text = log.dump()
+        if type(event) is Header and event.version != catanlog.__version__:
+            text = '{} v{}\n{}'.format(catanlog.__name__, event.version, text.split('\n', 1)[1])
+        yield text
+        log.reset()
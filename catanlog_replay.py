@@ -0,0 +1,252 @@
+"""
+module catanlog_replay replays a game from its log, from a spectator's point of view.
+
+See class Replay for documentation.
+"""
+import collections
+import copy
+
+import hexgrid
+
+import catanlog_reader as reader
+
+
+RESOURCES = ('wood', 'brick', 'wheat', 'sheep', 'ore')
+
+_tiles_touching_node = collections.defaultdict(list)
+for _tile_id in hexgrid.legal_tile_ids():
+    for _node in hexgrid.nodes_touching_tile(_tile_id):
+        _tiles_touching_node[_node].append(_tile_id)
+
+
+def _node_coord(location):
+    """
+    '(1 NW)' -> the hexgrid node coordinate
+    """
+    tile_id, direction = location[1:-1].split(' ')
+    return hexgrid.node_coord_in_direction(int(tile_id), direction)
+
+
+class PlayerState(object):
+    """
+    class PlayerState is the publicly known state of one player.
+
+    Resources are known flows, not holdings: what the player is known to have received or given
+    up through production, trades and year of plenty. Cards moved by robbers and monopolies are
+    not logged, so robber steals are counted in stolen/lost, and monopolies in monopolies.
+    Resources spent on building are not counted.
+    """
+    def __init__(self, color):
+        self.color = color
+        self.roads = list()
+        self.settlements = list()
+        self.cities = list()
+        self.dev_cards_bought = 0
+        self.dev_cards_played = collections.Counter()
+        self.resources = collections.Counter()
+        self.stolen = 0
+        self.lost = 0
+        self.monopolies = list()
+
+    @property
+    def dev_cards_held(self):
+        return self.dev_cards_bought - sum(self.dev_cards_played.values())
+
+    def __repr__(self):
+        return 'PlayerState({})'.format(self.color)
+
+
+class GameState(object):
+    """
+    class GameState is the publicly known state of a game after some number of events.
+    """
+    def __init__(self, header):
+        """
+        :param header: catanlog_reader.Header
+        """
+        self.header = header
+        self.terrain = header.terrain
+        self.numbers = header.numbers
+        self.ports = header.ports
+        self.robber = self.terrain.index('desert') + 1 if 'desert' in self.terrain else None
+        self.players = collections.OrderedDict((p.color, PlayerState(p.color)) for p in header.players)
+        self.turn = 0
+        self.current = None
+        self.last_roll = None
+        self.winner = None
+
+    def player(self, color):
+        if color not in self.players:
+            self.players[color] = PlayerState(color)
+        return self.players[color]
+
+    def apply(self, event):
+        """
+        Update the state with one gameplay event
+        """
+        kind = type(event)
+        player = self.player(event.player)
+        self.current = event.player
+        if kind is reader.Roll:
+            self.last_roll = event.roll
+            self._produce(event.roll)
+        elif kind in (reader.MovesRobber, reader.PlaysKnight):
+            self.robber = int(event.location)
+            if kind is reader.PlaysKnight:
+                player.dev_cards_played['knight'] += 1
+            if event.victim in self.players:
+                player.stolen += 1
+                self.players[event.victim].lost += 1
+        elif kind is reader.BuysRoad:
+            player.roads.append(event.location)
+        elif kind is reader.BuysSettlement:
+            player.settlements.append(event.location)
+        elif kind is reader.BuysCity:
+            node = _node_coord(event.location)
+            player.settlements = [s for s in player.settlements if _node_coord(s) != node]
+            player.cities.append(event.location)
+        elif kind is reader.BuysDevCard:
+            player.dev_cards_bought += 1
+        elif kind is reader.TradesWithPort:
+            self._give(player, event.to_port)
+            self._take(player, event.to_player)
+        elif kind is reader.TradesWithPlayer:
+            other = self.player(event.other)
+            self._give(player, event.to_other)
+            self._take(other, event.to_other)
+            self._give(other, event.to_player)
+            self._take(player, event.to_player)
+        elif kind is reader.PlaysRoadBuilder:
+            player.dev_cards_played['road builder'] += 1
+            player.roads.extend([event.location1, event.location2])
+        elif kind is reader.PlaysYearOfPlenty:
+            player.dev_cards_played['year of plenty'] += 1
+            self._take(player, [(1, event.resource1), (1, event.resource2)])
+        elif kind is reader.PlaysMonopoly:
+            player.dev_cards_played['monopoly'] += 1
+            player.monopolies.append(event.resource)
+        elif kind is reader.PlaysVictoryPoint:
+            player.dev_cards_played['victory point'] += 1
+        elif kind is reader.EndsTurn:
+            self.turn += 1
+        elif kind is reader.Wins:
+            self.winner = event.player
+        else:
+            raise ValueError('not a gameplay event: {!r}'.format(event))
+
+    def _produce(self, roll):
+        tiles = [i + 1 for i, number in enumerate(self.numbers)
+                 if number == roll and i + 1 != self.robber and self.terrain[i] in RESOURCES]
+        if not tiles:
+            return
+        for player in self.players.values():
+            for amount, buildings in ((1, player.settlements), (2, player.cities)):
+                for location in buildings:
+                    for tile_id in _tiles_touching_node[_node_coord(location)]:
+                        if tile_id in tiles:
+                            player.resources[self.terrain[tile_id - 1]] += amount
+
+    @staticmethod
+    def _give(player, items):
+        for num, res in items:
+            player.resources[res] -= num
+
+    @staticmethod
+    def _take(player, items):
+        for num, res in items:
+            player.resources[res] += num
+
+
+Snapshot = collections.namedtuple('Snapshot', ['position', 'state'])
+
+
+class Replay(object):
+    """
+    class Replay steps through the events of one game, maintaining its GameState.
+
+    Use #step to apply the next event, #seek_turn to jump to the start of any turn, and
+    #snapshot/#restore to save and return to a point in the game. A snapshot is kept
+    automatically at the start of every snapshot_every-th turn, all of them taken when the
+    Replay is created, so that any seek, even the first, replays at most snapshot_every turns
+    of events.
+    """
+    def __init__(self, events, snapshot_every=10):
+        """
+        :param events: iterable of events of one game, beginning with its Header, as yielded
+                       by catanlog_reader.parse()
+        :param snapshot_every: int, turns between automatic snapshots
+        """
+        events = iter(events)
+        header = next(events)
+        if type(header) is not reader.Header:
+            raise ValueError('a game must begin with its header, not {!r}'.format(header))
+        self.events = list(events)
+        self.position = 0
+        self.state = GameState(header)
+        self.snapshot_every = snapshot_every
+        self._snapshots = [self.snapshot()]
+        # play the game through once, which takes the automatic snapshots, and go back to its start
+        while not self.done():
+            self.step()
+        self.restore(self._snapshots[0])
+
+    @classmethod
+    def from_file(cls, path, game=0, snapshot_every=10):
+        """
+        Replay a game of the .catan file at the given path
+        """
+        events = list()
+        games = -1
+        for event in reader.read(path):
+            if type(event) is reader.Header:
+                games += 1
+                if games > game:
+                    break
+            if games == game:
+                events.append(event)
+        return cls(events, snapshot_every)
+
+    def done(self):
+        return self.position >= len(self.events)
+
+    def step(self):
+        """
+        Apply the next event, and return it
+        """
+        event = self.events[self.position]
+        self.state.apply(event)
+        self.position += 1
+        if type(event) is reader.EndsTurn and self.state.turn % self.snapshot_every == 0:
+            if self._snapshots[-1].position < self.position:
+                self._snapshots.append(self.snapshot())
+        return event
+
+    def snapshot(self):
+        """
+        Return a Snapshot of the current state
+        """
+        return Snapshot(self.position, copy.deepcopy(self.state))
+
+    def restore(self, snapshot):
+        """
+        Return to a Snapshot taken earlier
+        """
+        self.position = snapshot.position
+        self.state = copy.deepcopy(snapshot.state)
+
+    def seek_turn(self, turn):
+        """
+        Move to the start of a turn, turn 0 being the first, restoring from the latest
+        automatic snapshot at or before it
+        """
+        best = self._snapshots[0]
+        for snapshot in self._snapshots:
+            if snapshot.state.turn <= turn:
+                best = snapshot
+        if not (self.state.turn < turn and best.position <= self.position):
+            self.restore(best)
+        while self.state.turn < turn and not self.done():
+            self.step()
+        if self.state.turn != turn:
+            raise IndexError('the game has no turn {}'.format(turn))
+        return self.state
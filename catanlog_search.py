@@ -0,0 +1,377 @@
+"""
+module catanlog_search indexes a corpus of catanlog files in SQLite, for finding games by their
+players, board and events without reading the logs.
+
+Each game is one row of games, along with the facts of its header and a summary of its body:
+
+- files: path, mtime, size
+- games: file, game (number within the file), offset (byte offset of its header in the file,
+         decompressed, or NULL for .catanb and .catanref), version, timestamp, winner (color,
+         NULL if none), winner_seat, turns
+- players: game_id, seat, name, color
+- tiles: game_id, tile (1-19), terrain, number (NULL for none)
+- ports: game_id, tile, direction, type
+- events: game_id, kind, player (color), detail, count, counting per game each
+  - 'roll': detail is the value rolled
+  - 'build': detail is 'road', 'settlement' or 'city'
+  - 'robber': detail is the tile moved to
+  - 'trade': detail is the port type, or 'player' for trades between players
+  - 'dev card': detail is 'bought', 'knight', 'road builder', 'year of plenty', 'monopoly'
+    or 'victory point'
+  - 'monopoly', 'year of plenty': detail is the resource taken
+
+update() adds the files of a log directory which are new or changed since the last update, and
+drops those which are gone. query() returns the games matching every criterion given, eg
+
+    index = catanlog_search.Index('log/.search.db')
+    index.update(['log'])
+    index.query(winner='red', winner_seat=4)
+    index.query(tile=10, number=8)
+    index.query(event='monopoly', detail='ore')
+
+    $ python -m catanlog_search log/.search.db --update log/ --winner red --winner-seat 4
+
+See class Index for documentation.
+"""
+import argparse
+import collections
+import os
+import sqlite3
+import sys
+
+import catanlog
+import catanlog_analytics
+import catanlog_compress
+import catanlog_reader as reader
+
+
+Match = collections.namedtuple('Match', ['path', 'game', 'offset'])
+
+# the start of the first line of every game's header
+_VERSION_PREFIX = '{} v'.format(catanlog.__name__).encode('utf-8')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    game INTEGER NOT NULL,
+    offset INTEGER,
+    version TEXT,
+    timestamp TEXT,
+    winner TEXT,
+    winner_seat INTEGER,
+    turns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    seat INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    color TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tiles (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    tile INTEGER NOT NULL,
+    terrain TEXT NOT NULL,
+    number INTEGER
+);
+CREATE TABLE IF NOT EXISTS ports (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    tile INTEGER NOT NULL,
+    direction TEXT NOT NULL,
+    type TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    player TEXT NOT NULL,
+    detail TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_file ON games(file_id);
+CREATE INDEX IF NOT EXISTS games_winner ON games(winner, winner_seat);
+CREATE INDEX IF NOT EXISTS players_name ON players(name, game_id);
+CREATE INDEX IF NOT EXISTS players_color ON players(color, seat, game_id);
+CREATE INDEX IF NOT EXISTS tiles_tile ON tiles(tile, number, terrain, game_id);
+CREATE INDEX IF NOT EXISTS tiles_number ON tiles(number, game_id);
+CREATE INDEX IF NOT EXISTS ports_type ON ports(type, game_id);
+CREATE INDEX IF NOT EXISTS events_kind ON events(kind, detail, player, game_id);
+'''
+
+_pieces = {
+    reader.BuysRoad: 'road',
+    reader.BuysSettlement: 'settlement',
+    reader.BuysCity: 'city',
+}
+
+_dev_cards = {
+    reader.BuysDevCard: 'bought',
+    reader.PlaysKnight: 'knight',
+    reader.PlaysRoadBuilder: 'road builder',
+    reader.PlaysYearOfPlenty: 'year of plenty',
+    reader.PlaysMonopoly: 'monopoly',
+    reader.PlaysVictoryPoint: 'victory point',
+}
+
+
+def summarize(events):
+    """
+    Count the events of one game's body by (kind, player, detail), as stored in the events table
+
+    :param events: iterable of catanlog_reader events, not including the Header
+    :return: (collections.Counter, winner color or None, number of turns)
+    """
+    counts = collections.Counter()
+    winner = None
+    turns = 0
+    for event in events:
+        kind = type(event)
+        if kind is reader.Roll:
+            counts['roll', event.player, str(event.roll)] += 1
+        elif kind in _pieces:
+            counts['build', event.player, _pieces[kind]] += 1
+        elif kind is reader.MovesRobber:
+            counts['robber', event.player, str(event.location)] += 1
+        elif kind is reader.TradesWithPort:
+            counts['trade', event.player, event.port] += 1
+        elif kind is reader.TradesWithPlayer:
+            counts['trade', event.player, 'player'] += 1
+        elif kind is reader.EndsTurn:
+            turns += 1
+        elif kind is reader.Wins:
+            winner = event.player
+        if kind in _dev_cards:
+            counts['dev card', event.player, _dev_cards[kind]] += 1
+            if kind is reader.PlaysKnight:
+                counts['robber', event.player, str(event.location)] += 1
+            elif kind is reader.PlaysMonopoly:
+                counts['monopoly', event.player, event.resource] += 1
+            elif kind is reader.PlaysYearOfPlenty:
+                counts['year of plenty', event.player, event.resource1] += 1
+                counts['year of plenty', event.player, event.resource2] += 1
+    return counts, winner, turns
+
+
+def _text_games(path):
+    """
+    Yield (offset, header, events) for each game in a .catan file, compressed or not. A game
+    still being written is yielded as far as it goes.
+    """
+    parser = reader.Parser()
+    offset = start = 0
+    header, body = None, list()
+    with catanlog_compress.open_log(path, binary=True) as fp:
+        for line in fp:
+            if line.startswith(_VERSION_PREFIX):
+                if header is not None:
+                    yield start, header, body
+                    header, body = None, list()
+                start = offset
+            offset += len(line)
+            for event in parser.feed(line.decode('utf-8')):
+                if type(event) is reader.Header:
+                    header = event
+                elif header is not None:
+                    body.append(event)
+    if header is not None:
+        yield start, header, body
+
+
+def _event_games(events):
+    header, body = None, list()
+    for event in events:
+        if type(event) is reader.Header:
+            if header is not None:
+                yield None, header, body
+            header, body = event, list()
+        elif header is not None:
+            body.append(event)
+    if header is not None:
+        yield None, header, body
+
+
+def read_games(path):
+    """
+    Yield (offset, header, events) for each game in a log. The offset is that of the header in
+    the file, decompressed, or None for a .catanb or .catanref file.
+    """
+    if catanlog_compress.strip_suffix(path).endswith('.catanb'):
+        import catanlog_binary
+        return _event_games(catanlog_binary.read(path))
+    elif catanlog_compress.strip_suffix(path).endswith('.catanref'):
+        import catanlog_layout
+        return _event_games(catanlog_layout.read(path))
+    return _text_games(path)
+
+
+class Index(object):
+    """
+    class Index is a SQLite database of the games in a corpus of logs.
+    """
+    def __init__(self, path):
+        """
+        :param path: str, the database file, created if it does not exist, or ':memory:'
+        """
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def update(self, paths, errors=None):
+        """
+        Index the logs which are new or have changed since the last update, by mtime and size,
+        and forget those which no longer exist.
+
+        :param paths: list of str, log files, directories or glob patterns, see catanlog_analytics.find_logs
+        :param errors: list, if given, (path, message) is appended for each file which failed to
+                       parse, and the file is skipped. Otherwise the ValueError is raised.
+        :return: int, number of files (re)indexed
+        """
+        files = catanlog_analytics.find_logs(paths)
+        known = {path: (file_id, mtime, size) for file_id, path, mtime, size
+                 in self.db.execute('SELECT id, path, mtime, size FROM files')}
+        indexed = 0
+        with self.db:
+            for path in set(known) - set(files):
+                self.db.execute('DELETE FROM files WHERE id = ?', (known[path][0],))
+            for path in files:
+                stat = os.stat(path)
+                entry = known.get(path)
+                if entry is not None and entry[1:] == (stat.st_mtime, stat.st_size):
+                    continue
+                try:
+                    games = list(read_games(path))
+                except (ValueError, UnicodeDecodeError) as e:
+                    if errors is None:
+                        raise
+                    errors.append((path, str(e)))
+                    games = list()
+                if entry is not None:
+                    self.db.execute('DELETE FROM files WHERE id = ?', (entry[0],))
+                file_id = self.db.execute('INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)',
+                                          (path, stat.st_mtime, stat.st_size)).lastrowid
+                for game, (offset, header, events) in enumerate(games):
+                    self._add_game(file_id, game, offset, header, events)
+                indexed += 1
+        return indexed
+
+    def _add_game(self, file_id, game, offset, header, events):
+        counts, winner, turns = summarize(events)
+        seats = {p.color: p.seat for p in header.players}
+        game_id = self.db.execute(
+            'INSERT INTO games (file_id, game, offset, version, timestamp, winner, winner_seat, turns) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (file_id, game, offset, header.version, header.timestamp.strftime(reader.TIMESTAMP_FORMAT),
+             winner, seats.get(winner), turns)).lastrowid
+        self.db.executemany('INSERT INTO players VALUES (?, ?, ?, ?)',
+                            [(game_id, p.seat, p.name, p.color) for p in header.players])
+        self.db.executemany('INSERT INTO tiles VALUES (?, ?, ?, ?)',
+                            [(game_id, tile, terrain, number)
+                             for tile, (terrain, number) in enumerate(zip(header.terrain, header.numbers), 1)])
+        self.db.executemany('INSERT INTO ports VALUES (?, ?, ?, ?)',
+                            [(game_id, p.tile_id, p.direction, p.type) for p in header.ports])
+        self.db.executemany('INSERT INTO events VALUES (?, ?, ?, ?, ?)',
+                            [(game_id, kind, player, detail, count)
+                             for (kind, player, detail), count in counts.items()])
+
+    def query(self, winner=None, winner_seat=None, name=None, color=None, seat=None, tile=None,
+              terrain=None, number=None, port=None, event=None, detail=None, player=None,
+              at_least=1, limit=None):
+        """
+        Return the games matching every criterion given.
+
+        :param winner: str, color of the winner
+        :param winner_seat: int, seat of the winner
+        :param name: str, a player's name. With color and/or seat, the same player's.
+        :param color: str, a player's color
+        :param seat: int, a player's seat
+        :param tile: int, a tile. With terrain and/or number, the same tile's.
+        :param terrain: str, a tile's terrain, eg 'wheat'
+        :param number: int, a tile's number
+        :param port: str, a port's type, eg 'ore' or '3:1'
+        :param event: str, a kind of event in the events table, eg 'monopoly'
+        :param detail: str, the event's detail, eg 'ore'
+        :param player: str, color of the player making the event
+        :param at_least: int, times the event must happen
+        :param limit: int, most matches to return, or None for all
+        :return: list of Match(path, game, offset), ordered by path and game
+        """
+        where, args = list(), list()
+        if winner is not None:
+            where.append('g.winner = ?')
+            args.append(winner)
+        if winner_seat is not None:
+            where.append('g.winner_seat = ?')
+            args.append(winner_seat)
+        self._exists('players', (('name', name), ('color', color), ('seat', seat)), where, args)
+        self._exists('tiles', (('tile', tile), ('terrain', terrain), ('number', number)), where, args)
+        self._exists('ports', (('type', port),), where, args)
+        if event is not None or detail is not None or player is not None:
+            clauses = [(column, value) for column, value in (('kind', event), ('detail', detail),
+                                                             ('player', player)) if value is not None]
+            where.append('(SELECT COALESCE(SUM(count), 0) FROM events WHERE game_id = g.id AND {}) >= ?'.format(
+                ' AND '.join('{} = ?'.format(column) for column, _ in clauses)))
+            args.extend(str(value) for _, value in clauses)
+            args.append(at_least)
+        sql = 'SELECT f.path, g.game, g.offset FROM games g JOIN files f ON f.id = g.file_id'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY f.path, g.game'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            args.append(limit)
+        return [Match(*row) for row in self.db.execute(sql, args)]
+
+    @staticmethod
+    def _exists(table, criteria, where, args):
+        criteria = [(column, value) for column, value in criteria if value is not None]
+        if criteria:
+            where.append('EXISTS (SELECT 1 FROM {} WHERE game_id = g.id AND {})'.format(
+                table, ' AND '.join('{} = ?'.format(column) for column, _ in criteria)))
+            args.extend(value for _, value in criteria)
+
+    def num_games(self):
+        return self.db.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='index catanlog files in SQLite, and find games in them')
+    parser.add_argument('db', help='the index database')
+    parser.add_argument('--update', nargs='+', default=None, metavar='PATH',
+                        help='log files, directories or glob patterns to index first')
+    for option, kind in (('winner', str), ('winner-seat', int), ('name', str), ('color', str),
+                         ('seat', int), ('tile', int), ('terrain', str), ('number', int),
+                         ('port', str), ('event', str), ('detail', str), ('player', str),
+                         ('at-least', int), ('limit', int)):
+        parser.add_argument('--' + option, type=kind, default=None)
+    args = vars(parser.parse_args(argv))
+    path, update = args.pop('db'), args.pop('update')
+    if args['at_least'] is None:
+        args['at_least'] = 1
+
+    with Index(path) as index:
+        if update is not None:
+            errors = list()
+            index.update(update, errors=errors)
+            for error_path, error in errors:
+                print('{}: {}'.format(error_path, error), file=sys.stderr)
+        for match in index.query(**args):
+            print('{}\t{}\t{}'.format(match.path, match.game, '' if match.offset is None else match.offset))
+
+
+if __name__ == '__main__':
+    main()
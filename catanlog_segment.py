@@ -0,0 +1,180 @@
+"""
+module catanlog_segment writes endless streams of games into a bounded number of files.
+
+A SegmentedCatanLog appends consecutive games, each beginning with its usual header, to one
+segment file until the segment holds max_bytes bytes or max_games games, and then begins
+another. Games are never split across segments. Segments are named after the time they were
+begun, eg 'log/2016-01-01 00:00:00-segment.catan', and are created exclusively, see
+CatanLog(exclusive=True).
+
+Alongside each segment, a manifest named after it with '.manifest' appended records each
+game once it ends: its byte range in the segment, its timestamp and its players' names, which
+is what a log's filename otherwise holds. Each line of the manifest is a JSON object,
+
+    {"offset": 0, "length": 1042, "timestamp": "2016-01-01 00:00:00", "players": ["ross", "zach"]}
+
+games() reads the manifest, and extract() and read() pull one game out of a segment by seeking
+to it, without reading the games before it. With compression, each game is a compressed
+stream of its own, so it is extracted as one too.
+
+Segments are read like any other log by catanlog_reader, catanlog_analytics and catanlog_search.
+"""
+import collections
+import io
+import json
+import os
+
+import catanlog
+import catanlog_compress
+import catanlog_reader as reader
+
+
+SUFFIX = '.manifest'
+
+# one game in a segment: byte offset and length, timestamp as in the header, and players' names
+Game = collections.namedtuple('Game', ['offset', 'length', 'timestamp', 'players'])
+
+
+def manifest_path(path):
+    return path + SUFFIX
+
+
+class SegmentedCatanLog(catanlog.CatanLog):
+    """
+    class SegmentedCatanLog is a CatanLog which writes many games into each logfile.
+
+    logpath() is the current segment. A game is recorded in the segment's manifest when the
+    next one starts, and on reset() and close(). Starting a game closes the one before it.
+    """
+    def __init__(self, max_bytes=1 << 26, max_games=None, **kwargs):
+        """
+        :param max_bytes: begin a new segment once this many bytes are written, int, or None
+        :param max_games: begin a new segment once this many games are written, int, or None
+        :param kwargs: other CatanLog options. use_stdout and exclusive are not supported.
+        """
+        if kwargs.get('use_stdout') or kwargs.get('exclusive'):
+            raise ValueError('SegmentedCatanLog does not support use_stdout or exclusive')
+        super(SegmentedCatanLog, self).__init__(**kwargs)
+        self._max_bytes = max_bytes
+        self._max_games = max_games
+        self._segment = None
+        self._segment_games = 0
+        self._game = None
+
+    def logpath(self):
+        """
+        Return the path of the current segment, creating it if there is none
+        """
+        if self._segment is None:
+            log_dir = self._dir()
+            os.makedirs(log_dir, exist_ok=True)
+            stem = os.path.join(log_dir, '{}-segment'.format(self.timestamp_str()))
+            self._segment = catanlog._create_exclusive(stem, self._suffix(), self._open)
+            self._segment_games = 0
+        return self._segment
+
+    def log_game_start(self, players, terrain, numbers, ports, timestamp=None):
+        # the previous game is closed rather than erased, so nothing it logged is lost
+        self.close()
+        self.reset()
+        if self._segment is not None and self._full():
+            self._segment = None
+        offset = os.path.getsize(self.logpath())
+        super(SegmentedCatanLog, self).log_game_start(players, terrain, numbers, ports, timestamp)
+        self._game = Game(offset, None, self.timestamp_str(), [p.name for p in self._players])
+        self._segment_games += 1
+
+    log_game_start.__doc__ = catanlog.CatanLog.log_game_start.__doc__
+
+    def _full(self):
+        return ((self._max_games is not None and self._segment_games >= self._max_games) or
+                (self._max_bytes is not None and os.path.getsize(self._segment) >= self._max_bytes))
+
+    def reset(self):
+        """
+        Erase the log and reset the timestamp, recording the game so far in the manifest
+        """
+        super(SegmentedCatanLog, self).reset()
+        self._end_game()
+        self._game = None
+
+    def close(self):
+        """
+        Flush the log, close the segment if keep_open left it open, and record the game so far
+        in the manifest
+        """
+        super(SegmentedCatanLog, self).close()
+        self._end_game()
+
+    def resume(self, path, tail_size=4096):
+        raise ValueError('SegmentedCatanLog does not support resume')
+
+    def _end_game(self):
+        """
+        Record the current game in the manifest, unless it is recorded as it is. A game
+        recorded again after more was logged is recorded anew; readers take the last record.
+        """
+        if self._game is None:
+            return
+        length = os.path.getsize(self._segment) - self._game.offset
+        if length and length != self._game.length:
+            self._game = self._game._replace(length=length)
+            with open(manifest_path(self._segment), 'a') as fp:
+                fp.write(json.dumps(self._game._asdict()) + '\n')
+
+
+def games(path):
+    """
+    Return the games of a segment, in order, as recorded in its manifest. A game still being
+    written, or whose log was never closed, is not recorded.
+
+    :param path: str, path to a segment
+    :return: list of Game
+    """
+    recorded = collections.OrderedDict()
+    with open(manifest_path(path), 'r') as fp:
+        for line in fp:
+            game = Game(**json.loads(line))
+            recorded[game.offset] = game
+    return list(recorded.values())
+
+
+def extract(path, game):
+    """
+    Return the bytes of one game in a segment, as written: text, .catanb, or compressed
+
+    :param path: str, path to a segment
+    :param game: Game, or int, the number of the game in the segment
+    :return: bytes
+    """
+    if not isinstance(game, Game):
+        game = games(path)[game]
+    with open(path, 'rb') as fp:
+        fp.seek(game.offset)
+        return fp.read(game.length)
+
+
+def read(path, game, layout_dir=None):
+    """
+    Parse one game in a segment, yielding its events as catanlog_reader.read would.
+
+    :param path: str, path to a segment
+    :param game: Game, or int, the number of the game in the segment
+    :param layout_dir: str, for a .catanref segment, the layout store, by default the
+                       'layouts' directory beside it
+    :return: generator of Header and gameplay events
+    """
+    fp = catanlog_compress.open_stream(io.BytesIO(extract(path, game)), binary=True)
+    kind = catanlog_compress.strip_suffix(path)
+    if kind.endswith('.catanb'):
+        import catanlog_binary
+        events = catanlog_binary.parse(fp)
+    else:
+        lines = io.TextIOWrapper(fp, encoding='utf-8')
+        if kind.endswith('.catanref'):
+            import catanlog_layout
+            layout_dir = catanlog_layout.default_layout_dir(path) if layout_dir is None else layout_dir
+            lines = catanlog_layout.rehydrate_lines(lines, layout_dir)
+        events = reader.parse(lines)
+    for event in events:
+        yield event
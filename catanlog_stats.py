@@ -0,0 +1,262 @@
+"""
+module catanlog_stats keeps statistics of games as they are logged, for live dashboards.
+
+A Stats object is updated by every log_* call of the CatanLogs it is attached to, from the
+call's own arguments, in constant time per call. It counts, over all their games,
+- games: games started, seats: seat -> games played from it, wins: seat -> games won from it
+- rolls: roll value -> count
+- builds: (seat, piece) -> pieces built, a road builder counting as two roads
+- trades: port type, or 'player' for trades between players -> number of trades
+- trade_volume: port type, or 'player' -> number of resources given
+- turn_seconds: a QuantileSketch of turn lengths in seconds
+
+Every statistic merges by addition, so the Stats of many games, logs or processes roll up
+into one with merge(). to_dict() and from_dict() carry them between processes as JSON.
+
+    stats = catanlog_stats.Stats()
+    log = catanlog.CatanLog(stats=stats)
+    ...
+    stats.rolls[7], stats.mean_turn_seconds(), stats.turn_seconds.quantile(0.9)
+
+As with catanlog_metrics, attaching wraps the log's methods on the instance, and a log
+without stats runs exactly as before. Stats are updated without a lock.
+"""
+import collections
+import datetime
+import functools
+import math
+
+import catanlog
+
+
+class QuantileSketch(object):
+    """
+    class QuantileSketch estimates quantiles of a stream of positive numbers in constant space.
+
+    Numbers are counted in buckets whose bounds grow geometrically, so that every quantile is
+    estimated within relative_accuracy of a number in the stream. Numbers at or below zero are
+    counted as zero, by the quantiles and by the mean alike. Sketches of the same accuracy merge
+    by adding their counts.
+    """
+    def __init__(self, relative_accuracy=0.01):
+        """
+        :param relative_accuracy: float, the largest relative error of a quantile
+        """
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets = collections.Counter()
+        self.zero = 0
+        self.count = 0
+        self.sum = 0
+
+    def add(self, x):
+        if x > 0:
+            self.buckets[math.ceil(math.log(x) / self._log_gamma)] += 1
+            self.sum += x
+        else:
+            self.zero += 1
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        :param q: float between 0 and 1, eg 0.5 for the median
+        :return: float, the estimated q-quantile, or None if the sketch is empty
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                return 2 * self._gamma ** bucket / (self._gamma + 1)
+        return 2 * self._gamma ** max(self.buckets) / (self._gamma + 1)
+
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def merge(self, other):
+        """
+        Add the numbers of another sketch to this one, and return this one
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('cannot merge sketches of different relative accuracies')
+        self.buckets.update(other.buckets)
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+        return self
+
+    def to_dict(self):
+        return {'relative_accuracy': self.relative_accuracy, 'zero': self.zero, 'count': self.count,
+                'sum': self.sum, 'buckets': {str(k): v for k, v in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d['relative_accuracy'])
+        sketch.zero, sketch.count, sketch.sum = d['zero'], d['count'], d['sum']
+        sketch.buckets.update({int(k): v for k, v in d['buckets'].items()})
+        return sketch
+
+
+def _roll(stats, player, roll):
+    stats.rolls[int(roll)] += 1
+
+
+def _builds(piece, count=1):
+    def build(stats, player, *args, **kwargs):
+        stats.builds[player.seat, piece] += count
+    return build
+
+
+def _trades_with_port(stats, player, to_port, port, to_player):
+    stats.trades[port.type.value] += 1
+    stats.trade_volume[port.type.value] += sum(num for num, _ in to_port)
+
+
+def _trades_with_other_player(stats, player, to_other, other, to_player):
+    stats.trades['player'] += 1
+    stats.trade_volume['player'] += sum(num for num, _ in to_other)
+
+
+def _ends_turn(stats, player, seconds):
+    stats.turn_seconds.add(seconds)
+
+
+def _wins(stats, player):
+    stats.wins[player.seat] += 1
+
+
+# updates of Stats by event kind, see catanlog.EVENT_KINDS
+_updates = {
+    'roll': _roll,
+    'buys_road': _builds('road'),
+    'buys_settlement': _builds('settlement'),
+    'buys_city': _builds('city'),
+    'buys_dev_card': _builds('dev card'),
+    'plays_road_builder': _builds('road', 2),
+    'trades_with_port': _trades_with_port,
+    'trades_with_other_player': _trades_with_other_player,
+    'ends_turn': _ends_turn,
+    'wins': _wins,
+}
+
+
+class Stats(object):
+    """
+    class Stats holds statistics of the games logged by one or more CatanLogs.
+    """
+    counters = ('seats', 'wins', 'rolls', 'builds', 'trades', 'trade_volume')
+
+    def __init__(self, relative_accuracy=0.01):
+        """
+        :param relative_accuracy: float, the relative accuracy of the quantiles of turn_seconds
+        """
+        self.games = 0
+        for counter in self.counters:
+            setattr(self, counter, collections.Counter())
+        self.turn_seconds = QuantileSketch(relative_accuracy)
+
+    def add(self, kind, player, *args, **kwargs):
+        """
+        Count one event, given as to CatanLog.log_events: eg add('roll', player, 6)
+        """
+        update = _updates.get(kind)
+        if update is not None:
+            update(self, player, *args, **kwargs)
+
+    def add_game(self, players):
+        """
+        Count the start of a game by the given players
+        """
+        self.games += 1
+        self.seats.update(p.seat for p in players)
+
+    def mean_turn_seconds(self):
+        return self.turn_seconds.mean()
+
+    def merge(self, other):
+        """
+        Add the games of another Stats to this one, and return this one
+        """
+        self.games += other.games
+        for counter in self.counters:
+            getattr(self, counter).update(getattr(other, counter))
+        self.turn_seconds.merge(other.turn_seconds)
+        return self
+
+    def to_dict(self):
+        d = {'games': self.games, 'turn_seconds': self.turn_seconds.to_dict()}
+        for counter in self.counters:
+            d[counter] = [[k, v] for k, v in getattr(self, counter).items()]
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls(d['turn_seconds']['relative_accuracy'])
+        stats.games = d['games']
+        stats.turn_seconds = QuantileSketch.from_dict(d['turn_seconds'])
+        for counter in cls.counters:
+            getattr(stats, counter).update({tuple(k) if isinstance(k, list) else k: v for k, v in d[counter]})
+        return stats
+
+    def attach(self, log):
+        """
+        Count the games of a log from now on, by wrapping its methods on the instance
+        """
+        for kind in catanlog.EVENT_KINDS:
+            name = 'log_player_' + kind
+            if kind == 'ends_turn':
+                setattr(log, name, self._timed_ends_turn(log, getattr(log, name)))
+            elif kind in _updates:
+                setattr(log, name, self._counted(kind, getattr(log, name)))
+        setattr(log, 'log_game_start', self._counted_game_start(log.log_game_start))
+        setattr(log, 'log_events', self._counted_events(log, log.log_events))
+
+    def _counted(self, kind, method):
+        @functools.wraps(method)
+        def counted(player, *args, **kwargs):
+            result = method(player, *args, **kwargs)
+            self.add(kind, player, *args, **kwargs)
+            return result
+        return counted
+
+    def _timed_ends_turn(self, log, method):
+        # the turn is measured here and handed to the log, so both record the same length
+        @functools.wraps(method)
+        def timed(player, seconds=None):
+            if seconds is None:
+                seconds = round((datetime.datetime.now() - log._latest_timestamp).total_seconds())
+            result = method(player, seconds)
+            self.add('ends_turn', player, seconds)
+            return result
+        return timed
+
+    def _counted_game_start(self, method):
+        @functools.wraps(method)
+        def counted(players, *args, **kwargs):
+            players = list(players)
+            result = method(players, *args, **kwargs)
+            self.add_game(players)
+            return result
+        return counted
+
+    def _counted_events(self, log, log_events):
+        @functools.wraps(log_events)
+        def counted(events):
+            events = list(events)
+            latest = log._latest_timestamp
+            for i, (kind, player, *args) in enumerate(events):
+                if kind == 'ends_turn':
+                    now = datetime.datetime.now()
+                    if not args or args[0] is None:
+                        events[i] = (kind, player, round((now - latest).total_seconds()))
+                    latest = now
+            result = log_events(events)
+            for event in events:
+                self.add(*event)
+            return result
+        return counted
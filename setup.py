@@ -19,7 +19,14 @@ setup(name="catanlog",
       classifiers=[],
       license="GPLv3",
 
-      py_modules=["catanlog"],
+      py_modules=["catanlog", "catanlog_reader", "catanlog_compact",
+                  "catanlog_binary", "catanlog_index",
+                  "catanlog_replay", "catanlog_analytics",
+                  "catanlog_async", "catanlog_manager",
+                  "catanlog_compress", "catanlog_columnar",
+                  "catanlog_follow", "catanlog_metrics",
+                  "catanlog_search", "catanlog_layout",
+                  "catanlog_segment", "catanlog_stats"],
       install_requires=[
           'hexgrid',
       ],
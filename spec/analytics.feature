@@ -0,0 +1,14 @@
+Feature: aggregate statistics over many logs
+
+  Scenario: games in many files are summarized together
+    Given we have the default players
+    And we have the default board
+    When "3" short games are played and analyzed
+    Then the summary should count "3" games won from seat "2"
+
+  Scenario: files which cannot be read or parsed are reported on every run, and the rest summarized
+    Given we have the default players
+    And we have the default board
+    When "2" short games, a broken file and a missing file are analyzed twice with a cache
+    Then the summary should count "2" games won from seat "2"
+    And both runs should report "2" files which failed
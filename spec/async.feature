@@ -0,0 +1,34 @@
+Feature: logs which write asynchronously
+
+  Scenario: a log which writes on a background thread writes the whole game once closed
+    Given the log writes on a background thread
+    And we have the default players
+    And we have the default board
+    When a short game is played and the log is closed
+    Then reading it back should give "18" events
+    And the file should hold exactly what the log dumps
+
+  Scenario: a log which writes from an asyncio task drops the oldest lines when its queue is full
+    Given the log writes from an asyncio task, queueing at most "2" flushes and dropping the oldest
+    And we have the default players
+    And we have the default board
+    When a short game is played on the event loop and the log is closed
+    Then the log should have dropped all but the last "2" lines
+
+  Scenario: a log which writes on a background thread carries on after it is closed
+    Given the log writes on a background thread
+    And we have the default players
+    And we have the default board
+    When a short game is played and the log is closed
+    And the last "2" lines are erased
+    And the log is closed
+    Then the file should hold exactly what the log dumps
+
+  Scenario: a log which writes from an asyncio task is closed by awaiting it, and carries on after
+    Given the log writes from an asyncio task
+    And we have the default players
+    And we have the default board
+    When a short game is played on the event loop and the log is closed
+    And the last "2" lines are erased on the event loop and the log is closed without awaiting, then awaited
+    Then closing the log without awaiting should have been refused
+    And the file should hold exactly what the log dumps
@@ -0,0 +1,7 @@
+Feature: logging many events at once
+
+  Scenario: a batch of events reads exactly as the same events logged one by one
+    Given we have the default players
+    And we have the default board
+    When a short game is logged call by call and as one batch of events
+    Then the batch should read exactly as the game after its header
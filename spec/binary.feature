@@ -0,0 +1,9 @@
+Feature: the binary .catanb encoding of logs
+
+  Scenario: a game logged as .catanb reads back and logs again exactly the same
+    Given the log writes .catanb
+    And we have the default players
+    And we have the default board
+    When a short game is played
+    Then reading it back should give "18" events
+    And reading it back and logging it again should look exactly the same
@@ -0,0 +1,22 @@
+Feature: columnar export of many games
+
+  Scenario: games are exported as one table per kind of event
+    Given we have the default players
+    And we have the default board
+    When "2" short games are played and exported as columnar tables
+    Then the "games" table should have "2" rows
+    And the "games" table's "winner" column should be "2,2"
+    And the "rolls" table's "value" column should be "2,8,2,8"
+    And the "builds" table should have "10" rows
+    And the "robber" table's "knight" column should be "0,1,0,1"
+    And the "trades" table's "port" column should be "1,-1,1,-1"
+    And the "board" table should have "38" rows
+
+  Scenario: games are exported as one .npz file
+    Given we have the default players
+    And we have the default board
+    When "2" short games are played and exported as columnar tables in one .npz file
+    Then the "games" table should have "2" rows
+    And the "rolls" table's "value" column should be "2,8,2,8"
+    And the "trades" table's "port" column should be "1,-1,1,-1"
+    And the "board" table should have "38" rows
@@ -0,0 +1,35 @@
+Feature: compressed logs
+
+  Scenario Outline: a compressed log reads back the same before and after it is closed
+    Given the log is compressed with "<method>"
+    And we have the default players
+    And we have the default board
+    When a short game is played
+    Then the logfile should be compressed with "<method>"
+    And reading it back should give "18" events
+    When the log is closed
+    Then reading it back should give "18" events
+    And the logfile should decompress to exactly what the log dumps
+
+    Examples:
+      | method |
+      | gzip   |
+
+  Scenario Outline: a compressed log which keeps its file open reads back the same before and after it is closed
+    Given the log is compressed with "<method>" and keeps its file open
+    And we have the default players
+    And we have the default board
+    When a short game is played
+    Then the logfile should be compressed with "<method>"
+    And reading it back should give "18" events
+    When the log is closed
+    Then reading it back should give "18" events
+    And the logfile should decompress to exactly what the log dumps
+
+    Examples:
+      | method |
+      | gzip   |
+      | lzma   |
+
+  Scenario: a log compressed with lzma is not flushed every line, as each flush is an xz stream
+    Then a log compressed with "lzma" which flushes every line should be refused
@@ -9,6 +9,7 @@ def before_scenario(context, scenario):
 
 def after_scenario(context, scenario):
     # erase the log file after each scenario
+    context.logger.close()
     with open(context.logger.logpath(), 'w'):
         pass
 
@@ -0,0 +1,19 @@
+Feature: following a log while it is written
+
+  Scenario: a follower reads only what was appended since it last looked
+    Given we have the default players
+    And we have the default board
+    And the log is followed
+    When a short game is played
+    Then the follower should read "18" new events
+    And the follower should read "0" new events
+
+  Scenario: a follower holds back a partial line, and starts over when the file is truncated
+    Given we have the default players
+    And we have the default board
+    And the log is followed
+    When a short game is played
+    And a partial line is appended to the logfile
+    Then the follower should read "18" new events
+    When the logfile is truncated
+    Then the follower should start over and read "0" new events
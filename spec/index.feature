@@ -0,0 +1,17 @@
+Feature: random access into logs by turn
+
+  Scenario: a turn is read directly using the log's index
+    Given the log writes an index
+    And we have the default players
+    And we have the default board
+    When a short game is played
+    Then turn "1" read using the index should give "10" events
+    And turn "1" read without the index should give "10" events
+
+  Scenario: the turns of each game in a file of many games end where the next game starts
+    Given the log writes an index of many games in one file
+    And we have the default players
+    And we have the default board
+    When "3" short games are played and the log is closed
+    Then every one of the "3" games should have turns of "6, 10, 1" events read using the index
+    And every one of the "3" games should have turns of "6, 10, 1" events read without the index
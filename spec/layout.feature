@@ -0,0 +1,10 @@
+Feature: logs which store each board layout once
+
+  Scenario: a log naming its layout reads back as the full log
+    Given the log stores board layouts once
+    And we have the default players
+    And we have the default board
+    When a short game is played
+    Then the logfile should name its layout instead of repeating it
+    And reading it back should give "18" events
+    And reading it back and logging it again should look exactly the same
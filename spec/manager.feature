@@ -0,0 +1,9 @@
+Feature: logging many games through a log manager
+
+  Scenario: games logged at once through a few open files are each written completely
+    Given a log manager holding at most "4" files open
+    And we have the default players
+    And we have the default board
+    When "20" short games are played through the manager at once
+    Then every game's file should hold exactly what its log dumped
+    And the manager should have opened fewer than "100" files
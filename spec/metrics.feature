@@ -0,0 +1,17 @@
+Feature: counting what a log does
+
+  Scenario: a log with metrics counts its calls, characters and flushes
+    Given the log counts its metrics
+    And we have the default players
+    And we have the default board
+    When a short game is played
+    Then the metrics should count "2" calls of "log_player_roll"
+    And the metrics should count "2" calls of "log_player_moves_robber_and_steals"
+    And the metrics should count every character of the log as buffered, flushed and written
+
+  Scenario: a log with metrics counts the files it creates exclusively and the index it writes
+    Given the log counts its metrics, creating its file exclusively and writing an index
+    And we have the default players
+    And we have the default board
+    When a short game is played
+    Then the metrics should count the logfile's creation, each flush and each write of the index as opens
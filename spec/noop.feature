@@ -0,0 +1,7 @@
+Feature: a log which does nothing
+
+  Scenario: a no-op log accepts every call a log does
+    Given we have the default players
+    And we have the default board
+    When a short game is played on a no-op log, passing keyword arguments
+    Then the no-op log should define every public method of a log
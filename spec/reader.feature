@@ -0,0 +1,14 @@
+Feature: reading a log back into events
+
+  Scenario: a game read back and logged again looks exactly the same
+    Given we have the default players
+    And we have the default board
+    When a short game is played
+    Then reading it back should give "18" events
+    And reading it back and logging it again should look exactly the same
+
+  Scenario: a game read back into compact records decodes to the same events
+    Given we have the default players
+    And we have the default board
+    When a short game is played
+    Then reading it back into compact records should decode to the same events
@@ -0,0 +1,10 @@
+Feature: replaying a game from its log
+
+  Scenario: a replayed game tracks the robber and the pieces built
+    Given we have the default players
+    And we have the default board
+    When a short game is played
+    Then replaying it should leave the robber on tile "12"
+    And replaying it should leave "red" with "1" cities and "0" settlements
+    And seeking back to turn "1" should leave the robber on tile "5"
+    And seeking turn "1" of a new replay should apply no events before it
@@ -0,0 +1,10 @@
+Feature: searching a corpus of logs
+
+  Scenario: games are found by their winner, board and events
+    Given we have the default players
+    And we have the default board
+    When "3" short games are played and indexed
+    Then searching for games won by "orange" from seat "2" should find "3" games
+    And searching for games won by "red" should find "0" games
+    And searching for games with a "monopoly" on "ore" should find "3" games
+    And searching for games with a "robber" on "12" should find "3" games
@@ -0,0 +1,8 @@
+Feature: logs which write many games into each segment file
+
+  Scenario: games are read back out of their segments by offset
+    Given the log writes "2" games per segment
+    And we have the default players
+    And we have the default board
+    When "5" short games are played and the log is closed
+    Then there should be "3" segments holding "5" games of "18" events each
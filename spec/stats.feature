@@ -0,0 +1,9 @@
+Feature: statistics kept while logging
+
+  Scenario: a log with statistics counts its game as it is logged
+    Given the log keeps statistics
+    And we have the default players
+    And we have the default board
+    When a short game is played
+    Then the statistics should agree with the analytics of the logfile
+    And the statistics merged with themselves should count "4" rolls
@@ -1,4 +1,13 @@
 from behave import *
+import os
+import shutil
+import catanlog
+import catanlog_async
+import catanlog_follow
+import catanlog_manager
+import catanlog_metrics
+import catanlog_segment
+import catanlog_stats
 from catan import boardbuilder
 from catan.game import Player
 
@@ -28,3 +37,109 @@ def step_impl(context):
 @given('it is "{color}"s turn')
 def step_impl(context, color):
     context.cur_player = Player(1, 'name', color)
+
+
+@given('the log keeps its file open')
+def step_impl(context):
+    context.logger = catanlog.CatanLog(log_dir='spec/log', keep_open=True,
+                                       flush_size=2**20, flush_interval=3600)
+
+
+@given('the log keeps its file open and flushes every "{size}" characters')
+def step_impl(context, size):
+    context.logger = catanlog.CatanLog(log_dir='spec/log', keep_open=True,
+                                       flush_size=int(size), flush_interval=3600)
+
+
+@given('the log keeps only the last "{count}" flushed lines in memory')
+def step_impl(context, count):
+    context.logger = catanlog.CatanLog(log_dir='spec/log', keep_lines=int(count))
+
+
+@given('the log writes "{count}" games per segment')
+def step_impl(context, count):
+    log_dir = os.path.join('spec', 'log', 'segments')
+    shutil.rmtree(log_dir, ignore_errors=True)
+    context.logger = catanlog_segment.SegmentedCatanLog(log_dir=log_dir, max_games=int(count))
+
+
+@given('the log writes .catanb')
+def step_impl(context):
+    context.logger = catanlog.CatanLog(log_dir='spec/log', fmt='catanb')
+
+
+@given('the log writes an index')
+def step_impl(context):
+    context.logger = catanlog.CatanLog(log_dir='spec/log', index=True)
+
+
+@given('the log writes an index of many games in one file')
+def step_impl(context):
+    log_dir = os.path.join('spec', 'log', 'indexed')
+    shutil.rmtree(log_dir, ignore_errors=True)
+    context.logger = catanlog_segment.SegmentedCatanLog(log_dir=log_dir, max_games=None, index=True)
+
+
+@given('the log writes on a background thread')
+def step_impl(context):
+    context.logger = catanlog_async.ThreadedCatanLog(log_dir='spec/log', max_queue=4)
+
+
+@given('the log writes from an asyncio task')
+def step_impl(context):
+    context.logger = catanlog_async.AsyncioCatanLog(log_dir='spec/log')
+
+
+@given('the log writes from an asyncio task, queueing at most "{size}" flushes and dropping the oldest')
+def step_impl(context, size):
+    context.logger = catanlog_async.AsyncioCatanLog(log_dir='spec/log', max_queue=int(size),
+                                                    policy='drop-oldest')
+
+
+@given('a log manager holding at most "{max_open}" files open')
+def step_impl(context, max_open):
+    context.manager = catanlog_manager.LogManager(log_dir='spec/log', max_open=int(max_open),
+                                                  batch_size=256, batch_interval=None)
+
+
+@given('the log is compressed with "{method}"')
+def step_impl(context, method):
+    context.logger = catanlog.CatanLog(log_dir='spec/log', compression=method)
+
+
+@given('the log is compressed with "{method}" and keeps its file open')
+def step_impl(context, method):
+    context.logger = catanlog.CatanLog(log_dir='spec/log', compression=method, keep_open=True)
+
+
+@given('the log is followed')
+def step_impl(context):
+    context.follower = catanlog_follow.Follower(context.logger.logpath, poll_interval=0.01, use_inotify=False)
+
+
+@given('the log keeps statistics')
+def step_impl(context):
+    context.logger = catanlog.CatanLog(log_dir='spec/log', stats=catanlog_stats.Stats())
+
+
+@given('the log counts its metrics')
+def step_impl(context):
+    context.logger = catanlog.CatanLog(log_dir='spec/log', metrics=catanlog_metrics.Metrics())
+
+
+@given('the log counts its metrics, creating its file exclusively and writing an index')
+def step_impl(context):
+    context.opened = list()
+    metrics = catanlog_metrics.Metrics(on_open=context.opened.append)
+    context.logger = catanlog.CatanLog(log_dir='spec/log', metrics=metrics, exclusive=True, index=True)
+
+
+@given('the log stores board layouts once')
+def step_impl(context):
+    context.logger = catanlog.CatanLog(log_dir='spec/log', fmt='catanref')
+
+
+@given('"{count}" logs which create their files exclusively')
+def step_impl(context, count):
+    context.logs = [catanlog.CatanLog(log_dir='spec/log', exclusive=True, shard='exclusive')
+                    for _ in range(int(count))]
@@ -1,5 +1,17 @@
 from behave import *
+import os
 import re
+import catanlog
+import catanlog_analytics
+import catanlog_compact
+import catanlog_compress
+import catanlog_follow
+import catanlog_index
+import catanlog_layout
+import catanlog_reader
+import catanlog_replay
+import catanlog_segment
+import catanlog_stats
 
 
 @then('it should look exactly like "{text}"')
@@ -36,7 +48,322 @@ def step_impl(context):
         assert re.match(expected, actual)
 
 
+@then('nothing should be written yet')
+def step_impl(context):
+    print(context.output)
+    assert context.output == []
+
+
 @then('print output')
 def step_impl(context):
     print(context.output)
     assert False
+
+
+@then('reading it back should give "{count}" events')
+def step_impl(context, count):
+    print(context.events)
+    assert len(context.events) == int(count)
+
+
+@then('reading it back and logging it again should look exactly the same')
+def step_impl(context):
+    relog = catanlog.CatanLog(auto_flush=False)
+    for event in context.events:
+        catanlog_reader.emit(event, relog)
+    print(relog.dump())
+    assert relog.dump() == context.logger.dump()
+    assert ''.join(catanlog_reader.render(context.events)) == context.logger.dump()
+
+
+@then('reading it back into compact records should decode to the same events')
+def step_impl(context):
+    game, = catanlog_compact.games(context.events)
+    assert list(game.events()) == context.events
+    assert game.to_arrays().records() == game.records
+
+
+@then('turn "{turn}" read using the index should give "{count}" events')
+def step_impl(context, turn, count):
+    with catanlog_index.IndexedLog(context.logger.logpath()) as log:
+        events = log.turn_events(int(turn))
+    print(events)
+    assert len(events) == int(count)
+    assert type(events[-1]) == catanlog_reader.EndsTurn
+
+
+@then('turn "{turn}" read without the index should give "{count}" events')
+def step_impl(context, turn, count):
+    os.remove(catanlog_index.index_path(context.logger.logpath()))
+    with catanlog_index.IndexedLog(context.logger.logpath()) as log:
+        events = log.turn_events(int(turn))
+    print(events)
+    assert len(events) == int(count)
+    assert type(events[-1]) == catanlog_reader.EndsTurn
+
+
+@then('every one of the "{games}" games should have turns of "{counts}" events read using the index')
+def step_impl(context, games, counts):
+    assert_turn_events(context.logger.logpath(), int(games), [int(c) for c in counts.split(', ')])
+
+
+@then('every one of the "{games}" games should have turns of "{counts}" events read without the index')
+def step_impl(context, games, counts):
+    os.remove(catanlog_index.index_path(context.logger.logpath()))
+    assert_turn_events(context.logger.logpath(), int(games), [int(c) for c in counts.split(', ')])
+
+
+def assert_turn_events(path, games, counts):
+    with catanlog_index.IndexedLog(path) as log:
+        assert log.num_games == games
+        for game in range(games):
+            events = [log.turn_events(turn, game) for turn in range(log.num_turns(game))]
+            print(events)
+            assert [len(turn) for turn in events] == counts
+            assert not any(type(event) == catanlog_reader.Header for turn in events for event in turn)
+
+
+def replay_to_end(context):
+    context.replay = catanlog_replay.Replay(context.events, snapshot_every=1)
+    while not context.replay.done():
+        context.replay.step()
+    return context.replay.state
+
+
+@then('seeking turn "{turn}" of a new replay should apply no events before it')
+def step_impl(context, turn):
+    replay = catanlog_replay.Replay(context.events, snapshot_every=1)
+    applied = list()
+    step = replay.step
+    replay.step = lambda: applied.append(step()) or applied[-1]
+    assert replay.seek_turn(int(turn)).turn == int(turn)
+    assert not applied
+
+
+@then('replaying it should leave the robber on tile "{tile}"')
+def step_impl(context, tile):
+    assert replay_to_end(context).robber == int(tile)
+
+
+@then('replaying it should leave "{color}" with "{cities}" cities and "{settlements}" settlements')
+def step_impl(context, color, cities, settlements):
+    player = replay_to_end(context).players[color]
+    assert len(player.cities) == int(cities)
+    assert len(player.settlements) == int(settlements)
+
+
+@then('seeking back to turn "{turn}" should leave the robber on tile "{tile}"')
+def step_impl(context, turn, tile):
+    assert context.replay.seek_turn(int(turn)).robber == int(tile)
+
+
+@then('the summary should count "{count}" games won from seat "{seat}"')
+def step_impl(context, count, seat):
+    print(context.summary.to_dict())
+    assert context.summary.games == int(count)
+    assert context.summary.wins[int(seat)] == int(count)
+    assert context.summary.win_rates()[int(seat)] == 1.0
+
+
+@then('both runs should report "{count}" files which failed')
+def step_impl(context, count):
+    print(context.errors)
+    assert [len(errors) for errors in context.errors] == [int(count)] * 2
+
+
+@then('the file should hold exactly what the log dumps')
+def step_impl(context):
+    with open(context.logger.logpath(), 'r') as fp:
+        assert fp.read() == context.logger.dump()
+
+
+@then('the new log should carry on the game where it was left')
+def step_impl(context):
+    assert context.logger.logpath() == context.previous.logpath()
+    assert context.logger.timestamp_str() == context.previous.timestamp_str()
+    assert [p.name for p in context.logger._players] == [p.name for p in context.previous._players]
+    assert context.logger.dump() == context.previous.dump()
+
+
+@then('there should be "{count}" segments holding "{games}" games of "{events}" events each')
+def step_impl(context, count, games, events):
+    log_dir = os.path.join('spec', 'log', 'segments')
+    segments = [os.path.join(log_dir, name) for name in os.listdir(log_dir)
+                if not name.endswith(catanlog_segment.SUFFIX)]
+    assert len(segments) == int(count)
+    found = [(path, game) for path in segments for game in catanlog_segment.games(path)]
+    assert len(found) == int(games)
+    for path, game in found:
+        assert len(list(catanlog_segment.read(path, game))) == int(events)
+        assert game.players == [p.name for p in context.players]
+
+
+@then('the statistics should agree with the analytics of the logfile')
+def step_impl(context):
+    summary = catanlog_analytics.Summary()
+    summary.add(catanlog_reader.read(context.logger.logpath()))
+    stats = context.logger.stats
+    assert stats.games == summary.games
+    assert stats.rolls == summary.rolls
+    assert stats.trades == summary.trades
+    assert stats.trade_volume == summary.trade_volume
+    assert stats.wins == summary.wins
+    assert stats.turn_seconds.count == sum(summary.turn_seconds.values())
+    assert stats.mean_turn_seconds() == summary.mean_turn_seconds()
+
+
+@then('the statistics merged with themselves should count "{count}" rolls')
+def step_impl(context, count):
+    stats = catanlog_stats.Stats.from_dict(context.logger.stats.to_dict())
+    assert sum(stats.merge(context.logger.stats).rolls.values()) == int(count)
+
+
+@then('at most "{count}" lines should be held in memory')
+def step_impl(context, count):
+    assert len(context.logger._buffer._lines) <= int(count)
+
+
+@then('the log should have dropped all but the last "{count}" lines')
+def step_impl(context, count):
+    lines = context.logger.dump().splitlines(True)
+    print(context.logger.dropped)
+    assert context.logger.dropped == len(lines) - int(count)
+    with open(context.logger.logpath(), 'r') as fp:
+        assert fp.read() == ''.join(lines[-int(count):])
+
+
+@then('every game\'s file should hold exactly what its log dumped')
+def step_impl(context):
+    for game, path in context.paths.items():
+        with open(path, 'r') as fp:
+            assert fp.read() == context.dumps[game]
+        os.remove(path)
+
+
+@then('the manager should have opened fewer than "{count}" files')
+def step_impl(context, count):
+    print(context.opens)
+    assert context.opens < int(count)
+
+
+@then('the no-op log should define every public method of a log')
+def step_impl(context):
+    for name in dir(catanlog.CatanLog):
+        if not name.startswith('_') and callable(getattr(catanlog.CatanLog, name)):
+            assert name in vars(catanlog.NoopCatanLog), name
+
+
+@then('the batch should read exactly as the game after its header')
+def step_impl(context):
+    body = context.logger.dump().split('...CATAN!\n', 1)[1]
+    print(body)
+    print(context.batched)
+    assert context.batched == body
+
+
+@then('the logfile should be compressed with "{method}"')
+def step_impl(context, method):
+    with open(context.logger.logpath(), 'rb') as fp:
+        assert catanlog_compress.detect(fp) == method
+
+
+@then('the logfile should decompress to exactly what the log dumps')
+def step_impl(context):
+    with catanlog_compress.open_log(context.logger.logpath()) as fp:
+        assert fp.read() == context.logger.dump()
+
+
+@then('the "{table}" table should have "{count}" rows')
+def step_impl(context, table, count):
+    for column in context.tables[table].values():
+        assert len(column) == int(count)
+
+
+@then('the "{table}" table\'s "{column}" column should be "{values}"')
+def step_impl(context, table, column, values):
+    print(list(context.tables[table][column]))
+    assert list(context.tables[table][column]) == [int(v) for v in values.split(',')]
+
+
+@then('the follower should read "{count}" new events')
+def step_impl(context, count):
+    events = context.follower.poll_events()
+    print(events)
+    assert len(events) == int(count)
+
+
+@then('the follower should start over and read "{count}" new events')
+def step_impl(context, count):
+    events = context.follower.poll_events()
+    print(events)
+    assert type(events[0]) == catanlog_follow.Restart
+    assert len(events) == 1 + int(count)
+
+
+@then('the metrics should count "{count}" calls of "{method}"')
+def step_impl(context, count, method):
+    snapshot = context.logger.metrics.snapshot()
+    print(snapshot)
+    assert snapshot['calls'][method] == int(count)
+
+
+@then('the metrics should count every character of the log as buffered, flushed and written')
+def step_impl(context):
+    snapshot = context.logger.metrics.snapshot()
+    chars = len(context.logger.dump())
+    assert snapshot['buffered'] == snapshot['flushed'] == snapshot['written'] == chars
+    assert snapshot['flushes'] == sum(snapshot['flush_latency'].values()) == snapshot['opens']
+
+
+@then('the metrics should count the logfile\'s creation, each flush and each write of the index as opens')
+def step_impl(context):
+    snapshot = context.logger.metrics.snapshot()
+    path = context.logger.logpath()
+    with open(catanlog_index.index_path(path), 'r') as fp:
+        entries = len(fp.readlines())
+    print(snapshot, context.opened)
+    assert context.opened.count(path) == 1 + snapshot['flushes']
+    assert context.opened.count(catanlog_index.index_path(path)) == entries
+    assert snapshot['opens'] == len(context.opened)
+
+
+@then('searching for games won by "{color}" from seat "{seat}" should find "{count}" games')
+def step_impl(context, color, seat, count):
+    assert len(context.index.query(winner=color, winner_seat=int(seat))) == int(count)
+
+
+@then('searching for games won by "{color}" should find "{count}" games')
+def step_impl(context, color, count):
+    assert len(context.index.query(winner=color)) == int(count)
+
+
+@then('searching for games with a "{event}" on "{detail}" should find "{count}" games')
+def step_impl(context, event, detail, count):
+    matches = context.index.query(event=event, detail=detail)
+    print(matches)
+    assert len(matches) == int(count)
+
+
+@then('the logfile should name its layout instead of repeating it')
+def step_impl(context):
+    with open(context.logger.logpath(), 'r') as fp:
+        text = fp.read()
+    print(text)
+    assert 'terrain: ' not in text
+    digest, = catanlog_layout.layouts(context.logger.logpath())
+    layout = catanlog_layout.load_layout(catanlog_layout.default_layout_dir(context.logger.logpath()), digest)
+    assert layout in context.logger.dump()
+
+
+@then('closing the log without awaiting should have been refused')
+def step_impl(context):
+    assert context.refused
+
+
+@then('a log compressed with "{method}" which flushes every line should be refused')
+def step_impl(context, method):
+    try:
+        catanlog.CatanLog(log_dir='spec/log', compression=method)
+    except ValueError:
+        return
+    assert False
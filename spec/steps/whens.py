@@ -1,11 +1,23 @@
 from behave import *
+import asyncio
+import datetime
+import os
+import shutil
 import catanlog
+import catanlog_analytics
+import catanlog_binary
+import catanlog_columnar
+import catanlog_layout
+import catanlog_reader
+import catanlog_search
 import catan.game
 import catan.board
 
 
 def output_of(log, method, *args, **kwargs):
     method(log, *args, **kwargs)
+    if not os.path.exists(log.logpath()):
+        return []
     with open(log.logpath(), 'r') as fp:
         lines = [line.rstrip() for line in fp.readlines()]
     return lines
@@ -188,3 +200,230 @@ def step_impl(context, num_give1, give1, num_give2, give2, color, num_get, get):
                                [(num_give1, catan.board.Terrain(give1)), (num_give2, catan.board.Terrain(give2))],
                                catan.game.Player(1, 'name', color),
                                [(num_get, catan.board.Terrain(get))])
+
+
+@when('a short game is played')
+def step_impl(context):
+    play_short_game(context, context.logger)
+    if context.logger.logpath().endswith('.catanb'):
+        context.events = list(catanlog_binary.read(context.logger.logpath()))
+    elif context.logger.logpath().endswith('.catanref'):
+        context.events = list(catanlog_layout.read(context.logger.logpath()))
+    else:
+        context.events = list(catanlog_reader.read(context.logger.logpath()))
+
+
+@when('a new log resumes the game from its file')
+def step_impl(context):
+    context.previous = context.logger
+    context.logger = catanlog.CatanLog(log_dir='spec/log')
+    context.logger.resume(context.previous.logpath())
+
+
+@when('"{count}" short games are played and analyzed')
+def step_impl(context, count):
+    for i in range(int(count)):
+        log_dir = os.path.join('spec', 'log', 'corpus{}'.format(i))
+        os.makedirs(log_dir, exist_ok=True)
+        play_short_game(context, catanlog.CatanLog(log_dir=log_dir))
+    context.summary = catanlog_analytics.analyze([os.path.join('spec', 'log', 'corpus*', '*.catan')], workers=2)
+
+
+@when('"{count}" short games, a broken file and a missing file are analyzed twice with a cache')
+def step_impl(context, count):
+    log_dir = os.path.join('spec', 'log', 'cached')
+    shutil.rmtree(log_dir, ignore_errors=True)
+    os.makedirs(log_dir)
+    for i in range(int(count)):
+        play_short_game(context, catanlog.CatanLog(log_dir=os.path.join(log_dir, str(i))))
+    with open(os.path.join(log_dir, 'broken.catan'), 'w') as fp:
+        fp.write('not a log\n')
+    os.symlink('nowhere.catan', os.path.join(log_dir, 'missing.catan'))
+    cache = os.path.join(log_dir, 'analytics.json')
+    context.errors = list()
+    for _ in range(2):
+        errors = list()
+        context.summary = catanlog_analytics.analyze([log_dir], workers=2, cache=cache, errors=errors)
+        context.errors.append(errors)
+
+
+@when('"{count}" short games are played and the log is closed')
+def step_impl(context, count):
+    for _ in range(int(count)):
+        play_short_game(context, context.logger)
+    context.logger.close()
+
+
+@when('a short game is played and the log is closed')
+def step_impl(context):
+    play_short_game(context, context.logger)
+    context.logger.close()
+    context.events = list(catanlog_reader.read(context.logger.logpath()))
+
+
+@when('a short game is played on the event loop and the log is closed')
+def step_impl(context):
+    async def play():
+        play_short_game(context, context.logger)
+        await context.logger.aclose()
+    asyncio.run(play())
+
+
+@when('the last "{count}" lines are erased on the event loop and the log is closed without awaiting, then awaited')
+def step_impl(context, count):
+    async def erase():
+        context.logger.eraseln(int(count))
+        try:
+            context.logger.close()
+        except RuntimeError:
+            context.refused = True
+        await context.logger.aclose()
+    context.refused = False
+    asyncio.run(erase())
+
+
+@when('"{count}" short games are played through the manager at once')
+def step_impl(context, count):
+    terrain = [tile.terrain for tile in context.board.tiles]
+    numbers = [tile.number for tile in context.board.tiles]
+    players = [[catan.game.Player(p.seat, '{}{}'.format(p.name, game), p.color) for p in context.players]
+               for game in range(int(count))]
+    for game in range(int(count)):
+        context.manager.log(game).log_game_start(players[game], terrain, numbers, context.board.ports)
+    for game in range(int(count)):
+        play_short_game(context, context.manager.log(game), players[game], start=False)
+    context.paths = {game: context.manager.log(game).logpath() for game in range(int(count))}
+    context.dumps = {game: context.manager.dump(game) for game in range(int(count))}
+    context.opens = context.manager.pool.opens
+    context.manager.close()
+
+
+@when('a short game is played on a no-op log, passing keyword arguments')
+def step_impl(context):
+    log = catanlog.NoopCatanLog()
+    play_short_game(context, log)
+    red = context.players[0]
+    assert log.log_player_ends_turn(player=red, seconds=30) is None
+    assert log.log_player_roll(red, roll=6) is None
+
+
+@when('"{count}" short games are played and exported as columnar tables')
+def step_impl(context, count):
+    export_short_games(context, int(count), 'raw', 'tables')
+    context.tables = catanlog_columnar.load(os.path.join('spec', 'log', 'columnar', 'tables'), use_numpy=False)
+
+
+@when('"{count}" short games are played and exported as columnar tables in one .npz file')
+def step_impl(context, count):
+    export_short_games(context, int(count), 'npz', 'tables.npz')
+    context.tables = catanlog_columnar.load(os.path.join('spec', 'log', 'columnar', 'tables.npz'))
+
+
+def export_short_games(context, count, layout, out):
+    log_dir = os.path.join('spec', 'log', 'columnar')
+    shutil.rmtree(log_dir, ignore_errors=True)
+    os.makedirs(log_dir)
+    log = catanlog.CatanLog(log_dir=log_dir)
+    for i in range(count):
+        play_short_game(context, log)
+    catanlog_columnar.export([log_dir], os.path.join(log_dir, out), layout=layout)
+
+
+@when('"{count}" short games are played and indexed')
+def step_impl(context, count):
+    log_dir = os.path.join('spec', 'log', 'search')
+    os.makedirs(log_dir, exist_ok=True)
+    log = catanlog.CatanLog(log_dir=log_dir)
+    for i in range(int(count)):
+        play_short_game(context, log)
+    context.index = catanlog_search.Index(':memory:')
+    context.index.update([log_dir])
+    assert context.index.update([log_dir]) == 0
+
+
+@when('each log plays a short game starting at the same time')
+def step_impl(context):
+    terrain = [tile.terrain for tile in context.board.tiles]
+    numbers = [tile.number for tile in context.board.tiles]
+    timestamp = datetime.datetime(2016, 1, 1)
+    for log in context.logs:
+        log.log_game_start(context.players, terrain, numbers, context.board.ports, timestamp=timestamp)
+    for log in context.logs:
+        play_short_game(context, log, start=False)
+    context.paths = {game: log.logpath() for game, log in enumerate(context.logs)}
+    context.dumps = {game: log.dump() for game, log in enumerate(context.logs)}
+    assert len(set(context.paths.values())) == len(context.logs)
+
+
+@when('the log is closed')
+def step_impl(context):
+    context.logger.close()
+    context.events = list(catanlog_reader.read(context.logger.logpath()))
+
+
+@when('a partial line is appended to the logfile')
+def step_impl(context):
+    with open(context.logger.logpath(), 'a') as fp:
+        fp.write('red rol')
+
+
+@when('the logfile is truncated')
+def step_impl(context):
+    with open(context.logger.logpath(), 'w'):
+        pass
+
+
+@when('the last "{count}" lines are erased')
+def step_impl(context, count):
+    context.logger.eraseln(int(count))
+    context.events = list(catanlog_reader.read(context.logger.logpath()))
+
+
+class EventRecorder(object):
+    """
+    Records log_player_* calls as events for CatanLog.log_events
+    """
+    def __init__(self):
+        self.events = list()
+
+    def __getattr__(self, name):
+        def record(player, *args):
+            self.events.append((name[len('log_player_'):], player) + args)
+        return record
+
+
+@when('a short game is logged call by call and as one batch of events')
+def step_impl(context):
+    play_short_game(context, context.logger)
+    recorder = EventRecorder()
+    play_short_game(context, recorder, start=False)
+    batched = catanlog.CatanLog(log_dir='spec/log', auto_flush=False)
+    batched.log_events(recorder.events)
+    context.batched = batched.dump()
+
+
+def play_short_game(context, log, players=None, start=True):
+    players = players or context.players
+    terrain = [tile.terrain for tile in context.board.tiles]
+    numbers = [tile.number for tile in context.board.tiles]
+    red, orange, blue, green = players
+    wood, brick, ore = catan.board.Terrain('wood'), catan.board.Terrain('brick'), catan.board.Terrain('ore')
+    if start:
+        log.log_game_start(players, terrain, numbers, context.board.ports)
+    log.log_player_buys_settlement(red, '(1 NW)')
+    log.log_player_buys_road(red, '(1 NW)')
+    log.log_player_roll(red, 2)
+    log.log_player_moves_robber_and_steals(red, '5', orange)
+    log.log_player_buys_city(red, '(1 NW)')
+    log.log_player_ends_turn(red)
+    log.log_player_roll(orange, '8')
+    log.log_player_trades_with_port(orange, [(3, wood), (3, brick)], context.board.ports[0], [(2, ore)])
+    log.log_player_trades_with_other_player(orange, [(1, wood)], blue, [(1, ore)])
+    log.log_player_buys_dev_card(orange)
+    log.log_player_plays_knight(orange, '12', catan.game.Player(1, 'name', 'nobody'))
+    log.log_player_plays_road_builder(orange, '(2 W)', '(2 SW)')
+    log.log_player_plays_year_of_plenty(orange, wood, wood)
+    log.log_player_plays_monopoly(orange, ore)
+    log.log_player_plays_victory_point(orange)
+    log.log_player_ends_turn(orange)
+    log.log_player_wins(orange)
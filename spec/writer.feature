@@ -0,0 +1,54 @@
+Feature: writer modes of the log
+
+  Scenario: a log which keeps its file open holds lines until the game is won
+    Given the log keeps its file open
+    And it is "red"s turn
+    When a "6" is rolled
+    Then nothing should be written yet
+    When they win the game
+    Then it should look exactly like
+    """
+    red rolls 6
+    red wins
+    """
+
+  Scenario: a log which keeps its file open flushes once enough is pending
+    Given the log keeps its file open and flushes every "10" characters
+    And it is "red"s turn
+    When a "6" is rolled
+    Then it should look exactly like "red rolls 6"
+
+  Scenario: erasing lines already flushed erases them from the file too
+    Given the log keeps its file open and flushes every "10" characters
+    And we have the default players
+    And we have the default board
+    When a short game is played
+    And the last "3" lines are erased
+    Then the file should hold exactly what the log dumps
+    And reading it back should give "15" events
+
+  Scenario: logs which create their files exclusively never share one
+    Given "2" logs which create their files exclusively
+    And we have the default players
+    And we have the default board
+    When each log plays a short game starting at the same time
+    Then every game's file should hold exactly what its log dumped
+
+  Scenario: a log which keeps only its last lines in memory reads the rest back from its file
+    Given the log keeps only the last "3" flushed lines in memory
+    And we have the default players
+    And we have the default board
+    When a short game is played
+    And the last "2" lines are erased
+    Then at most "6" lines should be held in memory
+    And the file should hold exactly what the log dumps
+    And reading it back should give "16" events
+
+  Scenario: a log resumed from its file carries on the game
+    Given we have the default players
+    And we have the default board
+    When a short game is played
+    And a new log resumes the game from its file
+    Then the new log should carry on the game where it was left
+    When the last "1" lines are erased
+    Then the file should hold exactly what the log dumps